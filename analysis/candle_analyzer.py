@@ -1,21 +1,35 @@
 import pandas as pd
 import numpy as np
-import sqlite3
+from common.panel import load_price_panel
+from common.feature_store import load_results
 
+OHLCV = ('Open', 'High', 'Low', 'Close', 'Volume')
 
-con = sqlite3.connect('kr_stocklist.sqlite3')
 
-## Step 1: load results
-# df_result = pd.concat(
-#     [pd.read_excel('results/KQ.results.xlsx'), pd.read_excel('results/KS.results.xlsx')]
-# ).sort_values(by='buy_date')
-df_result = pd.read_excel('results/results.xlsx').sort_values(by='buy_date')
+def lookback_tensor(df_result, panel, n=20, fields=OHLCV):
+    """
+    거래마다 매수일(포함)까지 직전 n 거래일의 OHLCV를 모아 (거래 수, n, 필드 수) 배열로 돌려줍니다.
+    종목별로 DataFrame을 잘라 보는 대신 패널에서 한 번에 gather 합니다. (common.panel.Panel.lookback)
 
-dfs = {ticker: pd.read_sql(f"SELECT * FROM '{ticker}'", con) for ticker in df_result['ticker'].unique()}
+    Parameters:
+        df_result (pd.DataFrame): 백테스트 결과 (ticker, buy_date)
+        panel (Panel): 가격 패널
+        n (int): 창 길이 (거래일 수)
+        fields (tuple): 모을 필드
 
-for idx, row in df_result.iterrows():
-    buy_date = row['buy_date']
-    ticker = row['ticker']
+    Returns:
+        np.ndarray: (거래 수, n, 필드 수), 데이터가 없는 칸은 NaN
+    """
+    return panel.lookback(df_result['ticker'].values, df_result['buy_date'].values, n, fields)
 
-    df = dfs[ticker]
-    df_buy = df[df['Date'] <= buy_date]
\ No newline at end of file
+
+if __name__ == '__main__':
+    panel = load_price_panel('kr_stocklist.sqlite3')
+
+    ## Step 1: load results
+    # df_result = load_results(market=['KQ', 'KS']).sort_values(by='buy_date')
+    df_result = load_results().sort_values(by='buy_date')
+
+    ## Step 2: 거래별 매수일까지의 캔들 창
+    windows = lookback_tensor(df_result, panel, n=20)
+    print(f"{windows.shape[0]} trades × {windows.shape[1]} days × {windows.shape[2]} fields")
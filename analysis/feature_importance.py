@@ -1,8 +1,14 @@
+import os
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import LabelEncoder
 from sklearn.feature_selection import RFECV
-from catboost import CatBoostClassifier
+from sklearn.metrics import accuracy_score
+from catboost import CatBoostClassifier, Pool
+from common.feature_store import load_results
 
 def feature_elimination_model(
     df: pd.DataFrame,
@@ -71,10 +77,116 @@ def feature_elimination_model(
 
     return selector, le
 
+def _fit_fold(X, y, train, test, cols, importance, params, thread_count):
+    model = CatBoostClassifier(**params, thread_count=thread_count, verbose=0, allow_writing_files=False)
+    model.fit(X[np.ix_(train, cols)], y[train])
+    X_test = X[np.ix_(test, cols)]
+    score = accuracy_score(y[test], model.predict(X_test).reshape(-1))
+
+    if importance == 'ShapValues':
+        # (행, [클래스,] 피처 + 1) → 마지막 열(기댓값)을 빼고 피처별 |SHAP| 평균
+        shap = model.get_feature_importance(Pool(X_test, y[test]), type='ShapValues')
+        weights = np.abs(shap[..., :-1]).reshape(-1, len(cols)).mean(axis=0)
+    else:
+        weights = model.get_feature_importance(type=importance)
+    return score, weights
+
+
+def fast_feature_elimination(
+    df: pd.DataFrame,
+    step: float = 0.2,
+    patience: int = 2,
+    n_splits: int = 5,
+    importance: str = 'PredictionValuesChange',
+    cpu_budget: int = None,
+    random_state: int = 42
+):
+    """
+    RFECV 대신 쓰는 빠른 피처 제거.
+    fold마다 CatBoost 중요도(또는 SHAP)를 구해 평균이 낮은 피처를 한 번에 step 비율만큼 빼고,
+    CV 점수가 patience 라운드 연속 최고점을 넘지 못하면 멈춥니다.
+    fold 분할은 처음 한 번만 만들어 재사용하고, fold는 스레드로 동시에 학습하며
+    cpu_budget을 동시 fold 수로 나눠 CatBoost thread_count로 줍니다. (sklearn 프로세스와 경쟁하지 않음)
+
+    df: 'duration' 컬럼 포함된 백테스트 결과 DataFrame
+    step: 라운드마다 뺄 피처 비율 (1 이상이면 개수), 최소 1개
+    patience: 점수가 좋아지지 않아도 더 진행할 라운드 수
+    n_splits: StratifiedKFold fold 수
+    importance: 'PredictionValuesChange', 'LossFunctionChange' 또는 'ShapValues'
+    cpu_budget: 전체 스레드 수, None이면 os.cpu_count()
+    random_state: 재현성 시드
+
+    반환:
+        dict:
+            - support: 최고 점수 피처 리스트
+            - ranking: 피처 → 랭킹 (1=선택됨, 먼저 제거될수록 큰 숫자)
+            - scores: 라운드별 피처 수, CV 평균/표준편차, 소요 시간 DataFrame
+        label_encoder: profit_cat 레이블을 인코딩한 LabelEncoder
+    """
+    df = df.copy()
+    df['profit_cat'] = pd.cut(df['duration'], bins=3, labels=[0, 1, 2])
+    le = LabelEncoder()
+    y = le.fit_transform(df['profit_cat'])
+
+    features = df.select_dtypes(include='number').drop(columns=['duration']).columns
+    X = df[features].to_numpy(dtype=np.float32)
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(X, y))
+
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    n_jobs = max(1, min(n_splits, cpu_budget))
+    thread_count = max(1, cpu_budget // n_jobs)
+    params = {'iterations': 300, 'learning_rate': 0.1, 'depth': 6, 'random_seed': random_state}
+
+    remaining = list(range(len(features)))
+    removed = []    # 라운드별 제거된 피처 번호
+    rounds = []
+    best, best_round, stale = -np.inf, 0, 0
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        while remaining:
+            start = time.perf_counter()
+            results = list(executor.map(
+                lambda fold: _fit_fold(X, y, fold[0], fold[1], remaining, importance, params, thread_count), folds
+            ))
+            scores = np.array([score for score, _ in results])
+            weights = np.mean([weights for _, weights in results], axis=0)
+            rounds.append({
+                'n_features': len(remaining), 'cv_mean': scores.mean(), 'cv_std': scores.std(),
+                'seconds': time.perf_counter() - start,
+            })
+
+            if scores.mean() > best:
+                best, best_round, stale = scores.mean(), len(rounds) - 1, 0
+            else:
+                stale += 1
+            if stale > patience or len(remaining) == 1:
+                break
+
+            n_drop = int(step) if step >= 1 else int(np.ceil(len(remaining) * step))
+            n_drop = min(max(n_drop, 1), len(remaining) - 1)
+            drop = [remaining[i] for i in np.argsort(weights, kind='stable')[:n_drop]]
+            removed.append(drop)
+            remaining = [i for i in remaining if i not in drop]
+
+    # best_round 이후에 빠진 피처는 최고 점수 집합에 들어 있으므로 1위, 그 전에 빠진 피처는 늦게 빠질수록 높은 순위
+    ranking = {feat: 1 for feat in features}
+    for rank, drop in enumerate(reversed(removed[:best_round]), start=2):
+        for i in drop:
+            ranking[features[i]] = rank
+    support = [feat for feat in features if ranking[feat] == 1]
+
+    print("▶︎ 최종 선택된 피처 (%d개):" % len(support))
+    print(support)
+    print("\n▶︎ 각 피처 랭킹 (1=선택됨, 숫자 클수록 중요도 낮음):")
+    for feat, rank in sorted(ranking.items(), key=lambda x: x[1]):
+        print(f"  {feat}: {rank}")
+
+    return {'support': support, 'ranking': ranking, 'scores': pd.DataFrame(rounds)}, le
+
 if __name__ == '__main__':
     # 예시: 백테스트 결과 불러오기
-    df_result = pd.read_excel("results/results.xlsx")
+    df_result = load_results()
     df_result = df_result[df_result['profit_pct'].notnull()].copy()
     df_result.drop(['sell_price', 'sell_date', 'buy_date', 'profit_pct', 'order'], axis=1, inplace=True)
     # df_result = df_result[['buy_price', 'cor', 'vrate', 'mapct', '시가총액', 'days_since_max_high', 'PBR', '거래대금', 'BPS', 'DIV', 'PER', 'EPS', 'DPS']]
-    selector, label_encoder = feature_elimination_model(df_result)
+    result, label_encoder = fast_feature_elimination(df_result)
+    print(result['scores'])
@@ -1,6 +1,6 @@
 import numpy as np
 import pandas as pd
-from pykrx import stock
+from common.index_store import INDEX_PATH, load_index_store, update_index
 # 1) EMD 기반 밴드패스
 from PyEMD import EMD
 
@@ -33,28 +33,25 @@ def plot_bands_with_original(dates, band_emd, band_wave, original_series):
     plt.tight_layout()
     plt.show()
 
-def get_kospi_index_series(start_date: str, end_date: str) -> pd.Series:
+def get_kospi_index_series(start_date: str, end_date: str, database_path: str = INDEX_PATH) -> pd.Series:
     """
     주어진 기간의 코스피 지수 종가를 반환합니다.
+    로컬 지수 저장소(common.index_store)에서 읽으며, 이 기간을 아직 받지 않았으면 빠진 날짜만 받아 채웁니다.
+    (받은 구간은 요청한 날짜로 기록되므로 시작/종료일이 휴장일이어도 매번 다시 받지 않습니다)
     
     Parameters:
         start_date (str): 조회 시작일, 'YYYYMMDD' 형식
         end_date   (str): 조회 종료일, 'YYYYMMDD' 형식
+        database_path (str): 지수 저장소 sqlite 파일
     
     Returns:
         pd.Series: 인덱스가 datetime, 값이 종가인 시계열
     """
-    # pykrx에서 코스피 지수 코드는 '1001'
-    df = stock.get_index_ohlcv_by_date(start_date, end_date, "1001")
-    
-    # 컬럼명이 '종가'인지 'Close'인지 판정
-    price_col = '종가' if '종가' in df.columns else 'Close'
-    
-    # Series로 변환하고 인덱스를 datetime으로 지정
-    ser = df[price_col].copy()
-    ser.index = pd.to_datetime(ser.index, format="%Y-%m-%d")
-    
-    return ser
+    store = load_index_store(database_path)
+    if not store.covers('KOSPI', start_date, end_date):
+        update_index(database_path, markets=('KOSPI',), start_date=start_date, end_date=end_date)
+        store = load_index_store(database_path)
+    return store.series('KOSPI', start_date, end_date)
 
 def band_via_emd(series: pd.Series, 
                  imf_idxs: tuple) -> (np.ndarray, np.ndarray):
@@ -123,10 +120,11 @@ def band_via_wavelet(series: pd.Series,
     return band_norm
 
 
-kospi_index = get_kospi_index_series("20220101", "20250423")
-# kospi_index: pd.Series
-band_emd, imfs = band_via_emd(kospi_index, imf_idxs=(4, 5))
-band_wave = band_via_wavelet(kospi_index, wavelet='db4', level=6, keep_levels=[2,3,4])
+if __name__ == '__main__':
+    kospi_index = get_kospi_index_series("20220101", "20250423")
+    # kospi_index: pd.Series
+    band_emd, imfs = band_via_emd(kospi_index, imf_idxs=(4, 5))
+    band_wave = band_via_wavelet(kospi_index, wavelet='db4', level=6, keep_levels=[2,3,4])
 
-dates = kospi_index.index
-plot_bands_with_original(dates, band_emd, band_wave, kospi_index.values)
+    dates = kospi_index.index
+    plot_bands_with_original(dates, band_emd, band_wave, kospi_index.values)
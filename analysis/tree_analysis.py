@@ -1,7 +1,8 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from analysis.walk_forward import walk_forward_splits
 from sklearn.metrics import classification_report, confusion_matrix
 from catboost import CatBoostClassifier, Pool
+from common.feature_store import load_results
 
 def train_profit_category_model(df, feature_cols=None, test_size=0.2, random_state=42):
     """
@@ -31,13 +32,10 @@ def train_profit_category_model(df, feature_cols=None, test_size=0.2, random_sta
     X = df[feature_cols]
     y = df['profit_cat']
 
-    # 3) 학습/테스트 분할
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y,
-        test_size=test_size,
-        stratify=y,
-        random_state=random_state
-    )
+    # 3) 학습/테스트 분할 (매수일 순서로 마지막 test_size만큼을 테스트셋으로, 테스트 기간에 청산된 학습 행은 제외)
+    train_idx, test_idx = walk_forward_splits(df['buy_date'], df['sell_date'], n_splits=1, min_train=1 - test_size)[0]
+    X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+    y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
 
     # 4) CatBoostClassifier 학습
     model = CatBoostClassifier(
@@ -63,8 +61,8 @@ def train_profit_category_model(df, feature_cols=None, test_size=0.2, random_sta
     return model
 
 if __name__ == '__main__':
-    # 예: 백테스트 결과 Excel을 읽어와 모델 학습
-    df_result = pd.read_excel("results/results.xlsx")
+    # 예: 가장 최근 백테스트 결과를 읽어와 모델 학습
+    df_result = load_results()
     
     # days_since_max_high, kospi_index 같은 추가 피처가 있다 가정
     # cor, vrate, mapct, days_since_max_high, kospi_index 등
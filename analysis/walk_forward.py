@@ -0,0 +1,122 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.metrics import accuracy_score, f1_score
+from catboost import CatBoostClassifier
+from common.utils import load_yaml
+from common.feature_store import load_results
+
+
+def walk_forward_splits(buy_dates, sell_dates=None, n_splits=5, embargo_days=0, expanding=True, min_train=0.2):
+    """
+    매수일 순서로 walk-forward 학습/검증 구간을 나눕니다.
+    검증 구간 시작일 이후에 청산된(라벨이 미래 가격으로 정해진) 학습 행은 제거(purge)하고,
+    검증 구간 직전 embargo_days 동안 매수한 행도 학습에서 뺍니다.
+
+    Parameters:
+        buy_dates (array-like): 각 행의 매수일
+        sell_dates (array-like): 각 행의 청산일, 없으면 매수일로 간주
+        n_splits (int): 검증 구간 수
+        embargo_days (int): 검증 구간 경계에서 학습에서 뺄 달력 일수
+        expanding (bool): True면 처음부터 누적, False면 검증 구간과 같은 길이의 최근 구간만 학습
+        min_train (float): 첫 검증 구간 앞에 둘 학습 데이터 비율
+
+    Returns:
+        list: (학습 행 번호, 검증 행 번호) 튜플 리스트
+    """
+    buy = pd.to_datetime(np.asarray(buy_dates)).values.astype('datetime64[D]')
+    sell = buy if sell_dates is None else pd.to_datetime(np.asarray(sell_dates)).values.astype('datetime64[D]')
+    sell = np.where(np.isnat(sell), np.datetime64('9999-12-31'), sell)
+    embargo = np.timedelta64(embargo_days, 'D')
+
+    order = np.argsort(buy, kind='stable')
+    start = int(len(order) * min_train)
+    bounds = np.linspace(start, len(order), n_splits + 1).astype(int)
+
+    splits = []
+    for i0, i1 in zip(bounds[:-1], bounds[1:]):
+        test = order[i0:i1]
+        if test.size == 0:
+            continue
+        test_start = buy[test].min()
+        train = (buy < test_start - embargo) & (sell < test_start)
+        if not expanding:
+            train &= buy >= buy[order[max(i0 - (i1 - i0), 0)]]
+        splits.append((np.nonzero(train)[0], np.sort(test)))
+    return splits
+
+
+def _fit_fold(fold, X, y, train, test, params, thread_count):
+    start = time.perf_counter()
+    model = CatBoostClassifier(**params, thread_count=thread_count, verbose=False, allow_writing_files=False)
+    model.fit(X[train], y[train])
+    y_pred = model.predict(X[test]).reshape(-1)
+    return {
+        'fold': fold,
+        'n_train': len(train),
+        'n_test': len(test),
+        'accuracy': accuracy_score(y[test], y_pred),
+        'f1_macro': f1_score(y[test], y_pred, average='macro'),
+        'fit_seconds': time.perf_counter() - start,
+    }
+
+
+def walk_forward(df, features, target, n_splits=5, embargo_days=0, expanding=True, n_jobs=None, cpu_budget=None,
+                 params=None, date_col='buy_date', end_col='sell_date'):
+    """
+    백테스트 결과(거래 로그)로 CatBoost 분류기를 walk-forward 교차검증합니다.
+    피처 행렬은 한 번만 만들고 fold들은 스레드로 동시에 학습하며(CatBoost는 학습 중 GIL을 놓습니다),
+    전체 CPU 예산을 동시에 도는 fold 수로 나눠 각 모델의 thread_count로 줍니다.
+
+    Parameters:
+        df (pd.DataFrame): 백테스트 결과 (buy_date, sell_date, 피처 컬럼)
+        features (list): 피처 컬럼
+        target (pd.Series or np.ndarray): df와 같은 길이의 라벨
+        n_splits (int): 검증 구간 수
+        embargo_days (int): walk_forward_splits 참고
+        expanding (bool): walk_forward_splits 참고
+        n_jobs (int): 동시에 학습할 fold 수, None이면 min(n_splits, cpu_budget)
+        cpu_budget (int): 전체 스레드 수, None이면 os.cpu_count()
+        params (dict): CatBoostClassifier 파라미터
+        date_col, end_col (str): 매수일/청산일 컬럼
+
+    Returns:
+        tuple: (fold별 지표 DataFrame, 전체 경과 시간(초))
+    """
+    start = time.perf_counter()
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    n_jobs = n_jobs or max(1, min(n_splits, cpu_budget))
+    thread_count = max(1, cpu_budget // n_jobs)
+    params = params or {'iterations': 500, 'learning_rate': 0.1, 'depth': 6}
+
+    X = df[features].to_numpy(dtype=np.float32)
+    y = np.asarray(target)
+    sell_dates = df[end_col].values if end_col in df.columns else None
+    splits = walk_forward_splits(df[date_col].values, sell_dates, n_splits, embargo_days, expanding)
+    dates = pd.to_datetime(df[date_col]).values
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(_fit_fold, fold, X, y, train, test, params, thread_count)
+            for fold, (train, test) in enumerate(splits) if len(train) > 0
+        ]
+        rows = [future.result() for future in futures]
+
+    report = pd.DataFrame(rows)
+    report['test_start'] = [dates[splits[fold][1]].min() for fold in report['fold']]
+    report['test_end'] = [dates[splits[fold][1]].max() for fold in report['fold']]
+    return report, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    config = load_yaml('common/config.yaml')
+    df = load_results(market='KS')
+    df = df[df['sell_date'].notna()].reset_index(drop=True)
+
+    report, elapsed = walk_forward(df, config['features'], (df['duration'] > 60).astype(int), n_splits=5,
+                                   embargo_days=5)
+    print(report)
+    print(f"평균 accuracy: {report['accuracy'].mean():.4f}, f1_macro: {report['f1_macro'].mean():.4f}")
+    print(f"전체 소요 시간: {elapsed:.1f}s")
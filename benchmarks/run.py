@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import screener
+import kjs_trade
+from benchmarks.synthetic import make_market
+from common import indicators
+from common.panel import load_price_panel
+from common.fundamentals import load_fundamental_store
+from common.portfolio import simulate_portfolio
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(HERE, 'results.jsonl')
+# (종목 수, 거래일 수)
+SCALES = {
+    'small': (50, 500),
+    'medium': (200, 1500),
+    'large': (1000, 2500),
+}
+# 패널 전체 지표 계산이 종목별 pandas rolling 루프보다 빨라야 하는 배수
+INDICATOR_SPEEDUP_TARGET = 10
+
+
+class Timer:
+    """
+    단계별 경과 시간을 모읍니다.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def __call__(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.stages[name] = time.perf_counter() - start
+        print(f"  {name:<24} {self.stages[name]:8.3f}s")
+        return result
+
+
+def _set_signals(panel):
+    for ticker in panel.tickers:
+        df = panel.frame(ticker).reset_index()
+        screener.set_moving_average(screener.set_signal(df))
+
+
+def _pandas_indicators(panel):
+    # 지표 엔진 이전 set_signal/set_moving_average의 종목별 pandas rolling 계산 (indicators_speedup의 기준)
+    for ticker in panel.tickers:
+        df = panel.frame(ticker).reset_index()
+        df['COR'] = (df['Close'] - df['Open']) / df['Open']
+        df['vrate'] = df['Volume'] / df['Volume'].rolling(window=60).mean()
+        for interval in [20, 60, 200]:
+            ma = df['Close'].rolling(interval).mean()
+            df[f'ma{interval}pct'] = (df['Close'] - ma) / ma
+
+
+# 일별 루프와 벡터화 엔진이 행 단위로 같아야 하는 컬럼
+TRADE_COLUMNS = ['ticker', 'buy_date', 'buy_price', 'sell_date', 'sell_price', 'profit_pct', 'order', 'duration']
+
+
+def _loop_backtest_sample(root, signals, dfs, n=300, calendar=None, rows=None):
+    """
+    앞 n개 신호를 일별 루프로 백테스트하고, 같은 신호의 벡터화 엔진 결과와 행 단위로 같은지 확인합니다.
+    """
+    sample = signals.head(n)
+    loop = kjs_trade.run_backtest(root, sample, dfs, calendar=calendar, rows=rows)
+    engine = kjs_trade.run_backtest(root, sample, dfs, vectorized=True, calendar=calendar, rows=rows)
+    pd.testing.assert_frame_equal(loop[TRADE_COLUMNS].astype(object), engine[TRADE_COLUMNS].astype(object),
+                                  check_exact=False, rtol=1e-12)
+    return loop
+
+
+def run_scale(name, n_tickers, n_days, data_dir, seed=0, loop=True):
+    """
+    한 규모에서 데이터 생성부터 백테스트까지 단계별로 시간을 잽니다.
+
+    Returns:
+        dict: 단계 → 초 (신호 수 n_signals, 지표 계산 배수 indicators_speedup 포함)
+    """
+    root = os.path.join(data_dir, name)
+    shutil.rmtree(root, ignore_errors=True)
+    timer = Timer()
+    print(f"[{name}] {n_tickers} tickers × {n_days} days")
+
+    timer('generate', make_market, root, n_tickers, n_days, seed)
+    panel = timer('price_panel', load_price_panel, os.path.join(root, 'kr_stocklist.sqlite3'))
+    timer('set_signal+moving_avg', _set_signals, panel)
+    timer('indicators_per_ticker', _pandas_indicators, panel)
+    timer('indicators_panel', indicators.compute_panel, panel, ['COR', 'vrate', 'ma20pct', 'ma60pct', 'ma200pct'])
+    speedup = timer.stages['indicators_per_ticker'] / timer.stages['indicators_panel']
+    print(f"  {'indicators_speedup':<24} {speedup:8.1f}x (목표 {INDICATOR_SPEEDUP_TARGET}x, "
+          f"엔진 종목별 대비 {timer.stages['set_signal+moving_avg'] / timer.stages['indicators_panel']:.1f}x)")
+    screener_path = os.path.join(root, 'screener.sqlite3')
+    timer('build_screener', screener.build_screener, panel, screener_path, min(1000, n_days // 2))
+    frames = timer('load_screener', kjs_trade.load_screener, screener_path, 'KS')
+    signals = timer('screen_signals', kjs_trade.screen_signals, *frames)
+    dfs = {ticker: panel.frame(ticker) for ticker in signals['ticker'].unique()}
+    calendar, rows = panel.calendar, panel.day_rows(dfs)
+    days_high = timer('days_since_max_high', indicators.days_since_max_high_panel, panel, 600,
+                      signals['ticker'].unique())
+
+    store = timer('fundamentals_load', load_fundamental_store, os.path.join(root, 'fundamental.sqlite3'))
+    timer('fundamentals_asof', store.asof_days, signals['ticker'].values, calendar.locate(signals['Date'].values),
+          calendar)
+
+    timer('run_backtest', kjs_trade.run_backtest, root, signals, dfs, vectorized=True, days_high=days_high,
+          calendar=calendar, rows=rows)
+    if loop:
+        timer('run_backtest_loop_300', _loop_backtest_sample, root, signals, dfs, calendar=calendar, rows=rows)
+    timer('simulate_portfolio', simulate_portfolio, signals, dfs, calendar=calendar, rows=rows)
+
+    stages = dict(timer.stages)
+    stages['n_signals'] = len(signals)
+    stages['indicators_speedup'] = speedup
+    return stages
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(records, path=RESULTS_PATH):
+    with open(path, 'a', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def compare(path=RESULTS_PATH, last=2):
+    """
+    저장된 최근 실행들을 규모/단계별로 나란히 보여줍니다.
+    """
+    df = pd.read_json(path, lines=True)
+    runs = df['run'].drop_duplicates().tail(last)
+    df = df[df['run'].isin(runs)]
+    table = df.pivot_table(index=['scale', 'stage'], columns='run', values='seconds')
+    if table.shape[1] == 2:
+        table['ratio'] = table.iloc[:, 1] / table.iloc[:, 0]
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='합성 데이터로 파이프라인 단계별 시간을 잽니다.')
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-loop', action='store_true', help='일별 루프 백테스트는 건너뜁니다.')
+    parser.add_argument('--compare', action='store_true', help='측정 없이 최근 두 실행만 비교합니다.')
+    args = parser.parse_args()
+
+    if not args.compare:
+        run = time.strftime('%Y%m%d-%H%M%S')
+        commit = _git_commit()
+        records = []
+        for scale in args.scales:
+            n_tickers, n_days = SCALES[scale]
+            stages = run_scale(scale, n_tickers, n_days, args.data_dir, args.seed, loop=not args.no_loop)
+            n_signals = stages.pop('n_signals')
+            speedup = stages.pop('indicators_speedup')
+            records += [
+                {'run': run, 'commit': commit, 'scale': scale, 'n_tickers': n_tickers, 'n_days': n_days,
+                 'n_signals': n_signals, 'indicators_speedup': speedup, 'stage': stage, 'seconds': seconds}
+                for stage, seconds in stages.items()
+            ]
+        save(records)
+
+    with pd.option_context('display.width', 200, 'display.max_rows', 200):
+        print(compare())
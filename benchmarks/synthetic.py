@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from common import fundamentals
+from common.index_store import update_index
+
+
+def make_market(root, n_tickers=200, n_days=1500, seed=0, start='2015-01-05'):
+    """
+    재현 가능한 가짜 시장 데이터를 스크립트들이 읽는 sqlite 구조 그대로 만듭니다. (네트워크 불필요)
+
+    - kr_stocklist.sqlite3: 티커별 테이블 (Date, Close, High, Low, Open, Volume, 시가총액, 거래량, 거래대금, 상장주식수)
+    - fundamental.sqlite3: (Date, 티커) long 테이블 (BPS, PER, PBR, EPS, DIV, DPS)
+    - index.sqlite3: KOSPI/KOSDAQ 지수 일봉
+
+    종목마다 상장일이 다르고 가끔 거래가 빠진 날이 있으며, 거래량 급증 + 장대양봉이 드물게 섞여
+    기본 스크리닝 조건(cor > 0.03, vrate > 8)에 걸리는 신호가 생깁니다.
+
+    Parameters:
+        root (str): 파일을 만들 디렉터리
+        n_tickers (int): 종목 수 (홀수 번째는 KS, 짝수 번째는 KQ)
+        n_days (int): 거래일 수
+        seed (int): 난수 시드
+        start (str): 첫 거래일
+
+    Returns:
+        pd.DatetimeIndex: 전체 거래일
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    dates = pd.bdate_range(start, periods=n_days, name='Date')
+
+    conn = sqlite3.connect(os.path.join(root, 'kr_stocklist.sqlite3'))
+    for t in range(n_tickers):
+        ticker = f"{t:06d}.{'KS' if t % 2 else 'KQ'}"
+        days = dates[rng.integers(0, max(n_days // 10, 1)):]
+        days = days[rng.random(len(days)) > 0.01]
+        n = len(days)
+
+        spike = rng.random(n) < 0.005
+        close = 10000 * np.exp(np.cumsum(rng.normal(0, 0.025, n)))
+        open_ = close * np.exp(rng.normal(0, 0.015, n) - spike * 0.08)
+        high = np.maximum(close, open_) * np.exp(np.abs(rng.normal(0, 0.01, n)))
+        low = np.minimum(close, open_) * np.exp(-np.abs(rng.normal(0, 0.01, n)))
+        volume = np.round(rng.lognormal(11, 0.5, n) * np.where(spike, 20, 1))
+        shares = float(rng.integers(1, 100) * 1_000_000)
+
+        pd.DataFrame({
+            'Close': close, 'High': high, 'Low': low, 'Open': open_, 'Volume': volume,
+            '시가총액': close * shares, '거래량': volume, '거래대금': volume * close, '상장주식수': shares,
+        }, index=days).to_sql(ticker, conn, if_exists='replace')
+    conn.close()
+
+    conn = sqlite3.connect(os.path.join(root, 'fundamental.sqlite3'))
+    fundamentals.create_table(conn)
+    codes = pd.Index([f"{t:06d}" for t in range(n_tickers)], name='티커')
+    with conn:
+        for date in dates:
+            values = rng.random((n_tickers, len(fundamentals.FUNDAMENTAL_FIELDS)))
+            df = pd.DataFrame(values, index=codes, columns=fundamentals.FUNDAMENTAL_FIELDS)
+            fundamentals.write_fundamentals(conn, date.strftime('%Y%m%d'), df)
+    conn.close()
+
+    def fetch_index(start_date, end_date, code):
+        days = dates[(dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))]
+        level = 2500 if code == '1001' else 800
+        return pd.DataFrame({'종가': level * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))}, index=days)
+
+    update_index(os.path.join(root, 'index.sqlite3'), start_date=dates[0].strftime('%Y%m%d'),
+                 end_date=dates[-1].strftime('%Y%m%d'), fetch=fetch_index, rate=1000)
+    return dates
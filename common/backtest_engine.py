@@ -0,0 +1,127 @@
+import numpy as np
+
+
+def ladder_prices(first_prices, n_split=4, step=0.9):
+    """
+    여러 진입의 분할 매수 가격표를 한 번에 계산합니다. (calculate_buy_points의 배치 버전)
+
+    Parameters:
+        first_prices (array-like): 각 진입의 첫 번째 매수 가격
+        n_split (int): 분할 매수 횟수
+        step (float): 직전 매수 가격 대비 다음 매수 가격 비율
+
+    Returns:
+        np.ndarray: (진입 수, n_split) 매수 가격표
+    """
+    first_prices = np.asarray(first_prices, dtype=float)
+    points = np.empty((len(first_prices), n_split))
+    points[:, 0] = first_prices
+    for i in range(1, n_split):
+        # calculate_buy_points와 같은 순서로 곱해야 결과가 비트 단위로 일치합니다.
+        points[:, i] = points[:, i - 1] * step
+    return points
+
+
+def simulate_entries(high, low, close, days, entry_idx, n_split=4, step=0.9, target=1.1, max_hold_days=90):
+    """
+    한 종목의 여러 진입을 분할 매수 → 목표가 매도 → 기간 만료 규칙으로 한 번에 시뮬레이션합니다.
+    run_backtest의 일별 루프와 같은 우선순위(추가 매수 > 목표가 매도 > 기간 만료)를 따릅니다.
+
+    Parameters:
+        high, low, close (np.ndarray): 날짜 오름차순 가격 배열
+        days (np.ndarray): 각 행의 날짜 (epoch 기준 일수, 오름차순)
+        entry_idx (array-like): 진입일의 행 번호
+        n_split (int): 분할 매수 횟수
+        step (float): 분할 매수 가격 비율
+        target (float): 평균 매수 단가 대비 목표 매도 비율
+        max_hold_days (int): 최대 보유 기간 (달력 기준 일수)
+
+    Returns:
+        dict: 진입별 결과 배열
+            - order: 최종 매수 횟수
+            - buy_price: 최종 평균 매수 단가
+            - fill_idx: (진입 수, n_split) 각 매수가 체결된 행 번호, 미체결은 -1
+            - exit_idx: 매도된 행 번호, 미청산은 -1
+            - sell_price, profit_pct, duration: 미청산은 NaN
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    days = np.asarray(days, dtype=np.int64)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    n, m = len(entry_idx), len(close)
+
+    points = ladder_prices(close[entry_idx], n_split, step)
+    avg_prices = np.cumsum(points, axis=1) / np.arange(1, n_split + 1)
+    sell_points = avg_prices * target
+
+    # 진입 다음 날부터 기간 만료일(또는 데이터 끝)까지만 보면 됩니다.
+    # 만료일에 추가 매수가 체결되면 매도는 다음 날로 밀리므로 n_split - 1일의 여유를 둡니다.
+    start = entry_idx + 1
+    timeout_idx = np.searchsorted(days, days[entry_idx] + max_hold_days, side='left')
+    end = np.minimum(timeout_idx + n_split - 1, m - 1)
+    horizon = int(max((end - start + 1).max(initial=0), 0))
+
+    offsets = np.arange(horizon)
+    window = np.minimum(start[:, None] + offsets, m - 1)
+    valid = offsets <= (end - start)[:, None]
+    win_high = high[window]
+    win_low = low[window]
+    timeout_off = np.where(timeout_idx < m, timeout_idx - start, horizon)
+
+    order = np.ones(n, dtype=np.int64)
+    cursor = np.zeros(n, dtype=np.int64)
+    fill_idx = np.full((n, n_split), -1, dtype=np.int64)
+    fill_idx[:, 0] = entry_idx
+    exit_idx = np.full(n, -1, dtype=np.int64)
+    sell_price = np.full(n, np.nan)
+    # 진입 다음 날 데이터가 없으면 모두 미청산입니다.
+    active = np.full(n, horizon > 0)
+
+    for k in range(n_split):
+        rows = np.nonzero(active)[0]
+        if rows.size == 0:
+            break
+
+        usable = valid[rows] & (offsets >= cursor[rows, None])
+        hit_target = usable & (win_high[rows] > sell_points[rows, k, None])
+        hit_exit = hit_target | (usable & (offsets >= timeout_off[rows, None]))
+        first_exit = np.where(hit_exit.any(axis=1), hit_exit.argmax(axis=1), horizon)
+
+        if k < n_split - 1:
+            hit_fill = usable & (win_low[rows] < points[rows, k + 1, None])
+            first_fill = np.where(hit_fill.any(axis=1), hit_fill.argmax(axis=1), horizon)
+        else:
+            first_fill = np.full(rows.size, horizon)
+
+        # 같은 날 추가 매수와 매도 조건이 겹치면 추가 매수가 먼저입니다.
+        filled = (first_fill < horizon) & (first_fill <= first_exit)
+        exited = ~filled & (first_exit < horizon)
+
+        if k < n_split - 1:
+            r = rows[filled]
+            fill_idx[r, k + 1] = start[r] + first_fill[filled]
+            cursor[r] = first_fill[filled] + 1
+            order[r] = k + 2
+
+        r = rows[exited]
+        pos = first_exit[exited]
+        exit_idx[r] = start[r] + pos
+        sell_price[r] = np.where(hit_target[np.nonzero(exited)[0], pos], sell_points[r, k], close[exit_idx[r]])
+
+        active[rows[~filled]] = False
+
+    buy_price = avg_prices[np.arange(n), order - 1]
+    closed = exit_idx >= 0
+    profit_pct = np.where(closed, (sell_price - buy_price) / buy_price, np.nan)
+    duration = np.where(closed, days[exit_idx] - days[entry_idx], np.nan)
+
+    return {
+        'order': order,
+        'buy_price': buy_price,
+        'fill_idx': fill_idx,
+        'exit_idx': exit_idx,
+        'sell_price': sell_price,
+        'profit_pct': profit_pct,
+        'duration': duration,
+    }
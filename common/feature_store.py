@@ -0,0 +1,117 @@
+import os
+import glob
+import time
+import pandas as pd
+from common import profiler
+
+STORE_ROOT = 'results/store'
+DATE_COLUMNS = ['buy_date', 'sell_date']
+
+
+def new_run_id():
+    """
+    실행 시각으로 만든 run id (예: '20250422-153000'), 문자열 정렬이 곧 시간 순서입니다.
+    """
+    return time.strftime('%Y%m%d-%H%M%S')
+
+
+def _partition_path(root, name, market, run_id):
+    return os.path.join(root, name, f"market={market}", f"run_id={run_id}")
+
+
+def _typed(df):
+    """
+    엑셀을 거치며 문자열/object로 뭉개지던 컬럼을 저장 전에 타입을 맞춥니다.
+    """
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    for col in df.columns[df.dtypes == object]:
+        if col in DATE_COLUMNS:
+            continue
+        converted = pd.to_numeric(df[col], errors='coerce')
+        # None만 섞인 숫자 컬럼(sell_price, profit_pct 등)만 숫자로 바꾸고 티커 같은 문자열은 그대로 둡니다.
+        if converted.notna().sum() == df[col].notna().sum():
+            df[col] = converted
+        else:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def write_results(df, market, run_id=None, name='backtest', root=STORE_ROOT):
+    """
+    백테스트 결과를 Parquet 파일 하나로 '<root>/<name>/market=<시장>/run_id=<run id>/' 아래에 추가합니다.
+    같은 run id로 여러 번 쓰면 part 파일이 늘어나며, load_results가 모두 합쳐 읽습니다.
+
+    Parameters:
+        df (pd.DataFrame): run_backtest 등의 결과
+        market (str): 'KS' 또는 'KQ'
+        run_id (str): 실행 id, None이면 new_run_id()
+        name (str): 결과 종류 ('backtest', 'portfolio', 'sweep' 등)
+        root (str): 저장소 루트 디렉터리
+
+    Returns:
+        str: 사용한 run id
+    """
+    run_id = run_id or new_run_id()
+    path = _partition_path(root, name, market, run_id)
+    os.makedirs(path, exist_ok=True)
+    part = len(glob.glob(os.path.join(path, 'part-*.parquet')))
+    _typed(df).to_parquet(os.path.join(path, f"part-{part:05d}.parquet"), index=False)
+    return run_id
+
+
+def list_runs(name='backtest', market=None, root=STORE_ROOT):
+    """
+    저장된 (market, run_id) 목록을 run id 순으로 돌려줍니다.
+    """
+    pattern = _partition_path(root, name, market or '*', '*')
+    runs = []
+    for path in glob.glob(pattern):
+        market_dir, run_dir = path.split(os.sep)[-2:]
+        runs.append((market_dir.split('=', 1)[1], run_dir.split('=', 1)[1]))
+    return sorted(runs, key=lambda run: (run[1], run[0]))
+
+
+def load_results(market=None, run_id=None, name='backtest', root=STORE_ROOT, columns=None):
+    """
+    저장된 결과를 불러옵니다. run_id가 None이면 시장별 가장 최근 실행만 읽습니다.
+
+    Parameters:
+        market (str or list): 'KS', 'KQ' 또는 그 리스트, None이면 모든 시장
+        run_id (str): 실행 id, None이면 시장별 최신
+        name (str): 결과 종류
+        root (str): 저장소 루트 디렉터리
+        columns (list): 읽을 컬럼, None이면 전부
+
+    Returns:
+        pd.DataFrame: 결과 + market, run_id 컬럼 (buy_date/sell_date는 datetime)
+    """
+    markets = [market] if isinstance(market, str) else market
+    runs = [run for run in list_runs(name, root=root) if markets is None or run[0] in markets]
+    if run_id is not None:
+        runs = [run for run in runs if run[1] == run_id]
+    else:
+        latest = {}
+        for run_market, run in runs:
+            latest[run_market] = run
+        runs = sorted(latest.items())
+    if not runs:
+        raise FileNotFoundError(f"{os.path.join(root, name)}에 조건에 맞는 결과가 없습니다: market={market}, run_id={run_id}")
+
+    frames = []
+    for run_market, run in runs:
+        for file in sorted(glob.glob(os.path.join(_partition_path(root, name, run_market, run), 'part-*.parquet'))):
+            frames.append(pd.read_parquet(file, columns=columns).assign(market=run_market, run_id=run))
+            profiler.count('tables_read')
+            profiler.count('rows_read', len(frames[-1]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def export_excel(df, path):
+    """
+    결과를 엑셀로 내보냅니다. (사람이 열어 보는 용도, 분석 스크립트는 load_results를 씁니다)
+    """
+    df.to_excel(path, index=False)
+    print(f"결과가 {path}에 저장되었습니다.")
@@ -0,0 +1,131 @@
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter:
+    """
+    호출 간격을 일정하게 유지하는 스레드 안전 rate limiter (소스별로 하나씩 사용)
+
+    Parameters:
+        rate (float): 초당 허용 호출 수
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def retry(func, *args, retries=3, backoff=1.0, limiter=None, **kwargs):
+    """
+    func(*args, **kwargs)를 실패 시 지수 백오프(backoff, 2*backoff, ...)로 다시 시도합니다.
+
+    Parameters:
+        func (callable): 호출할 함수
+        retries (int): 첫 호출 이후 재시도 횟수
+        backoff (float): 첫 재시도 전 대기 시간(초)
+        limiter (RateLimiter): 매 시도 전에 acquire 할 rate limiter
+
+    Returns:
+        func의 반환값 (마지막 시도까지 실패하면 예외를 그대로 올립니다)
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+class Throughput:
+    """
+    처리량 집계 (티커 수, 행 수, 실패 수, 경과 시간)
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.tickers = 0
+        self.rows = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def add(self, tickers=0, rows=0, errors=0):
+        with self.lock:
+            self.tickers += tickers
+            self.rows += rows
+            self.errors += errors
+
+    def report(self):
+        elapsed = time.monotonic() - self.start
+        return {
+            'tickers': self.tickers,
+            'rows': self.rows,
+            'errors': self.errors,
+            'seconds': elapsed,
+            'tickers_per_sec': self.tickers / elapsed if elapsed > 0 else 0.0,
+            'rows_per_sec': self.rows / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def run_pipeline(jobs, fetch, write, workers=8, stats=None):
+    """
+    jobs를 스레드 풀에서 fetch 하고, 결과는 하나의 writer 스레드가 순서대로 write 합니다.
+    sqlite 연결처럼 스레드 간에 공유할 수 없는 자원은 write 쪽에서만 사용하면 됩니다.
+
+    Parameters:
+        jobs (iterable): fetch에 넘길 작업 목록
+        fetch (callable): job → 결과 리스트 (각 원소가 write에 한 번씩 전달됨)
+        write (callable): 결과 하나를 저장, 저장한 행 수를 반환
+        workers (int): fetch 워커 수
+        stats (Throughput): 처리량 집계 객체, None이면 새로 만듭니다.
+
+    Returns:
+        Throughput: 처리량 집계
+    """
+    stats = stats or Throughput()
+    results = queue.Queue(maxsize=workers * 4)
+    done = object()
+    errors = []
+
+    def writer():
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            try:
+                stats.add(tickers=1, rows=write(item) or 0)
+            except Exception as e:
+                errors.append(e)
+                stats.add(errors=1)
+
+    def worker(job):
+        try:
+            for item in fetch(job):
+                results.put(item)
+        except Exception as e:
+            print(f"Error on {job}: {e}")
+            stats.add(errors=1)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(worker, jobs))
+    results.put(done)
+    thread.join()
+
+    if errors:
+        print(f"저장 실패 {len(errors)}건, 첫 오류: {errors[0]}")
+    return stats
@@ -0,0 +1,167 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from common import profiler
+from common.utils import connect_readonly, sqlite_version, table_names
+from common.trading_calendar import date_int
+
+FUNDAMENTAL_FIELDS = ['BPS', 'PER', 'PBR', 'EPS', 'DIV', 'DPS']
+TABLE_NAME = 'fundamental'
+
+# sqlite_version(파일) → FundamentalStore, 같은 프로세스에서 반복되는 백테스트는 sqlite를 다시 읽지 않습니다.
+_cache = {}
+
+
+def create_table(conn):
+    """
+    (Date, 티커)를 기본키로 하는 펀더멘털 long 테이블을 만듭니다. Date는 YYYYMMDD 정수입니다.
+    """
+    columns = ', '.join(f"{field} REAL" for field in FUNDAMENTAL_FIELDS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} "
+        f"(Date INTEGER NOT NULL, 티커 TEXT NOT NULL, {columns}, PRIMARY KEY (Date, 티커))"
+    )
+
+
+def write_fundamentals(conn, date, df):
+    """
+    하루치 펀더멘털(pykrx get_market_fundamental_by_ticker 결과)을 long 테이블에 upsert 합니다.
+
+    Parameters:
+        conn (sqlite3.Connection): fundamental.sqlite3 연결
+        date (str or int): YYYYMMDD
+        df (pd.DataFrame): index=티커, columns=BPS, PER, PBR, EPS, DIV, DPS
+    """
+    df = df.reindex(columns=FUNDAMENTAL_FIELDS).astype(float)
+    rows = [(int(date), ticker, *values) for ticker, values in zip(df.index, df.itertuples(index=False))]
+    placeholders = ', '.join('?' * (len(FUNDAMENTAL_FIELDS) + 2))
+    conn.executemany(f"INSERT OR REPLACE INTO {TABLE_NAME} VALUES ({placeholders})", rows)
+
+
+def import_daily_tables(conn):
+    """
+    예전 방식의 날짜별 테이블('YYYYMMDD')을 long 테이블로 옮깁니다. 이미 옮긴 날짜는 건너뜁니다.
+
+    Returns:
+        int: 새로 옮긴 날짜 수
+    """
+    create_table(conn)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
+    done = {str(row[0]) for row in conn.execute(f"SELECT DISTINCT Date FROM {TABLE_NAME}")}
+
+    count = 0
+    with conn:
+        for table in tables:
+            if not re.fullmatch(r'\d{8}', table) or table in done:
+                continue
+            df = pd.read_sql(f"SELECT * FROM '{table}'", conn, index_col='티커')
+            write_fundamentals(conn, table, df)
+            count += 1
+    return count
+
+
+def to_date_int(dates):
+    """
+    날짜 배열('YYYY-MM-DD HH:MM:SS', 'YYYYMMDD', YYYYMMDD 정수, Timestamp 등)을 YYYYMMDD 정수 배열로 바꿉니다.
+    (common.trading_calendar.date_int, 정수 입력은 그대로 YYYYMMDD로 봅니다)
+    """
+    return date_int(dates)
+
+
+class FundamentalStore:
+    """
+    (티커, 날짜) 순으로 정렬된 펀더멘털 배열. asof로 여러 (티커, 날짜)를 한 번에 조회합니다.
+    """
+
+    def __init__(self, df):
+        df = df.sort_values(['티커', 'Date'])
+        codes, self.tickers = pd.factorize(df['티커'], sort=True)
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.dates = df['Date'].values.astype(np.int64)
+        self.codes = codes.astype(np.int64)
+        self.keys = self.codes * 100_000_000 + self.dates
+        self.values = df[FUNDAMENTAL_FIELDS].to_numpy(dtype=float)
+        self._calendar = None
+
+    def asof(self, tickers, dates):
+        """
+        각 (티커, 날짜)에 대해 그 날짜 이전(포함) 가장 최근의 펀더멘털을 돌려줍니다.
+
+        Parameters:
+            tickers (array-like): 티커 ('005930' 또는 '005930.KS')
+            dates (array-like): 기준일
+
+        Returns:
+            pd.DataFrame: 입력과 같은 순서의 BPS, PER, PBR, EPS, DIV, DPS (없으면 NaN)
+        """
+        codes = self._codes(tickers)
+        return self._lookup(self.keys, codes, codes * 100_000_000 + to_date_int(dates))
+
+    def asof_days(self, tickers, days, calendar):
+        """
+        asof와 같지만 기준일을 calendar의 거래일 순번으로 받습니다. 저장소의 날짜는 달력마다 한 번만
+        그 값이 처음 보이는 거래일 순번으로 바꿔 두므로 조회는 정수 키 비교뿐입니다.
+
+        Parameters:
+            tickers (array-like): 티커 ('005930' 또는 '005930.KS')
+            days (array-like): calendar의 거래일 순번 (-1이면 NaN)
+            calendar (TradingCalendar): 순번의 기준 달력 (보통 가격 패널의 calendar)
+
+        Returns:
+            pd.DataFrame: 입력과 같은 순서의 BPS, PER, PBR, EPS, DIV, DPS (없으면 NaN)
+        """
+        if self._calendar is not calendar:
+            # 날짜 d의 값은 d 이후(포함) 첫 거래일부터 보이므로, 순번 o의 as-of는 이 키가 o 이하인 마지막 행입니다.
+            self._calendar = calendar
+            self._day_keys = self.codes * 100_000_000 + calendar.search(self.dates)
+        codes = self._codes(tickers)
+        days = np.asarray(days, dtype=np.int64)
+        return self._lookup(self._day_keys, np.where(days >= 0, codes, -1), codes * 100_000_000 + days)
+
+    def _codes(self, tickers):
+        symbols = [str(ticker).split('.')[0] for ticker in tickers]
+        return np.array([self.ticker_index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+
+    def _lookup(self, sorted_keys, codes, keys):
+        # (티커 번호, 날짜) 키가 정렬된 배열에서 각 키 이전(포함) 마지막 행, 티커가 다르면 NaN
+        pos = np.searchsorted(sorted_keys, keys, side='right') - 1
+        found = (codes >= 0) & (pos >= 0)
+        found[found] &= self.codes[pos[found]] == codes[found]
+
+        values = np.full((len(codes), len(FUNDAMENTAL_FIELDS)), np.nan)
+        values[found] = self.values[pos[found]]
+        return pd.DataFrame(values, columns=FUNDAMENTAL_FIELDS)
+
+
+def load_fundamental_store(database_path):
+    """
+    fundamental.sqlite3를 FundamentalStore로 불러옵니다. 파일이 바뀌지 않았다면 메모리 캐시를 그대로 돌려줍니다.
+    파일은 읽기 전용으로 열고, 없으면 빈 저장소를 돌려줍니다. 예전 날짜별 테이블을 long 테이블로 옮기는 일은
+    수집기(fundamental.py get_fundamental)가 맡으므로 여기서는 long 테이블만 읽습니다.
+    """
+    empty = pd.DataFrame(columns=['Date', '티커', *FUNDAMENTAL_FIELDS])
+    if not os.path.exists(database_path):
+        return FundamentalStore(empty)
+
+    key = sqlite_version(database_path)
+    if key in _cache:
+        profiler.count('cache_hits.fundamentals')
+        return _cache[key]
+
+    with profiler.span('load_fundamentals'):
+        conn = connect_readonly(database_path)
+        tables = table_names(conn)
+        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", conn) if TABLE_NAME in tables else empty
+        conn.close()
+    if TABLE_NAME not in tables and any(re.fullmatch(r'\d{8}', table) for table in tables):
+        print(f"{database_path}에 날짜별 테이블만 있습니다. fundamental.py를 실행해 long 테이블로 옮기세요.")
+    profiler.count('queries')
+    profiler.count('tables_read')
+    profiler.count('rows_read', len(df))
+
+    store = FundamentalStore(df)
+    for old in [old for old in _cache if old[0] == key[0]]:
+        del _cache[old]
+    _cache[sqlite_version(database_path)] = store
+    return store
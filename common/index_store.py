@@ -0,0 +1,235 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from common import profiler
+from common.utils import connect_readonly, connect_wal, sqlite_version, table_names
+from common.fetch import RateLimiter, retry
+from common.fundamentals import to_date_int
+
+INDEX_PATH = 'index.sqlite3'
+# pykrx 지수 코드
+INDEX_CODES = {'KOSPI': '1001', 'KOSDAQ': '2001'}
+INDEX_FIELDS = ['시가', '고가', '저가', '종가', '거래량', '거래대금']
+TABLE_NAME = 'index_ohlcv'
+# 지수별로 이미 받아 둔 요청 구간 (양끝이 휴장일이어도 다시 받지 않도록 거래일이 아니라 요청한 날짜를 남김)
+COVERAGE_TABLE = 'index_coverage'
+START_DATE = '20100101'
+
+# sqlite_version(파일) → IndexStore
+_cache = {}
+
+
+def create_table(conn):
+    """
+    (지수, Date)를 기본키로 하는 지수 일봉 테이블을 만듭니다. Date는 YYYYMMDD 정수입니다.
+    """
+    columns = ', '.join(f"{field} REAL" for field in INDEX_FIELDS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} "
+        f"(market TEXT NOT NULL, Date INTEGER NOT NULL, {columns}, PRIMARY KEY (market, Date))"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {COVERAGE_TABLE} "
+        f"(market TEXT PRIMARY KEY, first INTEGER NOT NULL, last INTEGER NOT NULL)"
+    )
+
+
+def _shift(date, days):
+    """YYYYMMDD 정수 날짜를 days일 옮긴 'YYYYMMDD' 문자열"""
+    return (pd.to_datetime(str(date)) + pd.Timedelta(days=days)).strftime('%Y%m%d')
+
+
+def update_index(database_path=INDEX_PATH, markets=tuple(INDEX_CODES), start_date=START_DATE, end_date=None,
+                 fetch=None, rate=2.0):
+    """
+    지수 일봉을 지수별로 한 번의 기간 조회로 받아 저장합니다. 이미 받아 둔 구간은 다시 받지 않습니다.
+    받은 구간은 요청한 날짜 그대로 index_coverage에 남기므로 시작/종료일이 휴장일이어도 다음 호출에서 다시 받지 않습니다.
+    (오늘은 장 마감 전일 수 있어 어제까지만 받은 것으로 남깁니다)
+
+    Parameters:
+        database_path (str): 저장할 sqlite 파일
+        markets (tuple): INDEX_CODES의 키 ('KOSPI', 'KOSDAQ')
+        start_date (str): 처음 받을 때의 시작일 (YYYYMMDD)
+        end_date (str): 종료일 (YYYYMMDD), None이면 오늘
+        fetch (callable): (start, end, 지수 코드) → DataFrame, None이면 pykrx get_index_ohlcv_by_date
+        rate (float): pykrx 초당 호출 수 제한
+
+    Returns:
+        dict: 지수 → 새로 저장한 행 수
+    """
+    if fetch is None:
+        from pykrx import stock
+        fetch = stock.get_index_ohlcv_by_date
+    end_date = end_date or datetime.today().strftime('%Y%m%d')
+    yesterday = int(_shift(datetime.today().strftime('%Y%m%d'), -1))
+    limiter = RateLimiter(rate)
+
+    conn = connect_wal(database_path)
+    create_table(conn)
+    placeholders = ', '.join('?' * (len(INDEX_FIELDS) + 2))
+    counts = {}
+    for market in markets:
+        coverage = conn.execute(f"SELECT first, last FROM {COVERAGE_TABLE} WHERE market = ?", (market,)).fetchone()
+        first, last = coverage or conn.execute(
+            f"SELECT MIN(Date), MAX(Date) FROM {TABLE_NAME} WHERE market = ?", (market,)
+        ).fetchone()
+        if last is None:
+            ranges = [(start_date, end_date)]
+        else:
+            # 저장된 구간 앞(더 과거를 요청한 경우)과 뒤(새 거래일)만 받습니다.
+            ranges = [
+                (start_date, _shift(first, -1)),
+                (_shift(last, 1), end_date),
+            ]
+
+        counts[market] = 0
+        for start, end in ranges:
+            if start > end:
+                continue
+            df = retry(fetch, start, end, INDEX_CODES[market], limiter=limiter)
+            df = df.rename(columns={'Open': '시가', 'High': '고가', 'Low': '저가', 'Close': '종가', 'Volume': '거래량'})
+            df = df.reindex(columns=INDEX_FIELDS).astype(float)
+            rows = [(market, int(date), *values) for date, values in zip(to_date_int(df.index), df.itertuples(index=False))]
+            with conn:
+                conn.executemany(f"INSERT OR REPLACE INTO {TABLE_NAME} VALUES ({placeholders})", rows)
+            counts[market] += len(rows)
+
+        covered = (int(start_date), min(int(end_date), yesterday))
+        if last is not None:
+            covered = (min(covered[0], first), max(covered[1], last))
+        with conn:
+            conn.execute(f"INSERT OR REPLACE INTO {COVERAGE_TABLE} VALUES (?, ?, ?)", (market, *covered))
+    conn.close()
+    return counts
+
+
+class IndexStore:
+    """
+    지수별 일봉 배열. 거래일은 dict로 O(1), 거래일이 아닌 날짜는 직전 거래일 값(as-of)으로 조회합니다.
+    """
+
+    def __init__(self, df, coverage=None):
+        df = df.sort_values(['market', 'Date'])
+        self.coverage = {} if coverage is None else dict(coverage)
+        self.dates = {}
+        self.values = {}
+        self.positions = {}
+        # (market, field) → (달력, 순번별 값), asof_days가 채움
+        self._by_day = {}
+        for market, each in df.groupby('market'):
+            dates = each['Date'].values.astype(np.int64)
+            self.dates[market] = dates
+            self.values[market] = each[INDEX_FIELDS].to_numpy(dtype=float)
+            self.positions[market] = {date: i for i, date in enumerate(dates.tolist())}
+
+    def covers(self, market, start_date, end_date):
+        """
+        [start_date, end_date]를 이미 받아 두었는지 (update_index가 남긴 요청 구간 기준)
+        """
+        if market not in self.coverage:
+            return False
+        first, last = self.coverage[market]
+        start, end = to_date_int([start_date, end_date])
+        return first <= start and end <= last
+
+    def _field_index(self, field):
+        return INDEX_FIELDS.index(field)
+
+    def close(self, market, date, field='종가'):
+        """
+        date(같은 날 또는 직전 거래일)의 지수 값 하나, 없으면 NaN
+        """
+        if market not in self.dates:
+            return np.nan
+        date = int(to_date_int([date])[0])
+        pos = self.positions[market].get(date)
+        if pos is None:
+            pos = np.searchsorted(self.dates[market], date, side='right') - 1
+            if pos < 0:
+                return np.nan
+        return self.values[market][pos, self._field_index(field)]
+
+    def asof(self, market, dates, field='종가'):
+        """
+        여러 날짜의 지수 값을 한 번에 조회합니다. (각 날짜 이전(포함) 가장 최근 거래일 값)
+
+        Returns:
+            np.ndarray: dates와 같은 길이, 없으면 NaN
+        """
+        keys = to_date_int(dates)
+        out = np.full(len(keys), np.nan)
+        if market not in self.dates:
+            return out
+        pos = np.searchsorted(self.dates[market], keys, side='right') - 1
+        found = pos >= 0
+        out[found] = self.values[market][pos[found], self._field_index(field)]
+        return out
+
+    def asof_days(self, market, days, calendar, field='종가'):
+        """
+        asof와 같지만 기준일을 calendar의 거래일 순번으로 받습니다. 지수 시계열은 (market, field, 달력)마다
+        한 번만 순번별 값으로 펼쳐 두고, 조회는 그 배열을 순번으로 읽습니다.
+
+        Returns:
+            np.ndarray: days와 같은 길이, 없거나 순번이 -1이면 NaN
+        """
+        days = np.asarray(days, dtype=np.int64)
+        out = np.full(len(days), np.nan)
+        if market not in self.dates:
+            return out
+        key = (market, field)
+        if key not in self._by_day or self._by_day[key][0] is not calendar:
+            pos = calendar.align(self.dates[market])
+            by_day = np.full(len(calendar), np.nan)
+            by_day[pos >= 0] = self.values[market][pos[pos >= 0], self._field_index(field)]
+            self._by_day[key] = (calendar, by_day)
+        valid = days >= 0
+        out[valid] = self._by_day[key][1][days[valid]]
+        return out
+
+    def series(self, market, start_date=None, end_date=None, field='종가'):
+        """
+        [start_date, end_date] 구간의 지수 시계열 (index: datetime)
+        """
+        if market not in self.dates:
+            return pd.Series(dtype=float, name=field)
+        dates = self.dates[market]
+        i0 = 0 if start_date is None else np.searchsorted(dates, to_date_int([start_date])[0], side='left')
+        i1 = len(dates) if end_date is None else np.searchsorted(dates, to_date_int([end_date])[0], side='right')
+        index = pd.to_datetime(dates[i0:i1].astype(str), format='%Y%m%d')
+        return pd.Series(self.values[market][i0:i1, self._field_index(field)], index=index, name=field)
+
+
+def load_index_store(database_path=INDEX_PATH):
+    """
+    index.sqlite3를 IndexStore로 불러옵니다. 파일이 바뀌지 않았다면 캐시를 돌려줍니다.
+    파일은 읽기 전용으로 열고, 없으면 빈 저장소를 돌려줍니다. (테이블/WAL 설정은 update_index가 맡으므로
+    읽기만 하는 백테스트가 DB를 만들거나 바꾸지 않습니다)
+    """
+    empty = pd.DataFrame(columns=['market', 'Date', *INDEX_FIELDS])
+    if not os.path.exists(database_path):
+        return IndexStore(empty)
+
+    key = sqlite_version(database_path)
+    if key in _cache:
+        profiler.count('cache_hits.index')
+        return _cache[key]
+
+    with profiler.span('load_index'):
+        conn = connect_readonly(database_path)
+        tables = table_names(conn)
+        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", conn) if TABLE_NAME in tables else empty
+        coverage = {}
+        if COVERAGE_TABLE in tables:
+            coverage = {market: (first, last) for market, first, last in conn.execute(f"SELECT * FROM {COVERAGE_TABLE}")}
+        conn.close()
+    profiler.count('queries', 2)
+    profiler.count('tables_read')
+    profiler.count('rows_read', len(df))
+
+    store = IndexStore(df, coverage)
+    for old in [old for old in _cache if old[0] == key[0]]:
+        del _cache[old]
+    _cache[sqlite_version(database_path)] = store
+    return store
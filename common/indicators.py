@@ -0,0 +1,394 @@
+import threading
+import numpy as np
+import pandas as pd
+from common.trading_calendar import epoch_days
+
+# compute() 동안 입력 배열 → 누적합 (같은 Close로 여러 창을 계산할 때 누적합을 한 번만 만듦)
+_local = threading.local()
+
+
+def rolling_argmax(values, window):
+    """
+    각 행 i에 대해 직전 window개 행 [i - window, i) 중 최댓값의 위치를 구합니다.
+    (현재 행은 포함하지 않고, 같은 값이면 앞선 위치, NaN은 무시)
+
+    2의 거듭제곱 길이 구간의 argmax 표를 만든 뒤 겹치는 두 구간을 합치는 방식이라
+    전체 비용이 O(n log window)이고 행마다 창을 다시 훑지 않습니다.
+
+    Parameters:
+        values (np.ndarray): 1차원 값 배열
+        window (int): 창 길이 (행 수)
+
+    Returns:
+        np.ndarray: 최댓값 위치 (int64), 창이 비었거나 모두 NaN이면 -1
+    """
+    x = np.where(np.isnan(values), -np.inf, np.asarray(values, dtype=float))
+    n = len(x)
+    hi = np.arange(n)
+    lo = np.maximum(hi - window, 0)
+    length = hi - lo
+
+    result = np.full(n, -1, dtype=np.int64)
+    rows = np.nonzero(length > 0)[0]
+    if rows.size == 0:
+        return result
+
+    # table[k][j] = argmax(x[j : j + 2**k])
+    level = np.floor(np.log2(length[rows])).astype(np.int64)
+    table = [np.arange(n)]
+    for k in range(1, int(level.max()) + 1):
+        prev, half = table[-1], 1 << (k - 1)
+        left, right = prev[:len(prev) - half], prev[half:]
+        table.append(np.where(x[left] >= x[right], left, right))
+
+    for k in np.unique(level):
+        r = rows[level == k]
+        left = table[k][lo[r]]
+        right = table[k][hi[r] - (1 << k)]
+        result[r] = np.where(x[left] >= x[right], left, right)
+
+    result[np.isneginf(x[np.maximum(result, 0)])] = -1
+    return result
+
+
+def days_since_max_high(high, dates, window=600):
+    """
+    kjs_trade.days_since_max_high를 모든 행에 대해 한 번에 계산합니다.
+    기준일 행 자체는 창에 들어가지 않습니다. 원래 함수가 'YYYY-MM-DD' 날짜로
+    'YYYY-MM-DD HH:MM:SS' 인덱스를 잘라서 기준일 행이 빠지는 동작을 그대로 따릅니다.
+
+    Parameters:
+        high (np.ndarray): 날짜 오름차순 고가 배열
+        dates (array-like): 각 행의 날짜
+        window (int): 창 길이 (거래일 수)
+
+    Returns:
+        np.ndarray: 기준일과 창 내 최고가 날짜의 차이(일), 계산할 수 없으면 NaN
+    """
+    days = epoch_days(dates)
+    pos = rolling_argmax(high, window)
+    return np.where(pos >= 0, days - days[np.maximum(pos, 0)], np.nan)
+
+
+def days_since_max_high_panel(panel, window=600, tickers=None):
+    """
+    가격 패널의 모든 (날짜, 티커)에 대해 days_since_max_high를 계산합니다.
+    각 티커의 실제 거래일(present) 행만으로 창을 셉니다.
+
+    Parameters:
+        panel (Panel): common.panel.Panel
+        window (int): 창 길이 (거래일 수)
+        tickers (list): 계산할 티커, None이면 전체
+
+    Returns:
+        pd.DataFrame: index=Date 문자열, columns=티커, 거래가 없던 날은 NaN
+    """
+    tickers = panel.tickers if tickers is None else list(tickers)
+    high = panel.field('High')
+    out = np.full((len(panel.dates), len(tickers)), np.nan)
+    for j, ticker in enumerate(tickers):
+        col = panel.ticker_index[ticker]
+        rows = np.nonzero(panel.present[:, col])[0]
+        out[rows, j] = days_since_max_high(high[rows, col], panel.dates[rows], window)
+    return pd.DataFrame(out, index=panel.date_labels, columns=tickers)
+
+
+# 지표 이름 → {'func', 'inputs', 'lookback', 'params'} (register로 등록)
+INDICATORS = {}
+
+
+def register(name, inputs, lookback=0, **params):
+    """
+    지표를 이름으로 등록하는 데코레이터입니다. 등록한 지표는 compute_panel/compute_frame에서 이름으로 계산합니다.
+
+        @register('atr14', inputs=('High', 'Low', 'Close'), lookback=14, window=14)
+        def atr(high, low, close, window): ...
+
+    func는 inputs 순서대로 (행 수, 종목 수) float 배열을 받아 같은 모양의 배열을 돌려줍니다.
+    각 열은 한 종목의 실제 거래일만 앞으로 모은 시계열이므로 rolling_*/shift로 창을 계산하면 됩니다.
+    (종목마다 길이가 달라 남는 끝 행은 0으로 채워지고 결과에서 버려지므로, 지표는 과거 행만 보아야 합니다)
+
+    Parameters:
+        name (str): 지표 이름 (결과 컬럼/필드 이름)
+        inputs (tuple): 가격 패널 필드 이름
+        lookback (int): 마지막 행의 값을 계산하는 데 필요한 이전 행 수 (증분 갱신 시 보관할 상태 길이)
+        params: func에 키워드 인자로 넘길 값
+    """
+    def decorator(func):
+        INDICATORS[name] = {'func': func, 'inputs': tuple(inputs), 'lookback': lookback, 'params': params}
+        return func
+    return decorator
+
+
+def lookback(names):
+    """
+    names 지표를 모두 이어서 계산하는 데 필요한 이전 행 수
+    """
+    return max(INDICATORS[name]['lookback'] for name in names)
+
+
+def _window_diff(cumulative, window):
+    # 누적합 배열에서 행마다 직전 window행(현재 포함) 구간의 합
+    out = np.empty_like(cumulative)
+    head = min(window, len(cumulative))
+    out[:head] = cumulative[:head]
+    np.subtract(cumulative[head:], cumulative[:len(cumulative) - head], out=out[head:])
+    return out
+
+
+def _prefix_sums(x):
+    # NaN을 0으로 본 누적합과 유효 값 누적 개수 (NaN이 없으면 개수는 None)
+    # compute() 안에서는 같은 입력 배열의 누적합을 한 번만 만들어 창마다 나눠 씁니다.
+    cache = getattr(_local, 'prefix', None)
+    if cache is not None and id(x) in cache:
+        return cache[id(x)][1:]
+    valid = ~np.isnan(x)
+    if valid.all():
+        sums = np.cumsum(x, axis=0), None
+    else:
+        sums = np.cumsum(np.where(valid, x, 0.0), axis=0), np.cumsum(valid, axis=0, dtype=np.int32)
+    if cache is not None:
+        # x도 함께 붙잡아 두어 계산 도중 같은 id가 다른 배열에 재사용되지 않게 합니다.
+        cache[id(x)] = (x,) + sums
+    return sums
+
+
+def _window_sums(x, window, min_periods):
+    # 누적합의 차로 창 합계와 유효 값(NaN 제외) 개수를 구합니다. (창 길이와 무관하게 O(n))
+    cumulative, counts = _prefix_sums(x)
+    total = _window_diff(cumulative, window)
+    if counts is None:
+        # NaN이 없으면 창 안의 개수는 행 번호만으로 정해집니다.
+        count = np.minimum(np.arange(1, len(x) + 1), window).reshape((-1,) + (1,) * (x.ndim - 1))
+    else:
+        count = _window_diff(counts, window)
+    min_periods = window if min_periods is None else min_periods
+    return total, count, count >= max(min_periods, 1)
+
+
+def _mask_invalid(values, ok):
+    # ok가 아닌 자리를 NaN으로 바꿔 values를 돌려줍니다. NaN이 없어 ok가 행 번호로만 정해지면 행 단위로 채웁니다.
+    if ok.shape[1:] == (1,) * (ok.ndim - 1):
+        values[~ok.reshape(-1)] = np.nan
+    else:
+        np.copyto(values, np.nan, where=~ok)
+    return values
+
+
+def rolling_sum(x, window, min_periods=None):
+    """
+    열마다 직전 window행(현재 포함)의 합, 창 안의 유효 값이 min_periods(기본 window)개 미만이면 NaN
+    (pandas rolling(window, min_periods).sum()과 같은 규칙)
+    """
+    total, _, ok = _window_sums(x, window, min_periods)
+    return _mask_invalid(total, ok)
+
+
+def rolling_mean(x, window, min_periods=None):
+    """
+    열마다 직전 window행(현재 포함)의 평균 (NaN은 빼고 평균, 규칙은 rolling_sum과 같음)
+    """
+    total, count, ok = _window_sums(x, window, min_periods)
+    return _mask_invalid(np.divide(total, np.maximum(count, 1), out=total), ok)
+
+
+def rolling_std(x, window, min_periods=None, ddof=1):
+    """
+    열마다 직전 window행(현재 포함)의 표준편차 (pandas 기본과 같이 ddof=1)
+    제곱합의 상쇄 오차를 줄이려고 열 평균을 빼고 계산합니다. (분산은 평행이동에 불변)
+    """
+    center = np.zeros(x.shape[1:])
+    has_value = (~np.isnan(x)).any(axis=0)
+    center[has_value] = np.nanmean(x[:, has_value], axis=0)
+    x = x - center
+    total, count, ok = _window_sums(x, window, min_periods)
+    squares, _, _ = _window_sums(x * x, window, min_periods)
+    var = (squares - total * total / np.maximum(count, 1)) / np.maximum(count - ddof, 1)
+    return np.where(ok & (count > ddof), np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+
+def shift(x, periods=1):
+    """
+    열마다 periods행 아래로 민 배열 (앞은 NaN)
+    """
+    out = np.full(x.shape, np.nan)
+    out[periods:] = x[:len(x) - periods]
+    return out
+
+
+@register('COR', inputs=('Open', 'Close'))
+def candle_body(open_, close):
+    """장대양봉 크기: (종가 - 시가) / 시가"""
+    body = close - open_
+    return np.divide(body, open_, out=body)
+
+
+@register('vrate', inputs=('Volume',), lookback=59, window=60)
+def volume_rate(volume, window):
+    """거래량 / 직전 window일(당일 포함) 평균 거래량"""
+    mean = rolling_mean(volume, window)
+    return np.divide(volume, mean, out=mean)
+
+
+def _register_ma_pct(interval):
+    @register(f'ma{interval}pct', inputs=('Close',), lookback=interval - 1, window=interval)
+    def ma_pct(close, window):
+        """종가의 window일 이동평균 대비 괴리율"""
+        ma = rolling_mean(close, window)
+        gap = close - ma
+        return np.divide(gap, ma, out=gap)
+    return ma_pct
+
+
+for _interval in (20, 60, 200):
+    _register_ma_pct(_interval)
+
+
+@register('atr14', inputs=('High', 'Low', 'Close'), lookback=14, window=14)
+def average_true_range(high, low, close, window):
+    """True Range(고가-저가, 전일 종가와의 갭 포함)의 window일 단순 평균"""
+    prev_close = shift(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return rolling_mean(true_range, window)
+
+
+@register('rsi14', inputs=('Close',), lookback=14, window=14)
+def relative_strength_index(close, window):
+    """
+    window일 평균 상승폭/하락폭으로 계산한 RSI (0~100)
+    Wilder의 지수 평활 대신 단순 평균(Cutler RSI)을 써서 누적합 창으로 계산합니다.
+    """
+    change = close - shift(close)
+    gain = rolling_mean(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)), window)
+    loss = rolling_mean(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0)), window)
+    return 100 - 100 / (1 + gain / loss)
+
+
+@register('bb_width20', inputs=('Close',), lookback=19, window=20, k=2.0)
+def bollinger_width(close, window, k):
+    """볼린저 밴드 폭: (상단 - 하단) / 중심선 = 2k × 표준편차 / 이동평균"""
+    return 2 * k * rolling_std(close, window) / rolling_mean(close, window)
+
+
+def compute(fields, names):
+    """
+    등록된 지표들을 계산합니다.
+
+    Parameters:
+        fields (dict): 필드 이름 → (행 수, 종목 수) 배열 (열마다 실제 거래일만 앞으로 모은 시계열)
+        names (list): 계산할 지표 이름
+
+    Returns:
+        dict: 지표 이름 → fields와 같은 모양의 float64 배열
+    """
+    out = {}
+    _local.prefix = {}
+    try:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name in names:
+                spec = INDICATORS[name]
+                out[name] = spec['func'](*(fields[field] for field in spec['inputs']), **spec['params'])
+    finally:
+        _local.prefix = None
+    return out
+
+
+def _compute_block(present, values, fields, names, out=None):
+    # 티커 묶음 하나: 종목마다 거래일 행만 앞으로 모아 (최대 거래일 수, 티커 수) 배열로 계산한 뒤 제자리로 되돌림
+    # values는 (날짜, 티커, fields) 배열, 결과는 지표 이름 → (날짜, 티커) 배열 (열 우선 배치, out을 주면 out에 씀)
+    # 모으기/되돌리기는 (티커, 날짜) 배치에서 불리언 마스크로 하므로 종목마다 연속된 메모리를 순서대로 읽고 씁니다.
+    present_t = np.ascontiguousarray(present.T)
+    counts = present_t.sum(axis=1)
+    length = int(counts.max()) if counts.size else 0
+    # (티커, 종목 내 순번) 중 실제 거래일이 들어가는 자리
+    filled_t = np.arange(length) < counts[:, None]
+    # (티커, 필드, 날짜), 패널을 묶음 단위로 읽은 배열은 보통 이미 이 배치라 복사하지 않습니다.
+    values_t = np.ascontiguousarray(values.transpose(1, 2, 0))
+    results = {}
+
+    # 이전 행을 보지 않는 지표(lookback 0)는 모을 필요 없이 날짜 축 그대로 계산합니다.
+    pointwise = [name for name in names if INDICATORS[name]['lookback'] == 0]
+    if pointwise:
+        full = {field: values_t[:, k].T for k, field in enumerate(fields)}
+        for name, result in compute(full, pointwise).items():
+            results[name] = _mask_invalid(result, present_t.T)
+            if out is not None:
+                out[name][...] = results[name]
+                results[name] = out[name]
+    windowed = [name for name in names if name not in pointwise]
+    if not windowed:
+        return results
+
+    compact = {}
+    for field in {field for name in windowed for field in INDICATORS[name]['inputs']}:
+        array = np.zeros(filled_t.shape)
+        array[filled_t] = values_t[:, fields.index(field)][present_t]
+        compact[field] = array.T
+
+    for name, result in compute(compact, windowed).items():
+        target = np.empty(present_t.shape) if out is None else out[name].T
+        target.fill(np.nan)
+        target[present_t] = result.T[filled_t]
+        results[name] = target.T
+    return results
+
+
+def compute_blocks(panel, names, tickers=None, block=8, out=None):
+    """
+    가격 패널(날짜 × 티커)의 지표를 block개 티커씩 계산해 차례로 돌려줍니다.
+    종목마다 실제 거래일(present) 행만 앞으로 모은 (최대 거래일 수, 티커 수) 배열에서 모든 종목의 창을
+    누적합으로 함께 계산한 뒤 원래 날짜 위치로 되돌려 놓으므로, 종목별 DataFrame에 rolling을 거는 것과
+    같은 값을 종목 수만큼 반복하지 않고 얻습니다. 입력도 묶음마다 패널에서 필요한 필드만 읽으므로
+    메모리는 묶음 하나 크기(날짜 수 × block)로 유지되고, 결과는 받는 쪽이 바로 디스크 패널에 써 넣으면 됩니다.
+
+    Parameters:
+        panel (Panel): common.panel.Panel
+        names (list): 계산할 지표 이름 (INDICATORS)
+        tickers (list): 계산할 티커, None이면 전체
+        block (int): 한 번에 계산할 티커 수
+        out (dict): 지표 이름 → (날짜 수, 티커 수) 배열, 주면 묶음 결과를 여기에 바로 씁니다.
+
+    Yields:
+        tuple: (slice, dict) tickers 안의 묶음 위치, 지표 이름 → (날짜 수, 묶음 티커 수) float64 배열 (거래가 없던 날은 NaN)
+    """
+    tickers = panel.tickers if tickers is None else list(tickers)
+    cols = np.array([panel.ticker_index[ticker] for ticker in tickers], dtype=np.int64)
+    fields = sorted({field for name in names for field in INDICATORS[name]['inputs']})
+    field_idx = [panel.field_index[field] for field in fields]
+
+    for start in range(0, len(cols), block):
+        sl = slice(start, start + block)
+        present = np.asarray(panel.present[:, cols[sl]])
+        # 묶음에 필요한 필드를 한 번에 읽습니다.
+        values = np.asarray(panel.values[:, cols[sl, None], field_idx], dtype=np.float64)
+        block_out = None if out is None else {name: out[name][:, sl] for name in names}
+        yield sl, _compute_block(present, values, fields, names, block_out)
+
+
+def compute_panel(panel, names, tickers=None, block=8):
+    """
+    compute_blocks의 결과를 (날짜 수, 티커 수) 배열로 모아 돌려줍니다. 결과 전체가 메모리에 올라가므로
+    스크리너 패널처럼 디스크에 쓸 때는 compute_blocks로 묶음마다 바로 쓰는 편이 낫습니다.
+
+    Returns:
+        dict: 지표 이름 → (날짜 수, 티커 수) float64 배열, 거래가 없던 날은 NaN
+    """
+    tickers = panel.tickers if tickers is None else list(tickers)
+    # 묶음 결과를 (티커, 날짜) 배치로 바로 쓰도록 결과도 열 우선으로 둡니다.
+    out = {name: np.empty((len(panel.dates), len(tickers)), order='F') for name in names}
+    for _ in compute_blocks(panel, names, tickers, block, out=out):
+        pass
+    return out
+
+
+def compute_frame(df, names):
+    """
+    종목 하나의 DataFrame(행 = 거래일 오름차순)에 지표 컬럼을 붙입니다. (df를 수정하고 그대로 돌려줌)
+    """
+    fields = {
+        field: df[field].to_numpy(dtype=float)[:, None]
+        for field in {field for name in names for field in INDICATORS[name]['inputs']}
+    }
+    for name, values in compute(fields, names).items():
+        df[name] = values[:, 0]
+    return df
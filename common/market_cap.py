@@ -0,0 +1,133 @@
+import os
+import numpy as np
+import pandas as pd
+from common import profiler
+from common.utils import connect_readonly, connect_wal, sqlite_version, table_names
+from common.fetch import RateLimiter, retry, run_pipeline
+from common.fundamentals import to_date_int
+
+MARKET_CAP_FIELDS = ['시가총액', '거래량', '거래대금', '상장주식수']
+TABLE_NAME = 'market_cap'
+
+# sqlite_version(파일) → MarketCapStore
+_cache = {}
+
+
+def create_table(conn):
+    """
+    (Date, 티커)를 기본키로 하는 시가총액/거래대금 long 테이블을 만듭니다. Date는 YYYYMMDD 정수입니다.
+    """
+    columns = ', '.join(f"{field} REAL" for field in MARKET_CAP_FIELDS)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} "
+        f"(Date INTEGER NOT NULL, 티커 TEXT NOT NULL, {columns}, PRIMARY KEY (Date, 티커))"
+    )
+
+
+def update_market_cap(database_path, trading_days, fetch=None, workers=4, rate=2.0):
+    """
+    거래일마다 전 종목 시가총액을 한 번에 조회(get_market_cap_by_ticker)해 long 테이블에 저장합니다.
+    이미 저장된 날짜는 건너뛰므로 매일 실행하면 새 거래일만 받습니다.
+
+    Parameters:
+        database_path (str): 저장할 sqlite 파일 (예: 'trade_amount.sqlite3')
+        trading_days (list): 'YYYYMMDD' 거래일 리스트
+        fetch (callable): 'YYYYMMDD' → DataFrame (index=티커), None이면 pykrx
+        workers (int): 동시에 조회할 날짜 수
+        rate (float): pykrx 초당 호출 수 제한
+
+    Returns:
+        dict: 처리량 (tickers 항목은 저장한 날짜 수)
+    """
+    if fetch is None:
+        from pykrx import stock
+        fetch = stock.get_market_cap_by_ticker
+
+    con = connect_wal(database_path, check_same_thread=False)
+    create_table(con)
+    done = {str(row[0]) for row in con.execute(f"SELECT DISTINCT Date FROM {TABLE_NAME}")}
+    todo = [date for date in trading_days if date not in done]
+
+    limiter = RateLimiter(rate)
+    placeholders = ', '.join('?' * (len(MARKET_CAP_FIELDS) + 2))
+
+    def fetch_day(date):
+        df = retry(fetch, date, limiter=limiter)
+        if not df.empty:
+            yield date, df
+
+    def write(item):
+        date, df = item
+        df = df.reindex(columns=MARKET_CAP_FIELDS).astype(float)
+        rows = [(int(date), ticker, *values) for ticker, values in zip(df.index, df.itertuples(index=False))]
+        con.executemany(f"INSERT OR REPLACE INTO {TABLE_NAME} VALUES ({placeholders})", rows)
+        con.commit()
+        return len(rows)
+
+    stats = run_pipeline(todo, fetch_day, write, workers=workers)
+    con.close()
+    return stats.report()
+
+
+class MarketCapStore:
+    """
+    날짜별로 저장된 시가총액 테이블을 메모리에서 티커별 시계열로 전치한 저장소
+    """
+
+    def __init__(self, df):
+        df = df.sort_values(['티커', 'Date'])
+        self.tickers, starts = np.unique(df['티커'].values, return_index=True)
+        ends = np.append(starts[1:], len(df))
+        self.bounds = {ticker: (start, end) for ticker, start, end in zip(self.tickers, starts, ends)}
+        self.dates = df['Date'].values.astype(np.int64)
+        self.values = df[MARKET_CAP_FIELDS].to_numpy(dtype=float)
+
+    def series(self, ticker, start_date=None, end_date=None):
+        """
+        티커 하나의 시가총액/거래량/거래대금/상장주식수 시계열
+        (pykrx get_market_cap_by_date(start_date, end_date, ticker)와 같은 모양)
+
+        Parameters:
+            ticker (str): '005930' 또는 '005930.KS'
+            start_date, end_date (str): 조회 구간 (양끝 포함), None이면 전체
+
+        Returns:
+            pd.DataFrame: index=Date (Timestamp), columns=시가총액, 거래량, 거래대금, 상장주식수
+        """
+        symbol = str(ticker).split('.')[0]
+        start, end = self.bounds.get(symbol, (0, 0))
+        dates = self.dates[start:end]
+        i0 = 0 if start_date is None else np.searchsorted(dates, to_date_int([start_date])[0], side='left')
+        i1 = len(dates) if end_date is None else np.searchsorted(dates, to_date_int([end_date])[0], side='right')
+
+        index = pd.DatetimeIndex(pd.to_datetime(dates[i0:i1].astype(str), format='%Y%m%d'), name='Date')
+        return pd.DataFrame(self.values[start:end][i0:i1], index=index, columns=MARKET_CAP_FIELDS)
+
+
+def load_market_cap_store(database_path):
+    """
+    trade_amount.sqlite3의 long 테이블을 MarketCapStore로 불러옵니다. 파일이 바뀌지 않았다면 캐시를 돌려줍니다.
+    파일은 읽기 전용으로 열고, 없으면 빈 저장소를 돌려줍니다. (테이블/WAL 설정은 update_market_cap이 맡습니다)
+    """
+    empty = pd.DataFrame(columns=['Date', '티커', *MARKET_CAP_FIELDS])
+    if not os.path.exists(database_path):
+        return MarketCapStore(empty)
+
+    key = sqlite_version(database_path)
+    if key in _cache:
+        profiler.count('cache_hits.market_cap')
+        return _cache[key]
+
+    with profiler.span('load_market_cap'):
+        con = connect_readonly(database_path)
+        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", con) if TABLE_NAME in table_names(con) else empty
+        con.close()
+    profiler.count('queries')
+    profiler.count('tables_read')
+    profiler.count('rows_read', len(df))
+
+    store = MarketCapStore(df)
+    for old in [old for old in _cache if old[0] == key[0]]:
+        del _cache[old]
+    _cache[sqlite_version(database_path)] = store
+    return store
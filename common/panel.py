@@ -0,0 +1,472 @@
+import os
+import json
+import shutil
+import sqlite3
+import numpy as np
+import pandas as pd
+from common import profiler
+from common.utils import sqlite_version
+from common.trading_calendar import DATE_FORMAT, TradingCalendar
+
+
+class Panel:
+    """
+    날짜 × 티커 × 필드 3차원 배열과 날짜/티커 인덱스를 묶은 저장소입니다.
+
+    디렉터리 하나에 meta.json, dates.npy, values.npy, present.npy 로 저장되며,
+    load 시 memmap으로 열기 때문에 티커/날짜 슬라이싱은 복사 없이 view를 돌려줍니다.
+
+    Attributes:
+        dates (np.ndarray): datetime64[s] 오름차순 거래일
+        tickers (list): 티커 리스트 (예: '005930.KS')
+        fields (list): 필드 리스트 (예: 'Close', 'High', ..., '시가총액')
+        values (np.ndarray): (날짜, 티커, 필드) 값 배열
+        present (np.ndarray): (날짜, 티커) 원본 테이블에 행이 있었는지 여부
+    """
+
+    def __init__(self, dates, tickers, fields, values, present):
+        self.dates = np.asarray(dates, dtype='datetime64[s]')
+        self.tickers = list(tickers)
+        self.fields = list(fields)
+        self.values = values
+        self.present = present
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.field_index = {field: i for i, field in enumerate(self.fields)}
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        저장된 패널을 한 번에 불러옵니다.
+
+        Parameters:
+            path (str): 패널 디렉터리
+            mmap (bool): True면 values/present를 읽기 전용 memmap으로 엽니다.
+
+        Returns:
+            Panel: 불러온 패널
+        """
+        mmap_mode = 'r' if mmap else None
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        return cls(
+            np.load(os.path.join(path, 'dates.npy')),
+            meta['tickers'],
+            meta['fields'],
+            np.load(os.path.join(path, 'values.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, 'present.npy'), mmap_mode=mmap_mode),
+        )
+
+    @classmethod
+    def create(cls, path, dates, tickers, fields, dtype=np.float64):
+        """
+        디스크에 NaN으로 채운 빈 패널을 만들고 쓰기 가능한 memmap으로 엽니다.
+        종목별로 값을 채워 넣으면 전체 데이터를 메모리에 올리지 않고 패널을 만들 수 있습니다.
+        다 채운 뒤 commit(path)을 호출해야 meta.json이 쓰여 load 할 수 있게 됩니다.
+        """
+        os.makedirs(path, exist_ok=True)
+        dates = np.asarray(dates, dtype='datetime64[s]')
+        values = np.lib.format.open_memmap(
+            os.path.join(path, 'values.npy'), mode='w+', dtype=dtype,
+            shape=(len(dates), len(tickers), len(fields))
+        )
+        present = np.lib.format.open_memmap(
+            os.path.join(path, 'present.npy'), mode='w+', dtype=bool, shape=(len(dates), len(tickers))
+        )
+        values[:] = np.nan
+        np.save(os.path.join(path, 'dates.npy'), dates)
+        # 이전 meta.json이 남아 있으면 만들다 만 패널을 불러올 수 있으므로 지웁니다.
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            os.remove(os.path.join(path, 'meta.json'))
+        return cls(dates, tickers, fields, values, present)
+
+    @classmethod
+    def open(cls, path):
+        """
+        저장된 패널을 쓰기 가능한 memmap으로 열어 일부 행/열만 제자리에서 고칩니다.
+        create와 마찬가지로 meta.json을 지우므로 다 고친 뒤 commit(path)을 호출해야 다시 load 할 수 있습니다.
+        """
+        meta_path = os.path.join(path, 'meta.json')
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        panel = cls(
+            np.load(os.path.join(path, 'dates.npy')),
+            meta['tickers'],
+            meta['fields'],
+            np.load(os.path.join(path, 'values.npy'), mmap_mode='r+'),
+            np.load(os.path.join(path, 'present.npy'), mmap_mode='r+'),
+        )
+        os.remove(meta_path)
+        return panel
+
+    @classmethod
+    def reindex(cls, path, tickers, chunk=256):
+        """
+        저장된 패널의 티커 축을 tickers로 바꿉니다. 남는 티커의 값은 날짜 chunk개씩 그대로 복사하고
+        새 티커는 빈 열(NaN, present=False)로 둡니다. 옆 디렉터리에 만들어 바꿔 끼우므로
+        중간에 멈추면 meta.json이 없는(다시 만들) 패널만 남습니다.
+
+        Returns:
+            Panel: 바꾼 뒤 memmap으로 다시 연 패널
+        """
+        old = cls.load(path)
+        kept = [j for j, ticker in enumerate(tickers) if ticker in old.ticker_index]
+        src = [old.ticker_index[tickers[j]] for j in kept]
+
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        new = cls.create(tmp_path, old.dates, tickers, old.fields, dtype=old.values.dtype)
+        for start in range(0, len(old.dates), chunk):
+            sl = slice(start, start + chunk)
+            new.values[sl, kept] = old.values[sl][:, src]
+            new.present[sl, kept] = old.present[sl][:, src]
+        new.commit(tmp_path)
+        del new, old
+
+        os.remove(os.path.join(path, 'meta.json'))
+        shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        return cls.load(path)
+
+    @classmethod
+    def append(cls, path, dates, values, present):
+        """
+        저장된 패널 뒤에 새 날짜의 행을 덧붙입니다. (티커/필드 구성은 같아야 합니다)
+        dates/values/present 파일 끝에 새 행만 이어 쓰고 헤더의 shape만 고치므로 기존 이력은 읽거나 다시 쓰지 않습니다.
+        쓰는 동안 meta.json을 지워 두었다가 마지막에 쓰므로, 중간에 멈추면 load 할 수 없는 패널이 남습니다. (다시 만들면 됨)
+
+        Returns:
+            Panel: 덧붙인 뒤 memmap으로 다시 연 패널
+        """
+        meta_path = os.path.join(path, 'meta.json')
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        os.remove(meta_path)
+
+        _append_npy(os.path.join(path, 'values.npy'), values)
+        _append_npy(os.path.join(path, 'present.npy'), present)
+        _append_npy(os.path.join(path, 'dates.npy'), np.asarray(dates, dtype='datetime64[s]'))
+        _write_meta(path, meta['tickers'], meta['fields'], meta.get('source'))
+        return cls.load(path)
+
+    def commit(self, path, source=None):
+        """
+        create로 만든 패널의 memmap을 디스크에 내리고 마지막으로 meta.json을 씁니다.
+        source에는 원본 sqlite의 sqlite_version을 남겨 두면 load_price_panel이 최신 여부를 판단합니다.
+        """
+        for array in (self.values, self.present):
+            if isinstance(array, np.memmap):
+                array.flush()
+        _write_meta(path, self.tickers, self.fields, source)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'dates.npy'), self.dates)
+        np.save(os.path.join(path, 'values.npy'), self.values)
+        np.save(os.path.join(path, 'present.npy'), self.present)
+        _write_meta(path, self.tickers, self.fields)
+
+    @property
+    def date_labels(self):
+        """sqlite 테이블의 Date 컬럼과 같은 'YYYY-MM-DD HH:MM:SS' 문자열 인덱스"""
+        if not hasattr(self, '_date_labels'):
+            self._date_labels = pd.Index(pd.DatetimeIndex(self.dates).strftime(DATE_FORMAT), name='Date')
+        return self._date_labels
+
+    @property
+    def calendar(self):
+        """패널 날짜 축의 TradingCalendar (순번 = 행 번호)"""
+        if not hasattr(self, '_calendar'):
+            self._calendar = TradingCalendar(self.dates)
+        return self._calendar
+
+    def date_range_index(self, start=None, end=None):
+        """
+        [start, end] 구간(양끝 포함)의 날짜 위치를 slice로 돌려줍니다.
+        """
+        return self.calendar.range(start, end)
+
+    def day_index(self, ticker):
+        """
+        티커 하나가 실제로 거래된 행의 순번 (frame(ticker)의 행 순서와 같음)
+        """
+        return np.nonzero(self.present[:, self.ticker_index[ticker]])[0].astype(np.int32)
+
+    def day_rows(self, tickers):
+        """
+        티커마다 day_index, frame(ticker)로 만든 dfs와 함께 calendar를 넘길 때 쓰는 frame_calendar(dfs)의 rows와 같은 dict
+        """
+        return {ticker: self.day_index(ticker) for ticker in tickers}
+
+    def date_slice(self, start=None, end=None):
+        """
+        날짜 구간으로 자른 패널 (values/present는 view)
+        """
+        sl = self.date_range_index(start, end)
+        return Panel(self.dates[sl], self.tickers, self.fields, self.values[sl], self.present[sl])
+
+    def ticker_slice(self, ticker):
+        """
+        티커 하나의 (날짜, 필드) view
+        """
+        return self.values[:, self.ticker_index[ticker], :]
+
+    def field(self, name):
+        """
+        필드 하나의 (날짜, 티커) view
+        """
+        return self.values[:, :, self.field_index[name]]
+
+    def field_frame(self, name):
+        """
+        필드 하나를 index=Date 문자열, columns=티커 DataFrame으로 돌려줍니다. (예전 스크리너 테이블과 같은 모양)
+        """
+        return pd.DataFrame(self.field(name), index=self.date_labels, columns=self.tickers)
+
+    def lookback(self, tickers, dates, n, fields=('Open', 'High', 'Low', 'Close', 'Volume')):
+        """
+        (티커, 기준일) 쌍마다 기준일(포함)까지 직전 n개 거래일의 값을 한 번에 모읍니다.
+        기준일 위치는 날짜 배열에서 searchsorted로 찾고, 창은 패널의 거래일 축을 따르므로
+        상장 전이나 거래정지처럼 행이 없던 날과 패널에 없는 티커는 NaN으로 채워집니다.
+
+        Parameters:
+            tickers (array-like): 티커 ('005930.KS')
+            dates (array-like): 기준일 (기준일이 휴장일이면 직전 거래일까지)
+            n (int): 창 길이 (거래일 수)
+            fields (tuple): 모을 필드
+
+        Returns:
+            np.ndarray: (쌍 수, n, 필드 수) float64, 마지막 행이 기준일
+        """
+        cols = np.array([self.ticker_index.get(ticker, -1) for ticker in tickers], dtype=np.int64)
+        end = self.calendar.asof(dates).astype(np.int64)
+        rows = end[:, None] + np.arange(-n + 1, 1)
+
+        valid = (rows >= 0) & (cols >= 0)[:, None]
+        rows = np.where(valid, rows, 0)
+        cols = np.where(cols >= 0, cols, 0)[:, None]
+        valid &= self.present[rows, cols]
+
+        field_idx = [self.field_index[field] for field in fields]
+        out = np.asarray(self.values[rows[..., None], cols[..., None], field_idx], dtype=np.float64)
+        out[~valid] = np.nan
+        return out
+
+    def frame(self, ticker):
+        """
+        티커 하나를 기존 sqlite 테이블(pd.read_sql(..., index_col='Date'))과 같은 모양의 DataFrame으로 돌려줍니다.
+        """
+        j = self.ticker_index[ticker]
+        rows = np.nonzero(self.present[:, j])[0]
+        return pd.DataFrame(self.values[rows, j, :], index=self.date_labels[rows], columns=self.fields)
+
+
+def _append_npy(path, rows):
+    # .npy 파일 끝에 첫 축 방향으로 행을 이어 쓰고 헤더의 shape만 같은 길이로 고쳐 씁니다.
+    # 이전에 중간에 멈춘 append가 남긴 꼬리는 헤더의 shape 기준으로 잘라 냅니다.
+    with open(path, 'r+b') as file:
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+        rows = np.ascontiguousarray(rows, dtype=dtype)
+        if fortran_order or rows.shape[1:] != shape[1:]:
+            raise ValueError(f"{path}: {shape}에 {rows.shape}를 덧붙일 수 없습니다.")
+
+        header = repr({
+            'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+            'shape': (shape[0] + len(rows),) + tuple(shape[1:]),
+        })
+        prefix = 10 if version == (1, 0) else 12
+        if len(header) + 1 > offset - prefix:
+            raise ValueError(f"{path}: 헤더에 새 shape를 쓸 자리가 없습니다.")
+
+        file.seek(offset + shape[0] * int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize)
+        file.write(rows.tobytes())
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+        # 데이터가 디스크에 내려간 뒤에 shape를 늘립니다.
+        file.seek(prefix)
+        file.write(header.ljust(offset - prefix - 1).encode('latin1') + b'\n')
+
+
+def _read_meta(path):
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_meta(path, tickers, fields, source=None):
+    meta = {'tickers': list(tickers), 'fields': list(fields)}
+    if source is not None:
+        meta['source'] = list(source)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False)
+
+
+@profiler.profiled('build_panel')
+def build_from_sqlite(database_path, panel_path, tickers=None):
+    """
+    티커별 테이블로 된 sqlite(kr_stocklist.sqlite3)에서 패널을 만듭니다.
+    결과 배열은 디스크의 memmap에 바로 채워 넣으므로 전체 데이터를 메모리에 올리지 않습니다.
+
+    Parameters:
+        database_path (str): 티커별 테이블이 있는 sqlite 파일
+        panel_path (str): 패널을 저장할 디렉터리
+        tickers (list): 포함할 티커, None이면 모든 테이블
+
+    Returns:
+        Panel: 저장 후 memmap으로 다시 연 패널
+    """
+    conn = sqlite3.connect(database_path)
+    if tickers is None:
+        tickers = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")]
+        profiler.count('queries')
+
+    # 1) 전체 거래일과 필드 목록 수집
+    dates = set()
+    fields = []
+    with profiler.span('scan_dates'):
+        for ticker in tickers:
+            dates.update(row[0] for row in conn.execute(f"SELECT Date FROM '{ticker}'"))
+            for row in conn.execute(f"PRAGMA table_info('{ticker}')"):
+                if row[1] != 'Date' and row[1] not in fields:
+                    fields.append(row[1])
+        profiler.count('queries', 2 * len(tickers))
+        dates = np.array(sorted(pd.to_datetime(list(dates))), dtype='datetime64[s]')
+
+    # 2) 디스크에 배열을 만들고 티커별로 채우기
+    panel = Panel.create(panel_path, dates, tickers, fields)
+    with profiler.span('fill'):
+        for j, ticker in enumerate(tickers):
+            df = pd.read_sql(f"SELECT * FROM '{ticker}'", conn, index_col='Date')
+            rows = np.searchsorted(dates, pd.to_datetime(df.index).values.astype('datetime64[s]'))
+            cols = [fields.index(col) for col in df.columns]
+            panel.values[rows[:, None], j, cols] = df.values.astype(np.float64)
+            panel.present[rows, j] = True
+            profiler.count('rows_read', len(df))
+        profiler.count('tables_read', len(tickers))
+        profiler.count('queries', len(tickers))
+
+    conn.close()
+    # 읽기를 마친 뒤의 버전을 남깁니다. (WAL 파일은 마지막 연결이 닫힐 때 본 파일로 합쳐짐)
+    panel.commit(panel_path, source=sqlite_version(database_path))
+    del panel
+    return Panel.load(panel_path)
+
+
+@profiler.profiled('update_panel')
+def update_from_sqlite(database_path, panel_path):
+    """
+    저장된 가격 패널에 sqlite의 새 행만 읽어 반영합니다. 티커마다 패널에 있는 마지막 거래일 이후의 행만
+    조회(Date 기본키 범위 조회)하므로 읽는 양은 전체 이력이 아니라 새 행 수에 비례합니다.
+
+    - 패널 마지막 날짜 이후의 새 날짜는 Panel.append로 파일 끝에 덧붙입니다.
+    - 하루 늦게 채워진 행(패널에 이미 있는 날짜)은 제자리에 씁니다.
+    - 새 테이블(신규 상장)은 그 테이블만 읽어 열을 추가하고, 없어진 테이블의 열은 지웁니다. (Panel.reindex)
+
+    티커의 마지막 거래일 이전 행 수가 달라졌거나(이력 중간 변경), 패널 날짜 축 중간에 없던 날짜나 새 컬럼이 생기면
+    아무것도 바꾸지 않고 None을 돌려주므로 호출한 쪽이 build_from_sqlite로 다시 만듭니다.
+
+    Parameters:
+        database_path (str): 티커별 테이블이 있는 sqlite 파일
+        panel_path (str): build_from_sqlite로 만든 패널 디렉터리
+
+    Returns:
+        Panel or None: 갱신 후 memmap으로 다시 연 패널
+    """
+    panel = Panel.load(panel_path)
+    conn = sqlite3.connect(database_path)
+    tickers = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")]
+    profiler.count('queries')
+
+    # 1) 티커별로 패널의 마지막 거래일 이후 행만 읽기 (패널에 없는 티커는 테이블 전체)
+    #    그 이전 행 수가 패널과 다르면 이력 중간이 바뀐 것이므로 다시 만듭니다. (COUNT는 Date 인덱스만 훑음)
+    present = np.asarray(panel.present)
+    counts = present.sum(axis=0)
+    last_rows = len(panel.dates) - 1 - present[::-1].argmax(axis=0)
+    frames = {}
+    for ticker in tickers:
+        j = panel.ticker_index.get(ticker)
+        if j is not None and counts[j]:
+            last_date = panel.date_labels[last_rows[j]]
+            profiler.count('queries', 2)
+            if conn.execute(f"SELECT COUNT(*) FROM '{ticker}' WHERE Date <= ?", (last_date,)).fetchone()[0] != counts[j]:
+                conn.close()
+                return None
+            df = pd.read_sql(f"SELECT * FROM '{ticker}' WHERE Date > ?", conn, index_col='Date', params=(last_date,))
+        else:
+            profiler.count('queries')
+            df = pd.read_sql(f"SELECT * FROM '{ticker}'", conn, index_col='Date')
+        if len(df):
+            frames[ticker] = df
+        profiler.count('rows_read', len(df))
+    conn.close()
+
+    if any(column not in panel.field_index for df in frames.values() for column in df.columns):
+        return None
+    new_dates = {ticker: pd.to_datetime(df.index).values.astype('datetime64[s]') for ticker, df in frames.items()}
+    dates = np.unique(np.concatenate(list(new_dates.values()))) if frames else panel.dates[:0]
+    dates = dates[~np.isin(dates, panel.dates)]
+    if len(dates) and dates[0] < panel.dates[-1]:
+        return None
+
+    # 2) 티커 축과 날짜 축을 늘린 뒤 새 행을 제자리에 쓰기
+    reindex = tickers != panel.tickers
+    del panel, present
+    if reindex:
+        Panel.reindex(panel_path, tickers)
+    if len(dates):
+        meta = _read_meta(panel_path)
+        shape = (len(dates), len(tickers))
+        Panel.append(panel_path, dates, np.full(shape + (len(meta['fields']),), np.nan), np.zeros(shape, dtype=bool))
+
+    panel = Panel.open(panel_path)
+    for ticker, df in frames.items():
+        rows = np.searchsorted(panel.dates, new_dates[ticker])
+        j = panel.ticker_index[ticker]
+        cols = [panel.field_index[column] for column in df.columns]
+        panel.values[rows[:, None], j, cols] = df.values.astype(np.float64)
+        panel.present[rows, j] = True
+    profiler.count('tables_read', len(frames))
+    panel.commit(panel_path, source=sqlite_version(database_path))
+    del panel
+    return Panel.load(panel_path)
+
+
+def default_panel_path(database_path, name=None):
+    """
+    sqlite 파일 옆에 둘 패널 디렉터리 경로 (예: 'screener.sqlite3', 'KS' → 'screener.KS.panel')
+    """
+    base = os.path.splitext(database_path)[0]
+    return f"{base}.{name}.panel" if name else f"{base}.panel"
+
+
+def load_price_panel(database_path, panel_path=None):
+    """
+    가격 패널을 불러옵니다. 만들 때 남긴 sqlite_version(본 파일 + -wal 파일)과 지금이 다르면 새 행만
+    update_from_sqlite로 반영하고, 패널이 없거나 이어 붙일 수 없으면 sqlite에서 다시 만듭니다.
+    WAL 모드에서는 커밋이 -wal 파일에만 쌓여 본 파일 mtime이 그대로일 수 있습니다.
+
+    Parameters:
+        database_path (str): 티커별 테이블이 있는 sqlite 파일 (예: 'kr_stocklist.sqlite3')
+        panel_path (str): 패널 디렉터리, None이면 '<database_path에서 확장자 제외>.panel'
+
+    Returns:
+        Panel: memmap으로 연 가격 패널
+    """
+    if panel_path is None:
+        panel_path = default_panel_path(database_path)
+
+    meta = _read_meta(panel_path)
+    if meta is None:
+        return build_from_sqlite(database_path, panel_path)
+    if meta.get('source') == list(sqlite_version(database_path)):
+        profiler.count('cache_hits.panel')
+        return Panel.load(panel_path)
+    panel = update_from_sqlite(database_path, panel_path)
+    return build_from_sqlite(database_path, panel_path) if panel is None else panel
@@ -0,0 +1,180 @@
+import heapq
+import numpy as np
+import pandas as pd
+from common.backtest_engine import simulate_entries, ladder_prices
+from common.trading_calendar import frame_calendar, lookup, to_datetime64
+
+# 같은 날 이벤트 처리 순서: 매도 → 추가 매수 → 신규 진입
+EXIT, FILL = 0, 1
+
+
+def _trade_paths(screener_data, signal_days, dfs, calendar, rows, n_split, step, target, max_hold_days):
+    """
+    모든 신호를 보유 제약 없이 엔진으로 시뮬레이션해 체결/매도 행 번호를 구합니다.
+
+    Returns:
+        dict: 신호 라벨 → (ticker, 진입가, 매수 체결일 배열(거래일 순번), 매도일(거래일 순번, 미청산 -1), 매도가, 매도일 라벨)
+    """
+    paths = {}
+    for ticker, pos in screener_data.groupby('ticker').indices.items():
+        if ticker not in dfs:
+            continue
+
+        prices = dfs[ticker]
+        entry_idx = lookup(rows[ticker], signal_days[pos])
+        if (entry_idx < 0).any():
+            raise KeyError(f"{ticker}: 가격 데이터에 없는 진입일이 있습니다.")
+
+        days = rows[ticker]
+        sim = simulate_entries(
+            prices['High'].values, prices['Low'].values, prices['Close'].values,
+            calendar.days[days].astype(np.int64), entry_idx, n_split=n_split, step=step, target=target,
+            max_hold_days=max_hold_days
+        )
+
+        first_prices = prices['Close'].values[entry_idx]
+        for i, label in enumerate(screener_data.index[pos]):
+            fills = sim['fill_idx'][i]
+            exit_idx = sim['exit_idx'][i]
+            paths[label] = (
+                ticker,
+                first_prices[i],
+                days[fills[fills >= 0]],
+                days[exit_idx] if exit_idx >= 0 else -1,
+                sim['sell_price'][i],
+                prices.index[exit_idx] if exit_idx >= 0 else None,
+            )
+    return paths
+
+
+def simulate_portfolio(screener_data, dfs, seed=100_000_000, n_split=4, step=0.9, target=1.1, max_hold_days=90,
+                       max_positions=200, end_date=None, calendar=None, rows=None):
+    """
+    신호를 날짜순으로 처리하면서 보유 종목 수와 현금을 함께 관리하는 이벤트 기반 포트폴리오 시뮬레이션.
+    추가 매수/매도 시점은 common.backtest_engine으로 미리 구하고, 보유 중인 포지션의 다음 이벤트는
+    날짜 기준 우선순위 큐(heap)에 넣어 신호 날짜가 될 때마다 그 전까지의 이벤트를 꺼내 처리합니다.
+
+    포지션 하나에는 seed / max_positions를 배정하고 n_split 회로 나눠 삽니다.
+    매번 같은 수량(첫 매수 금액 / 첫 매수 가격)을 사므로 평균 단가는 엔진의 buy_price와 같고,
+    진입할 때 사다리 전체 금액을 예약해 두기 때문에 추가 매수가 현금 부족으로 어긋나지 않습니다.
+
+    Parameters:
+        screener_data (pd.DataFrame): 신호 데이터 (Date, ticker)
+        dfs (dict): 티커별 가격 데이터 (index: Date)
+        seed (float): 초기 자금
+        n_split (int): 분할 매수 횟수
+        step (float): 분할 매수 가격 비율
+        target (float): 목표 매도 비율
+        max_hold_days (int): 최대 보유 기간 (달력 기준 일수)
+        max_positions (int): 동시 보유 종목 수 상한
+        end_date (str): 이 날짜 이후(포함) 신호는 진입하지 않음, None이면 전부
+        calendar (TradingCalendar), rows (dict): 가격 패널의 calendar와 day_rows(dfs), None이면 frame_calendar(dfs)로 만듦
+            (이벤트 날짜는 모두 이 달력의 거래일 순번으로 다룹니다)
+
+    Returns:
+        dict:
+            - trades (pd.DataFrame): 신호별 결과 (status: entered, held, cap, cash, no_data)
+            - equity (pd.Series): 이벤트 날짜별 원가 기준 평가금액 (현금 + 보유 원가)
+            - cash (float): 마지막 현금 (미청산 포지션의 예약금 제외)
+    """
+    if calendar is None:
+        calendar, rows = frame_calendar(dfs)
+    # 신호일을 한 번만 파싱해 진입일은 거래일 순번, 처리 순서는 그 날(포함) 이전 거래일 순번으로 씁니다.
+    # (달력에 없는 날짜의 신호는 가격 데이터가 없으므로 no_data가 되고, 순서만 직전 거래일을 따릅니다)
+    signal_dates = to_datetime64(screener_data['Date'].values)
+    dates = calendar.asof(signal_dates)
+    paths = _trade_paths(screener_data, calendar.locate(signal_dates), dfs, calendar, rows, n_split, step, target,
+                         max_hold_days)
+    budget = seed / max_positions
+    cash = float(seed)
+    reserved = 0.0
+    invested = 0.0
+
+    holdings = set()
+    positions = {}
+    heap = []
+    equity = {}
+
+    def process(until):
+        nonlocal cash, reserved, invested
+        while heap and heap[0][0] <= until:
+            day, kind, _, label = heapq.heappop(heap)
+            pos = positions[label]
+            if kind == FILL:
+                cost = pos['shares'] * pos['points'][pos['order']]
+                reserved -= cost
+                invested += cost
+                pos['order'] += 1
+                pos['cost'] += cost
+            else:
+                proceeds = pos['shares'] * pos['order'] * pos['sell_price']
+                cash += pos['reserved'] - pos['cost'] + proceeds
+                reserved -= pos['reserved'] - pos['cost']
+                invested -= pos['cost']
+                pos['proceeds'] = proceeds
+                holdings.discard(pos['ticker'])
+            equity[day] = cash + reserved + invested
+
+    records = []
+    signals = screener_data
+    if end_date is not None:
+        keep = dates < calendar.search(end_date)[0]
+        signals, dates = screener_data[keep], dates[keep]
+    order = np.argsort(dates, kind='stable')
+    labels = signals.index.values[order]
+    tickers = signals['ticker'].values[order]
+    dates = dates[order]
+    date_labels = signals['Date'].values[order]
+
+    seq = 0
+    for label, ticker, day, date in zip(labels, tickers, dates, date_labels):
+        process(day)
+        record = {'label': label, 'ticker': ticker, 'buy_date': date}
+        records.append(record)
+
+        if label not in paths:
+            record['status'] = 'no_data'
+            continue
+        if ticker in holdings:
+            record['status'] = 'held'
+            continue
+        if len(holdings) >= max_positions:
+            record['status'] = 'cap'
+            continue
+
+        _, first_price, fill_days, exit_day, sell_price, sell_label = paths[label]
+        points = ladder_prices([first_price], n_split, step)[0]
+        shares = budget / n_split / first_price
+        ladder_cost = shares * points.sum()
+        if cash < ladder_cost:
+            record['status'] = 'cash'
+            continue
+
+        first_cost = shares * points[0]
+        cash -= ladder_cost
+        reserved += ladder_cost - first_cost
+        invested += first_cost
+        holdings.add(ticker)
+        positions[label] = {
+            'ticker': ticker, 'points': points, 'shares': shares, 'order': 1,
+            'reserved': ladder_cost, 'cost': first_cost, 'sell_price': sell_price, 'proceeds': np.nan,
+        }
+        for fill_day in fill_days[1:]:
+            heapq.heappush(heap, (fill_day, FILL, seq, label))
+            seq += 1
+        if exit_day >= 0:
+            heapq.heappush(heap, (exit_day, EXIT, seq, label))
+            seq += 1
+        record.update({'status': 'entered', 'sell_date': sell_label, 'shares': shares})
+        equity[day] = cash + reserved + invested
+
+    process(np.iinfo(np.int64).max)
+
+    trades = pd.DataFrame(records)
+    if positions:
+        pos = pd.DataFrame.from_dict(positions, orient='index')[['order', 'cost', 'proceeds']]
+        trades = trades.join(pos, on='label')
+        trades['pnl'] = trades['proceeds'] - trades['cost']
+    equity = pd.Series(equity, name='equity').sort_index()
+    equity.index = pd.DatetimeIndex(calendar.dates[equity.index.values.astype(np.int64)].astype('datetime64[ns]'))
+    return {'trades': trades, 'equity': equity, 'cash': cash}
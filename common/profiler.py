@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+# 꺼져 있을 때는 span()이 이 객체를 그대로 돌려주고 count()는 바로 반환하므로 비용이 거의 없습니다.
+_NULL = nullcontext()
+ENV_VAR = 'KO_STOCKS_PROFILE'
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_spans = {}       # 경로 (이름 튜플) → [호출 수, 누적 초]
+_counters = {}
+_started = None
+
+
+def enable():
+    """
+    계측을 켜고 이전 기록을 지웁니다.
+    """
+    global _enabled, _started
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _started = time.perf_counter()
+        _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def enable_from_env(default_path=None):
+    """
+    환경 변수 KO_STOCKS_PROFILE(보고서 경로)이 있으면 계측을 켜고, 프로세스 종료 시 JSON 보고서를 씁니다.
+    엔트리 포인트(__main__)에서 한 번 호출합니다.
+
+    Returns:
+        bool: 켜졌는지 여부
+    """
+    path = os.environ.get(ENV_VAR, default_path)
+    if not path:
+        return False
+    enable()
+    atexit.register(write_report, path)
+    return True
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def _span(name):
+    stack = _stack()
+    stack.append(name)
+    path = tuple(stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        with _lock:
+            entry = _spans.setdefault(path, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+def span(name):
+    """
+    with span('screener'): ... 처럼 구간 시간을 잽니다. 같은 스레드 안에서 중첩되며,
+    같은 경로의 구간은 호출 수와 누적 시간으로 합쳐집니다. (종목별 반복도 노드 하나)
+    """
+    if not _enabled:
+        return _NULL
+    return _span(name)
+
+
+def count(name, n=1):
+    """
+    카운터를 n만큼 올립니다. (tables_read, rows_read, queries, cache_hits, trades_simulated, portfolio_entries 등)
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def profiled(name=None):
+    """
+    함수 전체를 span으로 감싸는 데코레이터
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _span(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def report():
+    """
+    지금까지의 구간을 트리로, 카운터는 그대로 담은 dict
+
+    Returns:
+        dict: {'wall_seconds', 'spans': [{'name', 'calls', 'seconds', 'children': [...]}], 'counters'}
+    """
+    with _lock:
+        spans = {path: list(entry) for path, entry in _spans.items()}
+        counters = dict(_counters)
+
+    nodes = {}
+    roots = []
+    for path in sorted(spans, key=len):
+        calls, seconds = spans[path]
+        node = {'name': path[-1], 'calls': calls, 'seconds': round(seconds, 6), 'children': []}
+        nodes[path] = node
+        parent = nodes.get(path[:-1])
+        (parent['children'] if parent else roots).append(node)
+
+    def order(children):
+        children.sort(key=lambda node: node['seconds'], reverse=True)
+        for node in children:
+            order(node['children'])
+    order(roots)
+
+    wall = time.perf_counter() - _started if _started is not None else 0.0
+    return {'wall_seconds': round(wall, 6), 'spans': roots, 'counters': counters}
+
+
+def write_report(path):
+    """
+    report()를 JSON 파일로 씁니다.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report(), file, ensure_ascii=False, indent=2)
+    print(f"프로파일 보고서: {path}")
@@ -0,0 +1,202 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from common.utils import connect_readonly, connect_wal, table_names
+from common.fundamentals import to_date_int
+from common.index_store import INDEX_PATH, load_index_store
+
+REGIME_PATH = 'regime.sqlite3'
+TABLE_NAME = 'regime'
+DEFAULT_PARAMS = {
+    'wavelet': {'wavelet': 'db4', 'level': 6, 'keep_levels': [2, 3, 4]},
+    'emd': {'imf_idxs': [4, 5]},
+}
+
+# 워커 프로세스에서 공유하는 입력 (Pool initializer가 채움)
+_values = None
+
+
+def create_table(conn):
+    """
+    (key, Date)를 기본키로 하는 밴드 값 테이블. key는 지수/방법/창 길이/파라미터 조합입니다.
+    """
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} "
+        f"(key TEXT NOT NULL, Date INTEGER NOT NULL, band REAL, PRIMARY KEY (key, Date))"
+    )
+
+
+def regime_key(market, method, window, params):
+    return f"{market}:{method}:{window}:{json.dumps(params, sort_keys=True)}"
+
+
+def _scaled_last(band):
+    # 창 안에서만 [-1, 1]로 스케일링해 마지막 값을 돌려줍니다. (전체 구간 min/max를 쓰면 미래를 봅니다)
+    low, high = band.min(), band.max()
+    if not np.isfinite(low) or high == low:
+        return np.nan
+    return 2 * (band[-1] - low) / (high - low) - 1
+
+
+def wavelet_band(values, wavelet='db4', level=6, keep_levels=(2, 3, 4)):
+    """
+    창 하나의 웨이블릿 밴드 값 (analysis.freq_analysis.band_via_wavelet과 같은 재구성을 창 안에서만 수행)
+    """
+    import pywt
+    coeffs = pywt.wavedec(values, wavelet=wavelet, level=level)
+    new_coeffs = [np.zeros_like(coeffs[0])]
+    for i in range(1, len(coeffs)):
+        lvl = level - (i - 1)
+        new_coeffs.append(coeffs[i] if lvl in keep_levels else np.zeros_like(coeffs[i]))
+    band = pywt.waverec(new_coeffs, wavelet=wavelet)[:len(values)]
+    return _scaled_last(band)
+
+
+def emd_band(values, imf_idxs=(4, 5)):
+    """
+    창 하나의 EMD 밴드 값 (창이 짧아 IMF 수가 모자라면 있는 것만 합성, 하나도 없으면 NaN)
+    """
+    from PyEMD import EMD
+    imfs = EMD()(values)
+    idxs = [i for i in imf_idxs if i < len(imfs)]
+    if not idxs:
+        return np.nan
+    return _scaled_last(imfs[idxs, :].sum(axis=0))
+
+
+BAND_FUNCTIONS = {'wavelet': wavelet_band, 'emd': emd_band}
+
+
+def _attach(values):
+    global _values
+    _values = values
+
+
+def _compute_chunk(args):
+    ends, window, method, params = args
+    func = BAND_FUNCTIONS[method]
+    return [func(_values[end - window + 1:end + 1], **params) for end in ends]
+
+
+def rolling_band(values, ends, window=500, method='wavelet', params=None, processes=None):
+    """
+    각 위치 end에서 직전 window개 값(end 포함)만으로 밴드 값을 계산합니다. (look-ahead 없음)
+    위치들을 묶음으로 나눠 프로세스 풀에서 병렬로 계산합니다.
+
+    Parameters:
+        values (np.ndarray): 날짜 오름차순 지수 값
+        ends (array-like): 계산할 위치 (window - 1 이상)
+        window (int): 창 길이 (거래일 수)
+        method (str): 'wavelet' 또는 'emd'
+        params (dict): 방법별 파라미터, None이면 DEFAULT_PARAMS
+        processes (int): 워커 수, None이면 CPU 수 (1이면 현재 프로세스에서 계산)
+
+    Returns:
+        np.ndarray: ends와 같은 길이의 밴드 값
+    """
+    params = DEFAULT_PARAMS[method] if params is None else params
+    values = np.asarray(values, dtype=float)
+    ends = np.asarray(ends, dtype=np.int64)
+    if ends.size == 0:
+        return np.empty(0)
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        _attach(values)
+        return np.array(_compute_chunk((ends, window, method, params)), dtype=float)
+
+    chunks = np.array_split(ends, min(len(ends), processes * 4))
+    with Pool(processes=processes, initializer=_attach, initargs=(values,)) as pool:
+        results = pool.map(_compute_chunk, [(chunk, window, method, params) for chunk in chunks])
+    return np.array([value for chunk in results for value in chunk], dtype=float)
+
+
+def update_regime(database_path=REGIME_PATH, index_path=INDEX_PATH, market='KOSPI', method='wavelet', window=500,
+                  params=None, processes=None):
+    """
+    지수 저장소의 모든 거래일에 대해 밴드 값을 계산해 저장합니다. 이미 계산한 날짜는 건너뛰므로
+    지수 저장소를 갱신한 뒤 실행하면 새 거래일만 계산합니다.
+
+    Parameters:
+        database_path (str): 밴드 값을 저장할 sqlite 파일
+        index_path (str): common.index_store 지수 저장소
+        market (str): 'KOSPI' 또는 'KOSDAQ'
+        method, window, params, processes: rolling_band 참고
+
+    Returns:
+        int: 새로 계산한 날짜 수
+    """
+    params = DEFAULT_PARAMS[method] if params is None else params
+    store = load_index_store(index_path)
+    if market not in store.dates:
+        return 0
+    dates = store.dates[market]
+    values = store.values[market][:, store._field_index('종가')]
+
+    key = regime_key(market, method, window, params)
+    conn = connect_wal(database_path)
+    create_table(conn)
+    done = {row[0] for row in conn.execute(f"SELECT Date FROM {TABLE_NAME} WHERE key = ?", (key,))}
+    ends = [end for end in range(window - 1, len(dates)) if int(dates[end]) not in done]
+
+    bands = rolling_band(values, ends, window, method, params, processes)
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {TABLE_NAME} VALUES (?, ?, ?)",
+            [(key, int(dates[end]), None if np.isnan(band) else float(band)) for end, band in zip(ends, bands)],
+        )
+    conn.close()
+    return len(ends)
+
+
+def load_regime(database_path=REGIME_PATH, market='KOSPI', method='wavelet', window=500, params=None):
+    """
+    저장된 밴드 값을 날짜별 시계열로 불러옵니다.
+
+    Returns:
+        pd.Series: index=Date (YYYYMMDD 정수, 오름차순), 값=밴드 ([-1, 1]), 파일이 없으면 빈 시계열 (읽기 전용으로 열고 파일은 만들지 않음)
+    """
+    params = DEFAULT_PARAMS[method] if params is None else params
+    name = f"{market.lower()}_{method}_band"
+    empty = pd.Series(np.array([], dtype=float), index=np.array([], dtype=np.int64), name=name)
+    if not os.path.exists(database_path):
+        return empty
+
+    conn = connect_readonly(database_path)
+    if TABLE_NAME not in table_names(conn):
+        conn.close()
+        return empty
+    df = pd.read_sql(
+        f"SELECT Date, band FROM {TABLE_NAME} WHERE key = ? ORDER BY Date", conn,
+        params=(regime_key(market, method, window, params),),
+    )
+    conn.close()
+    return pd.Series(df['band'].values, index=df['Date'].values.astype(np.int64), name=name)
+
+
+def regime_asof(regime, dates):
+    """
+    여러 날짜의 밴드 값을 한 번에 조회합니다. (각 날짜 이전(포함) 가장 최근 거래일 값, 없으면 NaN)
+    """
+    keys = to_date_int(dates)
+    pos = np.searchsorted(regime.index.values, keys, side='right') - 1
+    out = np.full(len(keys), np.nan)
+    found = pos >= 0
+    out[found] = regime.values[pos[found]]
+    return out
+
+
+def regime_asof_days(regime, days, calendar):
+    """
+    regime_asof와 같지만 기준일을 calendar의 거래일 순번으로 받습니다. 밴드 시계열을 달력에 한 번 맞춘 뒤
+    순번으로 읽습니다. (순번이 -1이거나 값이 없으면 NaN)
+    """
+    pos = calendar.align(regime.index.values)
+    days = np.asarray(days, dtype=np.int64)
+    out = np.full(len(days), np.nan)
+    found = days >= 0
+    found[found] &= pos[days[found]] >= 0
+    out[found] = regime.values[pos[days[found]]]
+    return out
@@ -0,0 +1,47 @@
+import numpy as np
+from catboost import CatBoostClassifier
+
+MODEL_PATH = 'models/profit_category_model.cbm'
+
+
+class CandidateScorer:
+    """
+    학습된 CatBoost 분류기를 한 번만 불러와 후보 종목들을 한 번의 predict_proba로 채점합니다.
+
+    Parameters:
+        model_path (str): .cbm 모델 파일
+        positive_class: 점수로 쓸 클래스 (profit_category_model은 duration 3분위, 0 = 가장 빨리 청산)
+        thread_count (int): 예측 스레드 수, -1이면 전체
+    """
+
+    def __init__(self, model_path=MODEL_PATH, positive_class=0, thread_count=-1):
+        self.model = CatBoostClassifier()
+        self.model.load_model(model_path)
+        self.features = list(self.model.feature_names_)
+        self.class_index = list(self.model.classes_).index(positive_class)
+        self.thread_count = thread_count
+
+    def score(self, features):
+        """
+        후보들의 positive_class 확률
+
+        Parameters:
+            features (pd.DataFrame): 후보 한 행씩, 모델 피처 컬럼을 포함 (없는 컬럼은 NaN)
+
+        Returns:
+            np.ndarray: 행 순서대로의 점수, 후보가 없으면 빈 배열
+        """
+        if len(features) == 0:
+            return np.empty(0)
+        X = features.reindex(columns=self.features).to_numpy(dtype=np.float32)
+        proba = self.model.predict_proba(X, thread_count=self.thread_count)
+        return proba[:, self.class_index]
+
+    def rank(self, features, min_score=None):
+        """
+        점수를 붙여 높은 순으로 정렬하고, min_score 미만은 뺍니다.
+        """
+        ranked = features.assign(score=self.score(features)).sort_values('score', ascending=False, kind='stable')
+        if min_score is not None:
+            ranked = ranked[ranked['score'] >= min_score]
+        return ranked
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _from_date_int(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    years = (keys // 10000 - 1970).astype('datetime64[Y]')
+    months = years.astype('datetime64[M]') + (keys // 100 % 100 - 1).astype('timedelta64[M]')
+    return months.astype('datetime64[D]') + (keys % 100 - 1).astype('timedelta64[D]')
+
+
+def to_datetime64(dates):
+    """
+    여러 형식이 섞여 들어오는 날짜 배열을 datetime64[D]로 바꿉니다.
+    YYYYMMDD 정수는 자릿수로 바로 변환하고, 문자열/객체 배열은 서로 다른 값만 골라(pd.factorize)
+    한 번씩 파싱하므로 같은 날짜가 반복되는 신호 테이블도 날짜 수만큼만 파싱합니다.
+
+    Parameters:
+        dates (array-like): 날짜 배열 또는 날짜 하나
+
+    Returns:
+        np.ndarray: datetime64[D] 배열
+    """
+    arr = np.asarray(dates)
+    if arr.ndim == 0:
+        arr = arr.reshape(1)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype('datetime64[D]')
+    if np.issubdtype(arr.dtype, np.integer):
+        return _from_date_int(arr)
+
+    if arr.dtype.kind in 'UO':
+        codes, uniques = pd.factorize(arr.ravel())
+        parsed = np.append(pd.to_datetime(np.asarray(uniques)).values.astype('datetime64[D]'), np.datetime64('NaT', 'D'))
+        return parsed[codes].reshape(arr.shape)
+    return pd.to_datetime(arr).values.astype('datetime64[D]')
+
+
+def epoch_days(dates):
+    """
+    날짜 배열을 1970-01-01 기준 일수(int64)로 바꿉니다. 달력 기준 보유 기간 계산용입니다.
+    """
+    return to_datetime64(dates).astype(np.int64)
+
+
+def lookup(sorted_values, values):
+    """
+    정렬된 정수 배열에서 각 값의 위치, 없으면 -1 (거래일 → 순번, 순번 → 티커 행 번호 조회에 씁니다)
+    """
+    values = np.asarray(values)
+    pos = np.searchsorted(sorted_values, values, side='left')
+    found = pos < len(sorted_values)
+    found[found] &= sorted_values[pos[found]] == values[found]
+    return np.where(found, pos, -1)
+
+
+def date_int(dates):
+    """
+    날짜 배열을 YYYYMMDD 정수 배열로 바꿉니다. (fundamental.sqlite3 / index.sqlite3의 Date 키)
+    """
+    days = to_datetime64(dates)
+    months = days.astype('datetime64[M]')
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    return (years * 10000 + (months.astype(np.int64) % 12 + 1) * 100
+            + (days - months.astype('datetime64[D]')).astype(np.int64) + 1)
+
+
+class TradingCalendar:
+    """
+    거래일을 0부터 시작하는 int32 순번으로 바꿔 주는 달력입니다.
+    날짜를 한 번만 순번으로 바꿔 두면 구간 자르기, 다음 거래일, 보유 기간 계산이 모두 정수 연산이 됩니다.
+    가격 패널의 날짜 축으로 만든 달력은 순번이 곧 패널의 행 번호입니다.
+
+    Attributes:
+        dates (np.ndarray): datetime64[D] 오름차순 거래일
+        days (np.ndarray): 거래일의 1970-01-01 기준 일수 (int32), 달력 기준 기간 = days[j] - days[i]
+        keys (np.ndarray): 거래일의 YYYYMMDD 정수 (int64)
+    """
+
+    def __init__(self, dates):
+        self.dates = np.unique(to_datetime64(dates))
+        self.days = self.dates.astype(np.int64).astype(np.int32)
+        self.keys = date_int(self.dates)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def search(self, dates, side='left'):
+        """
+        np.searchsorted와 같은 규칙의 순번 ('left': date 이후(포함) 첫 거래일, 'right': date 다음 첫 거래일)
+        """
+        return np.searchsorted(self.days, epoch_days(dates), side=side).astype(np.int32)
+
+    def asof(self, dates):
+        """
+        각 날짜 이전(포함) 가장 최근 거래일의 순번, 첫 거래일보다 이르면 -1
+        """
+        return self.search(dates, side='right') - 1
+
+    def locate(self, dates):
+        """
+        거래일의 순번, 거래일이 아니면 -1
+        """
+        return lookup(self.days, epoch_days(dates)).astype(np.int32)
+
+    def align(self, keys):
+        """
+        날짜순 YYYYMMDD 키(지수/밴드처럼 날짜별로 쌓인 저장소의 Date)를 순번마다 그 날(포함) 이전 가장 최근 행 번호로
+        한 번에 바꿉니다. 없으면 -1. 저장소를 달력에 한 번 맞춰 두면 이후 조회는 순번으로 배열을 읽기만 하면 됩니다.
+        """
+        return (np.searchsorted(np.asarray(keys, dtype=np.int64), self.keys, side='right') - 1).astype(np.int32)
+
+    def range(self, start=None, end=None):
+        """
+        [start, end] 구간(양끝 포함)의 순번 slice
+        """
+        i0 = 0 if start is None else int(self.search(start, side='left')[0])
+        i1 = len(self.days) if end is None else int(self.search(end, side='right')[0])
+        return slice(i0, i1)
+
+    def calendar_days(self, start, end):
+        """
+        두 순번 사이의 달력 기준 일수
+        """
+        return self.days[end] - self.days[start]
+
+    def labels(self, ordinals, fmt=DATE_FORMAT):
+        """
+        순번을 sqlite 테이블의 Date 컬럼과 같은 문자열로 돌려줍니다.
+        """
+        return pd.DatetimeIndex(self.dates[np.asarray(ordinals)]).strftime(fmt)
+
+
+def frame_calendar(dfs):
+    """
+    티커별 가격 DataFrame(index=Date)들의 모든 날짜로 달력을 만들고, 각 DataFrame 행의 순번을 함께 돌려줍니다.
+    날짜 문자열은 여기서 티커마다 한 번만 파싱합니다.
+
+    Parameters:
+        dfs (dict): 티커 → 가격 DataFrame (index: Date 오름차순)
+
+    Returns:
+        tuple: (TradingCalendar, {티커: 행별 순번 int32 배열})
+    """
+    dates = {ticker: to_datetime64(df.index) for ticker, df in dfs.items()}
+    calendar = TradingCalendar(np.concatenate(list(dates.values())) if dates else np.array([], dtype='datetime64[D]'))
+    return calendar, {ticker: calendar.locate(values) for ticker, values in dates.items()}
@@ -0,0 +1,246 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from common import profiler
+from common.utils import connect_readonly, connect_wal, sqlite_version, table_names
+from common.fundamentals import to_date_int
+
+UNIVERSE_PATH = 'universe.sqlite3'
+BUNDLED_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'krx_stock_list.xls')
+# market → (KRX marketType, 티커 접미사)
+MARKETS = {'kosdaq': ('kosdaqMkt', 'KQ'), 'kospi': ('stockMkt', 'KS')}
+TTL = 24 * 3600
+
+# sqlite_version(파일) → Universe
+_cache = {}
+
+
+def create_tables(conn):
+    """
+    스냅샷 목록(snapshots)과 스냅샷별 상장 종목(listing) 테이블을 만듭니다. snapshot은 YYYYMMDD 정수입니다.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS snapshots "
+        "(snapshot INTEGER NOT NULL, market TEXT NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (snapshot, market))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS listing "
+        "(snapshot INTEGER NOT NULL, market TEXT NOT NULL, 종목코드 TEXT NOT NULL, 회사명 TEXT, 업종 TEXT, "
+        "주요제품 TEXT, 상장일 TEXT, 결산월 TEXT, 대표자명 TEXT, 홈페이지 TEXT, 지역 TEXT, "
+        "PRIMARY KEY (snapshot, market, 종목코드))"
+    )
+
+
+def _normalize(df):
+    return df.assign(종목코드=df['종목코드'].astype(str).str.zfill(6))
+
+
+def fetch_listing(market):
+    """
+    KRX(kind.krx.co.kr)에서 시장별 상장법인목록을 받습니다.
+
+    Parameters:
+        market (str): 'kosdaq' 또는 'kospi'
+
+    Returns:
+        pd.DataFrame: 회사명, 종목코드(6자리), 업종, 주요제품, 상장일, ...
+    """
+    url = 'http://kind.krx.co.kr/corpgeneral/corpList.do?method=download&searchType=13&marketType=%s' % MARKETS[market][0]
+    df = pd.read_html(url, encoding='euc-kr', header=0)[0]
+    return _normalize(df)
+
+
+def read_bundled_listing(path=BUNDLED_LIST):
+    """
+    저장소에 들어 있는 krx_stock_list.xls(전 시장 상장법인목록)를 읽습니다. 시장 구분 컬럼은 없습니다.
+    """
+    return _normalize(pd.read_html(path, encoding='euc-kr', header=0)[0])
+
+
+def fetch_market_codes(market):
+    """
+    pykrx의 시장별 종목코드 목록 (번들 목록을 시장별로 나눌 때 사용, pykrx 시장 이름은 'KOSPI'/'KOSDAQ')
+    """
+    from pykrx import stock
+    return stock.get_market_ticker_list(market=market.upper())
+
+
+def _columns(conn):
+    return [row[1] for row in conn.execute("PRAGMA table_info(listing)")][2:]
+
+
+def refresh(database_path=UNIVERSE_PATH, ttl=TTL, fetch=fetch_listing, markets=tuple(MARKETS)):
+    """
+    시장별 최신 스냅샷이 ttl초보다 오래되었으면 KRX에서 다시 받아 오늘 날짜 스냅샷으로 저장합니다.
+    받아오지 못하면 기존 스냅샷을 그대로 둡니다.
+
+    Returns:
+        list: 새로 받은 시장 목록
+    """
+    conn = connect_wal(database_path)
+    create_tables(conn)
+    columns = _columns(conn)
+    now = time.time()
+    today = int(time.strftime('%Y%m%d'))
+
+    fetched = []
+    for market in markets:
+        row = conn.execute("SELECT MAX(fetched_at) FROM snapshots WHERE market = ?", (market,)).fetchone()
+        if row[0] is not None and now - row[0] < ttl:
+            continue
+        try:
+            df = fetch(market)
+        except Exception as e:
+            print(f"{market} 상장법인목록 조회 실패, 저장된 목록을 사용합니다: {e}")
+            continue
+
+        df = df.reindex(columns=columns).astype(str).where(df.reindex(columns=columns).notna(), None)
+        placeholders = ', '.join('?' * (len(columns) + 2))
+        with conn:
+            conn.execute("DELETE FROM listing WHERE snapshot = ? AND market = ?", (today, market))
+            conn.executemany(
+                f"INSERT INTO listing VALUES ({placeholders})",
+                [(today, market, *values) for values in df.itertuples(index=False)],
+            )
+            conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (today, market, now))
+        fetched.append(market)
+    conn.close()
+    return fetched
+
+
+class Universe:
+    """
+    날짜별 상장법인목록 스냅샷을 모아 종목마다 [상장일, 상폐 추정일) 구간으로 정리한 저장소.
+    상폐 추정일은 종목이 빠진 첫 스냅샷 날짜이므로, 첫 스냅샷 이전에 상폐된 종목은 알 수 없습니다.
+    """
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.snapshots = np.unique(listing['snapshot'].values.astype(np.int64))
+
+        keys = listing['종목코드'] + '.' + listing['market'].map(lambda market: MARKETS[market][1])
+        listing = listing.assign(ticker=keys.values)
+        first = listing.groupby('ticker')['snapshot'].min()
+        last = listing.groupby('ticker')['snapshot'].max()
+        listed = to_date_int(listing.groupby('ticker')['상장일'].first().reindex(first.index).fillna('1900-01-01'))
+
+        # 종목이 마지막으로 보인 스냅샷 다음 스냅샷(시장별)에서 빠졌으면 그날을 상폐일로 봅니다.
+        market = listing.groupby('ticker')['market'].first()
+        latest = listing.groupby('market')['snapshot'].max()
+        market_snapshots = {m: np.unique(group.values) for m, group in listing.groupby('market')['snapshot']}
+        delisted = np.full(len(first), np.iinfo(np.int64).max, dtype=np.int64)
+        for i, (ticker, seen) in enumerate(last.items()):
+            m = market[ticker]
+            if seen < latest[m]:
+                snaps = market_snapshots[m]
+                delisted[i] = snaps[np.searchsorted(snaps, seen, side='right')]
+
+        self.tickers = np.asarray(first.index)
+        self.markets = np.asarray(market.reindex(first.index))
+        self.start = np.minimum(listed, first.values.astype(np.int64))
+        self.end = delisted
+        self.bounds = {ticker: (s, e) for ticker, s, e in zip(self.tickers, self.start, self.end)}
+
+    def is_listed(self, ticker, date):
+        """
+        ticker('005930.KS')가 date에 상장되어 있었는지 (O(1))
+        """
+        bounds = self.bounds.get(ticker)
+        if bounds is None:
+            return False
+        date = int(to_date_int([date])[0])
+        return bounds[0] <= date < bounds[1]
+
+    def tickers_on(self, date, market=None):
+        """
+        date에 상장되어 있던 티커 배열 ('005930.KS' 형식)
+
+        Parameters:
+            date: 기준일
+            market (str): 'kosdaq' 또는 'kospi', None이면 전체
+        """
+        date = int(to_date_int([date])[0])
+        mask = (self.start <= date) & (date < self.end)
+        if market is not None:
+            mask &= self.markets == market
+        return self.tickers[mask]
+
+    def snapshot(self, market, date=None):
+        """
+        date 이전(포함) 가장 최근 스냅샷의 상장법인목록 (date가 None이면 최신)
+        """
+        listing = self.listing[self.listing['market'] == market]
+        snaps = np.unique(listing['snapshot'].values)
+        if date is None:
+            target = snaps[-1] if len(snaps) else None
+        else:
+            pos = np.searchsorted(snaps, to_date_int([date])[0], side='right') - 1
+            target = snaps[pos] if pos >= 0 else None
+        return listing[listing['snapshot'] == target].drop(columns=['snapshot', 'market']).reset_index(drop=True)
+
+
+def load_universe(database_path=UNIVERSE_PATH):
+    """
+    universe.sqlite3의 스냅샷을 Universe로 불러옵니다. 파일이 바뀌지 않았다면 캐시를 돌려줍니다.
+    파일은 읽기 전용으로 열고, 없으면 빈 Universe를 돌려줍니다. (테이블/WAL 설정은 스냅샷을 쓰는 refresh가 맡습니다)
+    """
+    empty = pd.DataFrame(columns=['snapshot', 'market', '종목코드', '상장일'])
+    if not os.path.exists(database_path):
+        return Universe(empty)
+
+    key = sqlite_version(database_path)
+    if key in _cache:
+        profiler.count('cache_hits.universe')
+        return _cache[key]
+
+    conn = connect_readonly(database_path)
+    listing = pd.read_sql("SELECT * FROM listing", conn) if 'listing' in table_names(conn) else empty
+    conn.close()
+    profiler.count('queries')
+    profiler.count('tables_read')
+    profiler.count('rows_read', len(listing))
+
+    universe = Universe(listing)
+    for old in [old for old in _cache if old[0] == key[0]]:
+        del _cache[old]
+    _cache[sqlite_version(database_path)] = universe
+    return universe
+
+
+def get_listing(market, database_path=UNIVERSE_PATH, ttl=TTL, fetch=fetch_listing, fetch_codes=fetch_market_codes):
+    """
+    시장별 상장법인목록. 로컬 스냅샷이 ttl초 이내면 네트워크 없이 돌려주고, 오래되었으면 KRX에서 갱신합니다.
+    KRX 조회가 실패하고 저장된 스냅샷도 없으면 krx_stock_list.xls에서 pykrx 시장별 종목코드에 있는 종목만 돌려주고,
+    그것도 받지 못하면 시장을 가를 수 없으므로 RuntimeError를 냅니다.
+
+    Parameters:
+        market (str): 'kosdaq' 또는 'kospi'
+        database_path (str): 스냅샷을 저장하는 sqlite 파일
+        ttl (float): 스냅샷 유효 시간(초)
+        fetch (callable): market → DataFrame, 기본은 KRX
+        fetch_codes (callable): market → 종목코드 리스트, 기본은 pykrx get_market_ticker_list
+
+    Returns:
+        pd.DataFrame: 회사명, 종목코드, 업종, 주요제품, 상장일, ... (getStockCode와 같은 모양)
+    """
+    if market not in MARKETS:
+        raise ValueError('invalid market ')
+
+    refresh(database_path, ttl=ttl, fetch=fetch, markets=(market,))
+    universe = load_universe(database_path)
+    df = universe.snapshot(market)
+    if not df.empty:
+        return df
+
+    # 번들 목록에는 시장 구분이 없으므로 pykrx의 시장별 종목코드로 나눕니다.
+    try:
+        codes = list(fetch_codes(market))
+    except Exception as e:
+        raise RuntimeError(f"{market} 상장법인목록도 시장별 종목코드도 받지 못했고 저장된 스냅샷이 없습니다.") from e
+    if not codes:
+        raise RuntimeError(f"{market} 시장별 종목코드가 비어 있어 {os.path.basename(BUNDLED_LIST)}를 시장별로 나눌 수 없습니다.")
+
+    print(f"{market} 스냅샷이 없어 {os.path.basename(BUNDLED_LIST)}를 pykrx 시장별 종목코드로 나눠 사용합니다.")
+    df = read_bundled_listing()
+    return df[df['종목코드'].isin(codes)].reset_index(drop=True)
@@ -1,5 +1,8 @@
+import os
+import sqlite3
 import pandas as pd
 import yaml
+from urllib.request import pathname2url
 
 def load_yaml(file_path):
     """
@@ -23,20 +26,52 @@ def load_yaml(file_path):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
-def getStockCode(market):
-    if market == 'kosdaq':
-        url_market = 'kosdaqMkt'
-    elif market == 'kospi':
-        url_market = 'stockMkt'
-    else:
-        raise ValueError('invalid market ')
+def connect_wal(database_path, **kwargs):
+    """
+    WAL 저널 모드로 sqlite 연결을 엽니다. (읽기와 쓰기가 서로 막지 않고, 커밋 비용이 작습니다)
+    """
+    con = sqlite3.connect(database_path, **kwargs)
+    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute("PRAGMA synchronous=NORMAL;")
+    return con
+
+def connect_readonly(database_path, **kwargs):
+    """
+    sqlite 파일을 읽기 전용으로 엽니다. 파일을 만들거나 저널 모드/스키마를 바꾸지 않으므로 읽기만 하는 로더에서 씁니다.
+    """
+    uri = 'file:' + pathname2url(os.path.abspath(database_path)) + '?mode=ro'
+    return sqlite3.connect(uri, uri=True, **kwargs)
 
-    url = 'http://kind.krx.co.kr/corpgeneral/corpList.do?method=download&searchType=13&marketType=%s' % url_market
-    df = pd.read_html(url, encoding='euc-kr', header=0)[0]
-    return df.assign(종목코드=df['종목코드'].astype(str).str.zfill(6))
+def table_names(conn):
+    """
+    연결된 sqlite 파일의 테이블 이름 집합
+    """
+    return {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def sqlite_version(database_path):
+    """
+    sqlite 파일이 바뀌었는지 판단할 키 (WAL 모드에서는 커밋이 -wal 파일에 먼저 쌓이므로 둘 다 봅니다)
+    """
+    wal_path = database_path + '-wal'
+    wal_mtime = os.path.getmtime(wal_path) if os.path.exists(wal_path) else None
+    return os.path.abspath(database_path), os.path.getmtime(database_path), wal_mtime
+
+def getStockCode(market, ttl=None):
+    """
+    시장별 상장법인목록. common.universe의 로컬 스냅샷(기본 하루 TTL)을 쓰므로 매번 KRX를 조회하지 않습니다.
+
+    Parameters:
+        market (str): 'kosdaq' 또는 'kospi'
+        ttl (float): 스냅샷 유효 시간(초), None이면 common.universe.TTL
+
+    Returns:
+        pd.DataFrame: 회사명, 종목코드(6자리), 업종, 주요제품, 상장일, ...
+    """
+    from common import universe
+    return universe.get_listing(market, ttl=universe.TTL if ttl is None else ttl)
 
-def getAllStockCode():
+def getAllStockCode(ttl=None):
     return pd.concat(
-        [getStockCode(market).assign(type=code) 
+        [getStockCode(market, ttl).assign(type=code) 
             for market, code in zip(['kosdaq', 'kospi'], ['KQ', 'KS'])]
     )
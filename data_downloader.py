@@ -1,10 +1,15 @@
-from pykrx import stock
 import yfinance as yf
 import pandas as pd
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import sqlite3
-from common.utils import getAllStockCode
+from common import profiler
+from common.utils import getAllStockCode, connect_wal
+from common.fetch import RateLimiter, Throughput, retry, run_pipeline
+from common.market_cap import update_market_cap, load_market_cap_store
+from common.index_store import update_index
+from common.regime import update_regime
+from fundamental import get_trading_days
 
 
 def table_exists(con, table_name):
@@ -33,13 +38,54 @@ def get_latest_date(con, table_name):
     Returns:
         str or None: 최신 날짜 (YYYY-MM-DD 형식), 데이터가 없으면 None
     """
-    query = f"SELECT MAX(Date) FROM {table_name};"
+    query = f"SELECT MAX(Date) FROM '{table_name}';"
     cursor = con.execute(query)
     result = cursor.fetchone()[0]
     if result:
         return pd.to_datetime(result).strftime('%Y-%m-%d')
     return None
 
+def ensure_price_table(con, table_name, columns):
+    """
+    Date를 기본키로 하는 가격 테이블을 준비합니다.
+    예전에 to_sql로 만든 테이블(기본키 없음)에는 Date 유니크 인덱스를 만들고, 없는 컬럼은 추가합니다.
+    """
+    if not table_exists(con, table_name):
+        column_defs = ', '.join(f'"{column}" REAL' for column in columns)
+        con.execute(f"CREATE TABLE '{table_name}' (Date TIMESTAMP PRIMARY KEY, {column_defs})")
+        return
+
+    existing = {row[1] for row in con.execute(f"PRAGMA table_info('{table_name}')")}
+    for column in columns:
+        if column not in existing:
+            con.execute(f"ALTER TABLE '{table_name}' ADD COLUMN \"{column}\" REAL")
+    con.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS 'ux_{table_name}_Date' ON '{table_name}' (Date)")
+
+
+def upsert_prices(con, table_name, df):
+    """
+    일봉 DataFrame(index=Date)을 executemany INSERT OR REPLACE로 저장합니다.
+    기존 행은 날짜가 겹칠 때만 덮어쓰고 나머지 이력은 그대로 둡니다. 커밋은 호출한 쪽에서 합니다.
+
+    Parameters:
+        con (sqlite3.Connection): SQLite 연결 객체
+        table_name (str): 대상 테이블 이름 (티커)
+        df (pd.DataFrame): index=Date
+
+    Returns:
+        int: 저장한 행 수
+    """
+    ensure_price_table(con, table_name, df.columns)
+    dates = pd.to_datetime(df.index).strftime('%Y-%m-%d %H:%M:%S')
+    values = df.astype(object).where(df.notna(), None).values.tolist()
+    columns = ', '.join(['Date'] + [f'"{column}"' for column in df.columns])
+    placeholders = ', '.join('?' * (len(df.columns) + 1))
+    con.executemany(
+        f"INSERT OR REPLACE INTO '{table_name}' ({columns}) VALUES ({placeholders})",
+        [(date, *row) for date, row in zip(dates, values)]
+    )
+    return len(df)
+
 # 데이터 가져오기
 def get_stock_data(ticker, start_date="2020-01-01", end_date=None):
     """
@@ -57,18 +103,73 @@ def get_stock_data(ticker, start_date="2020-01-01", end_date=None):
     return stock_data
 
 
-def download():
-    df = getAllStockCode()
-    con = sqlite3.connect('kr_stocklist.sqlite3')
+PRICE_COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+
+def get_stock_data_batch(tickers, start_date, end_date=None):
+    """
+    여러 티커의 일봉을 yf.download 한 번으로 받아 티커별로 나눕니다.
+
+    Parameters:
+        tickers (list): 주식 티커 리스트
+        start_date (str): 시작 날짜 (YYYY-MM-DD 형식)
+        end_date (str): 종료 날짜 (YYYY-MM-DD 형식)
+
+    Returns:
+        dict: 티커 → 일봉 DataFrame (columns: Close, High, Low, Open, Volume), 데이터가 없는 티커는 제외
+    """
+    data = yf.download(tickers, start=start_date, end=end_date, interval="1d", group_by='ticker', progress=False)
+    if data.empty:
+        return {}
+
+    result = {}
+    for ticker in tickers:
+        if ticker not in data.columns.get_level_values(0):
+            continue
+        # 여러 티커를 받으면 날짜가 합집합으로 맞춰지므로 거래가 없던 날은 제거합니다.
+        stock_data = data[ticker][PRICE_COLUMNS].dropna(how='all')
+        if not stock_data.empty:
+            result[ticker] = stock_data
+    return result
+
+
+@profiler.profiled('download')
+def download(database_path='kr_stocklist.sqlite3', universe=None, fetch_prices=get_stock_data_batch,
+             fetch_market_cap=None, workers=8, batch_size=20, yf_rate=2.0, krx_rate=5.0,
+             commit_every=100, market_cap_path='trade_amount.sqlite3', trading_days=None):
+    """
+    전 종목 일봉 + 시가총액을 받아 티커별 테이블에 저장합니다.
+    가격은 같은 시작일의 종목끼리 batch_size개씩 묶어 받고, 워커 스레드가 소스별 rate limit과
+    재시도(지수 백오프) 아래에서 병렬로 받아오며, 저장은 writer 스레드 하나가 맡습니다.
+    저장은 Date 기본키 upsert라 증분 갱신 시에도 기존 이력이 유지되고, commit_every 종목마다 한 번씩 커밋합니다.
+    시가총액은 종목별로 조회하지 않고 거래일마다 전 종목을 한 번에 받아 market_cap_path에 쌓아 둔 뒤
+    (common.market_cap, 없는 날짜만 조회) 종목별 시계열로 꺼내 붙입니다.
+
+    Parameters:
+        database_path (str): 저장할 sqlite 파일
+        universe (pd.DataFrame): 종목 목록 (columns: 종목코드, type), None이면 getAllStockCode()
+        fetch_prices (callable): (tickers, start, end) → {ticker: DataFrame}, 기본은 yfinance
+        fetch_market_cap (callable): 'YYYYMMDD' → DataFrame (index=티커), None이면 pykrx get_market_cap_by_ticker
+        workers (int): 다운로드 워커 수
+        batch_size (int): yfinance 한 번에 받을 티커 수
+        yf_rate (float): yfinance 초당 호출 수 제한
+        krx_rate (float): pykrx 초당 호출 수 제한
+        commit_every (int): 이 종목 수마다 한 트랜잭션으로 커밋
+        market_cap_path (str): 날짜별 시가총액을 쌓아 두는 sqlite 파일
+        trading_days (list): 'YYYYMMDD' 거래일 리스트, None이면 fundamental.get_trading_days로 조회
+
+    Returns:
+        dict: 처리량 (tickers, rows, errors, seconds, tickers_per_sec, rows_per_sec)
+    """
+    df = getAllStockCode() if universe is None else universe
+    con = sqlite3.connect(database_path)
+    end_date = datetime.today().strftime('%Y-%m-%d')
 
-    # offset = 1618
-    for _, (ticker, type) in enumerate(zip(df["종목코드"], df["type"])):
-        # if i < offset:
-        #     continue
-        
+    # 1) 종목별 시작일 결정 (기존 테이블이 있으면 마지막 날짜 다음 날부터)
+    groups = {}
+    for ticker, type in zip(df["종목코드"], df["type"]):
         # 티커 심볼
         ticker_symbol = f"{ticker}.{type}"  # 한국 거래소(KRX)에서 티커
-        end_date = datetime.today().strftime('%Y-%m-%d')
 
         if table_exists(con, ticker_symbol):
             latest_date = get_latest_date(con, ticker_symbol)
@@ -79,18 +180,72 @@ def download():
         else:
             start_date = (datetime.today() - relativedelta(years=10)).strftime('%Y-%m-%d')
 
-        stock_data = get_stock_data(ticker_symbol, start_date, end_date)
-        if stock_data.empty:
-            continue
-
         if start_date <= end_date:
+            groups.setdefault(start_date, []).append(ticker_symbol)
+    con.close()
+    profiler.count('queries', 2 * len(df))
+
+    if not groups:
+        return Throughput().report()
+
+    # 2) 시가총액은 필요한 구간의 거래일을 날짜 단위로 한 번에 받아 둡니다.
+    if trading_days is None:
+        trading_days = get_trading_days(min(groups), end_date)
+    with profiler.span('market_cap'):
+        update_market_cap(market_cap_path, trading_days, fetch=fetch_market_cap, rate=krx_rate)
+        market_caps = load_market_cap_store(market_cap_path)
+
+    # 3) 같은 시작일끼리 batch_size개씩 묶어 병렬로 받기
+    jobs = [
+        (start_date, symbols[i:i + batch_size])
+        for start_date, symbols in groups.items() for i in range(0, len(symbols), batch_size)
+    ]
+    yf_limiter = RateLimiter(yf_rate)
+
+    def fetch(job):
+        start_date, symbols = job
+        # 워커 스레드의 구간은 최상위 'fetch_prices' 노드로 모입니다.
+        with profiler.span('fetch_prices'):
+            prices = retry(fetch_prices, symbols, start_date, end_date, limiter=yf_limiter)
+        for ticker_symbol, stock_data in prices.items():
             # market cap
-            market_cap = stock.get_market_cap_by_date(start_date, end_date, ticker)
+            market_cap = market_caps.series(ticker_symbol, start_date, end_date)
             if market_cap.empty:
                 continue
             market_cap.index.name = 'Date'
-
-            stock_data.columns = ['Close', 'High', 'Low', 'Open', 'Volume']
-
-            stock_data = stock_data.join(market_cap, how='left')
-            stock_data.to_sql(ticker_symbol, con, if_exists='replace')
+            stock_data.index.name = 'Date'
+            yield ticker_symbol, stock_data.join(market_cap, how='left')
+
+    # 4) 저장은 writer 스레드 하나에서만 (sqlite 연결은 이 스레드 전용)
+    con = connect_wal(database_path, check_same_thread=False)
+    pending = [0]
+
+    def write(item):
+        ticker_symbol, stock_data = item
+        with profiler.span('upsert'):
+            rows = upsert_prices(con, ticker_symbol, stock_data)
+        profiler.count('rows_written', rows)
+        pending[0] += 1
+        if pending[0] >= commit_every:
+            con.commit()
+            pending[0] = 0
+        return rows
+
+    stats = run_pipeline(jobs, fetch, write, workers=workers)
+    con.commit()
+    con.close()
+
+    report = stats.report()
+    print(f"{report['tickers']} tickers, {report['rows']} rows in {report['seconds']:.1f}s "
+          f"({report['tickers_per_sec']:.2f} tickers/s, {report['rows_per_sec']:.0f} rows/s, {report['errors']} errors)")
+    return report
+
+
+if __name__ == '__main__':
+    # KO_STOCKS_PROFILE=results/profile/download.json 으로 실행하면 단계별 시간/카운터 보고서를 남깁니다.
+    profiler.enable_from_env()
+    download()
+    with profiler.span('update_index'):
+        update_index()
+    with profiler.span('update_regime'):
+        update_regime()
@@ -1,66 +1,116 @@
 from pykrx import stock
-import sqlite3
 import pandas as pd
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from tqdm import tqdm
-from common.utils import getStockCode
-
-
-def get_trade_amount(start_date, end_date):
-    con = sqlite3.connect('trade_amount.sqlite3')
-
-    df = pd.concat(
-        [getStockCode(market).assign(type=code) 
-         for market, code in zip(['kosdaq', 'kospi'], ['KQ', 'KS'])]
-    )
-
-    # offset = 477
-    for i, (ticker, type) in tqdm(enumerate(zip(df["종목코드"], df["type"]))):
-        # if i < offset:
-        #     continue
-        # 티커 심볼
-        ticker_symbol = f"{ticker}.{type}"  # 한국 거래소(KRX)에서 티커
-        try:
-            market_cap = stock.get_market_cap_by_date(start_date, end_date, ticker)
-            if market_cap.empty:
-                continue
-            market_cap.index.name = 'Date'
-            market_cap.to_sql(ticker_symbol, con, if_exists='replace')
-        except Exception as e:
-            print(f"Error on {ticker_symbol}: {e}")
+from common.utils import connect_wal
+from common.fetch import RateLimiter, retry, run_pipeline
+from common import fundamentals, market_cap, profiler
 
-    # 데이터베이스 연결 종료
-    con.close()
 
-def get_fundamental(start_date, end_date):
-    # 삼성전자('005930')의 일별 시가총액 조회
-    con = sqlite3.connect('fundamental.sqlite3')
-
-    # 날짜 범위 생성
-    date_range = pd.date_range(start=start_date, end=end_date, freq='B')  # 'B'는 영업일(주말 제외)을 의미
-
-    # 데이터 수집 및 저장
-    for date in tqdm(date_range, desc="Collecting fundamental data"):
-        table_name = date.strftime('%Y%m%d')
-        try:
-            # 해당 날짜의 펀더멘털 데이터 조회
-            fundamental_df = stock.get_market_fundamental_by_ticker(table_name)
-            
-            # 데이터베이스에 저장
-            fundamental_df.to_sql(table_name, con, if_exists='replace')
-        except Exception as e:
-            print(f"Error on {table_name}: {e}")
+def get_trading_days(start_date, end_date):
+    """
+    코스피 지수 일봉의 날짜로 거래일 목록을 만듭니다. (주말/공휴일 제외)
+
+    Parameters:
+        start_date (str): 시작일 (YYYY-MM-DD 또는 YYYYMMDD)
+        end_date (str): 종료일 (YYYY-MM-DD 또는 YYYYMMDD)
+
+    Returns:
+        list: 'YYYYMMDD' 문자열 리스트
+    """
+    df_idx = stock.get_index_ohlcv_by_date(start_date.replace('-', ''), end_date.replace('-', ''), '1001')
+    return [date.strftime('%Y%m%d') for date in pd.to_datetime(df_idx.index)]
+
+
+@profiler.profiled('get_fundamental')
+def get_fundamental(start_date, end_date, database_path='fundamental.sqlite3', trading_days=None,
+                    fetch=stock.get_market_fundamental_by_ticker, workers=4, rate=2.0):
+    """
+    거래일별 전 종목 펀더멘털을 받아 (Date, 티커) long 테이블 하나에 저장합니다.
+    이미 저장된 날짜는 건너뛰고, 날짜마다 커밋하므로 중간에 멈춰도 다시 실행하면 이어서 받습니다.
+
+    Parameters:
+        start_date (str): 시작일 (YYYY-MM-DD)
+        end_date (str): 종료일 (YYYY-MM-DD)
+        database_path (str): 저장할 sqlite 파일
+        trading_days (list): 'YYYYMMDD' 거래일 리스트, None이면 get_trading_days로 조회
+        fetch (callable): 'YYYYMMDD' → DataFrame (index=티커), 기본은 pykrx
+        workers (int): 동시에 조회할 날짜 수
+        rate (float): pykrx 초당 호출 수 제한
+
+    Returns:
+        dict: 처리량 (tickers 항목은 저장한 날짜 수)
+    """
+    con = connect_wal(database_path, check_same_thread=False)
+    # 예전 날짜별 테이블은 수집할 때 long 테이블로 옮깁니다. (load_fundamental_store는 읽기만 합니다)
+    fundamentals.import_daily_tables(con)
+    done = {str(row[0]) for row in con.execute(f"SELECT DISTINCT Date FROM {fundamentals.TABLE_NAME}")}
+    profiler.count('queries')
+
+    if trading_days is None:
+        with profiler.span('trading_days'):
+            trading_days = get_trading_days(start_date, end_date)
+    todo = [date for date in trading_days if date not in done]
+    print(f"Collecting fundamental data: {len(todo)} / {len(trading_days)} days")
+
+    limiter = RateLimiter(rate)
+
+    def fetch_day(date):
+        # 해당 날짜의 펀더멘털 데이터 조회 (워커 스레드의 구간은 최상위 'fetch_fundamental' 노드로 모입니다)
+        with profiler.span('fetch_fundamental'):
+            fundamental_df = retry(fetch, date, limiter=limiter)
+        if not fundamental_df.empty:
+            yield date, fundamental_df
+
+    def write(item):
+        date, fundamental_df = item
+        with profiler.span('write'):
+            fundamentals.write_fundamentals(con, date, fundamental_df)
+            con.commit()
+        profiler.count('rows_written', len(fundamental_df))
+        return len(fundamental_df)
+
+    stats = run_pipeline(todo, fetch_day, write, workers=workers)
 
     # 데이터베이스 연결 종료
     con.close()
+    return stats.report()
+
+
+@profiler.profiled('get_trade_amount')
+def get_trade_amount(start_date, end_date, database_path='trade_amount.sqlite3', trading_days=None, fetch=None,
+                     workers=4, rate=2.0):
+    """
+    시가총액/거래량/거래대금/상장주식수를 거래일마다 전 종목 한 번에 받아 (Date, 티커) long 테이블에 저장합니다.
+    종목별로 10년치를 따로 조회하던 방식 대신 날짜 단위로 받고, 이미 있는 날짜는 건너뜁니다.
+    종목별 시계열은 common.market_cap.load_market_cap_store(...).series(ticker)로 읽습니다.
+
+    Parameters:
+        start_date (str): 시작일 (YYYY-MM-DD)
+        end_date (str): 종료일 (YYYY-MM-DD)
+        database_path (str): 저장할 sqlite 파일
+        trading_days (list): 'YYYYMMDD' 거래일 리스트, None이면 get_trading_days로 조회
+        fetch (callable): 'YYYYMMDD' → DataFrame (index=티커), None이면 pykrx get_market_cap_by_ticker
+        workers (int): 동시에 조회할 날짜 수
+        rate (float): pykrx 초당 호출 수 제한
+
+    Returns:
+        dict: 처리량 (tickers 항목은 저장한 날짜 수)
+    """
+    if trading_days is None:
+        trading_days = get_trading_days(start_date, end_date)
+    return market_cap.update_market_cap(database_path, trading_days, fetch=fetch, workers=workers, rate=rate)
 
 
 if __name__ == '__main__':
+    # KO_STOCKS_PROFILE=results/profile/fundamental.json 으로 실행하면 단계별 시간/카운터 보고서를 남깁니다.
+    profiler.enable_from_env()
+
     # 오늘 날짜 (end_date)
     end_date = (datetime.today() - relativedelta(days=1)).strftime("%Y-%m-%d") 
 
     # 10년 전 날짜 (start_date)
     start_date = (datetime.today() - relativedelta(years=10, days=1)).strftime("%Y-%m-%d")
     get_trade_amount(start_date, end_date)
+    get_fundamental(start_date, end_date)
     
\ No newline at end of file
@@ -1,8 +1,21 @@
 import sqlite3
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from pykrx import stock
 import os
+from common.backtest_engine import simulate_entries
+from common.portfolio import simulate_portfolio
+from common.feature_store import write_results, export_excel
+from common.scoring import CandidateScorer
+from common.panel import Panel, default_panel_path, load_price_panel
+from common.fundamentals import load_fundamental_store, to_date_int
+from common.index_store import load_index_store
+from common.regime import load_regime, regime_asof_days
+from common.trading_calendar import frame_calendar, lookup
+from common import indicators, profiler
+from common.utils import load_yaml
+
+# 이 날짜(YYYYMMDD) 이후 신호는 백테스트에서 제외
+END_DATE = 20250422
 
 
 def get_all_tables(conn):
@@ -42,10 +55,8 @@ def set_signal(df):
     Returns:
         pd.DataFrame: 신호가 감지된 데이터
     """
-    # 장대양봉 조건: (high - low) > 특정 기준 & 종가 > 시가
-    df['COR'] = (df['Close'] - df['Open']) / df['Open']
-    df['vrate'] = df['Volume'] / df['Volume'].rolling(window=60).mean()
-    return df
+    # 장대양봉 크기(COR)와 60일 평균 대비 거래량(vrate), screener.py와 같은 common.indicators 엔진으로 계산
+    return indicators.compute_frame(df, ['COR', 'vrate'])
 
 
 def identify_candle_signal(df_cor, df_vrate):
@@ -62,20 +73,19 @@ def identify_candle_signal(df_cor, df_vrate):
 
 
 def set_moving_average(df):
-    for interval in [20, 60, 200]:
-        ma = df['Close'].rolling(interval).mean()
-        df[f'ma{interval}pct'] = (df['Close'] - ma) / ma
-    return df
+    return indicators.compute_frame(df, ['ma20pct', 'ma60pct', 'ma200pct'])
 
 # 매수 전략 계산
 
-def calculate_buy_points(first_price):
+def calculate_buy_points(first_price, n_split=4, step=0.9):
     """
     매수 포인트와 각 단계에서 구매할 수량 계산
 
     Parameters:
         seed (float): 초기 투자 금액
         first_price (float): 첫 번째 매수 가격
+        n_split (int): 분할 매수 횟수
+        step (float): 직전 매수 가격 대비 다음 매수 가격 비율
 
     Returns:
         list: 매수 포인트와 매수 금액
@@ -83,29 +93,111 @@ def calculate_buy_points(first_price):
     positions = []
     positions.append(first_price)
 
-    for i in range(1, 4):
-        next_price = positions[-1] * 0.9  # 이전 가격의 -10%
+    for i in range(1, n_split):
+        next_price = positions[-1] * step  # 기본값은 이전 가격의 -10%
         positions.append(next_price)
 
     return positions
 
 # 매도 전략 계산
 
-def calculate_sell_point(buy_price):
+def calculate_sell_point(buy_price, target=1.1):
     """
-    매도 가격 계산 (평균 매수 단가의 +10%)
+    매도 가격 계산 (기본값: 평균 매수 단가의 +10%)
 
     Parameters:
         average_price (float): 평균 매수 가격
+        target (float): 평균 매수 단가 대비 목표 매도 비율
 
     Returns:
         float: 매도 목표 가격
     """
-    return buy_price * 1.1
+    return buy_price * target
+
+def simulate_trades(screener_data, dfs, n_split=4, step=0.9, target=1.1, max_hold_days=90, calendar=None, rows=None):
+    """
+    종목별로 모든 진입을 모아 벡터화 엔진으로 한 번에 시뮬레이션합니다.
+
+    Parameters:
+        screener_data (pd.DataFrame): 선정된 종목 데이터 (Date, ticker)
+        dfs (dict): 티커별 가격 데이터 (index: Date)
+        n_split (int): 분할 매수 횟수
+        step (float): 분할 매수 가격 비율
+        target (float): 목표 매도 비율
+        max_hold_days (int): 최대 보유 기간 (달력 기준 일수)
+        calendar (TradingCalendar), rows (dict): frame_calendar(dfs)의 결과, None이면 여기서 만듦
+
+    Returns:
+        dict: screener_data의 행 라벨 → 거래 결과 dict
+    """
+    if calendar is None:
+        calendar, rows = frame_calendar(dfs)
+    signal_days = calendar.locate(screener_data['Date'].values)
+
+    trades = {}
+    for ticker, pos in screener_data.groupby('ticker').indices.items():
+        if ticker not in dfs:
+            continue
+
+        prices = dfs[ticker]
+        entry_idx = lookup(rows[ticker], signal_days[pos])
+        if (entry_idx < 0).any():
+            raise KeyError(f"{ticker}: 가격 데이터에 없는 진입일이 있습니다.")
+
+        sim = simulate_entries(
+            prices['High'].values, prices['Low'].values, prices['Close'].values,
+            calendar.days[rows[ticker]].astype(np.int64), entry_idx, n_split=n_split, step=step, target=target,
+            max_hold_days=max_hold_days
+        )
+
+        for i, label in enumerate(screener_data.index[pos]):
+            closed = sim['exit_idx'][i] >= 0
+            trades[label] = {
+                'buy_price': sim['buy_price'][i],
+                'order': int(sim['order'][i]),
+                'sell_date': prices.index[sim['exit_idx'][i]] if closed else None,
+                'sell_price': sim['sell_price'][i] if closed else None,
+                'profit_pct': sim['profit_pct'][i] if closed else None,
+                'duration': int(sim['duration'][i]) if closed else None,
+            }
+    return trades
 
 # 백테스트 수행
 
-def run_backtest(root, screener_data, dfs, n_split=4):
+def signal_features(screener_data, dfs, df_fund, days_high):
+    """
+    신호마다 run_backtest 결과와 같은 이름의 피처(buy_price, cor, vrate, mapct, 거래대금, 시가총액,
+    days_since_max_high, 펀더멘털)를 한 번에 모읍니다. 모델 채점용 피처 행렬입니다.
+
+    Parameters:
+        screener_data (pd.DataFrame): 신호 데이터 (Date, ticker, cor, vrate, ma200pct)
+        dfs (dict): 티커별 가격 데이터 (index: Date)
+        df_fund (pd.DataFrame): screener_data와 같은 index의 펀더멘털
+        days_high (pd.DataFrame): days_since_max_high (index=Date, columns=티커)
+
+    Returns:
+        pd.DataFrame: screener_data와 같은 index의 피처
+    """
+    features = pd.DataFrame({
+        'cor': screener_data['cor'], 'vrate': screener_data['vrate'], 'mapct': screener_data['ma200pct'],
+    }, index=screener_data.index)
+
+    for ticker, each in screener_data.groupby('ticker'):
+        if ticker not in dfs:
+            continue
+        prices = dfs[ticker].loc[each['Date'], ['Close', '거래대금', '시가총액']]
+        features.loc[each.index, 'buy_price'] = prices['Close'].values
+        features.loc[each.index, '거래대금'] = prices['거래대금'].values
+        features.loc[each.index, '시가총액'] = prices['시가총액'].values
+        if ticker in days_high.columns:
+            features.loc[each.index, 'days_since_max_high'] = days_high[ticker].reindex(each['Date']).values
+
+    return features.join(df_fund)
+
+
+@profiler.profiled('run_backtest')
+def run_backtest(root, screener_data, dfs, n_split=4, step=0.9, target=1.1, max_hold_days=90, vectorized=False,
+                 days_high=None, window_days=600, scorer=None, min_score=None, calendar=None, rows=None):
     """
     백테스트 실행
 
@@ -113,137 +205,208 @@ def run_backtest(root, screener_data, dfs, n_split=4):
         screener_data (pd.DataFrame): 선정된 종목 데이터 (Date, ticker)
         price_data (pd.DataFrame): 종목 가격 데이터
         seed (float): 초기 투자 금액
+        n_split (int): 분할 매수 횟수
+        step (float): 분할 매수 가격 비율 (calculate_buy_points)
+        target (float): 목표 매도 비율 (calculate_sell_point)
+        max_hold_days (int): 최대 보유 기간 (달력 기준 일수)
+        vectorized (bool): True면 일별 루프 대신 벡터화 엔진(simulate_trades)으로 거래를 계산
+        days_high (pd.DataFrame): 미리 계산한 days_since_max_high (index=Date, columns=티커),
+            None이면 신호가 난 종목만 종목별로 한 번씩 계산 (common.indicators.days_since_max_high_panel 참고)
+        window_days (int): days_since_max_high 창 길이 (거래일 수)
+        scorer (CandidateScorer): 주어지면 모든 신호를 한 번의 predict_proba로 채점해 'score' 컬럼을 붙이고,
+            같은 날 후보는 점수가 높은 순으로 진입 (보유 종목 수 상한에 걸릴 때 좋은 후보가 먼저 들어감)
+        min_score (float): 점수가 이 값 미만인 신호는 진입하지 않음
+        calendar (TradingCalendar), rows (dict): 가격 패널의 calendar와 day_rows(dfs) (dfs가 panel.frame으로 만든
+            것일 때), None이면 frame_calendar(dfs)로 만듦
 
     Returns:
         pd.DataFrame: 백테스트 결과
     """
     database_path = os.path.join(root, "fundamental.sqlite3")
-    conn_fund = sqlite3.connect(database_path)
+    fund_store = load_fundamental_store(database_path)
+    profiler.count('signals', len(screener_data))
 
     print(screener_data.head())
 
-    results = []
-    hold_list = []
-    for date, each in screener_data.groupby('Date'):
-        if date >= '2025-04-22':
-            continue
-        df_fund = pd.read_sql(f"SELECT * FROM '{convert_datetime_string(date)}'", conn_fund, index_col='티커')
-
-        for _, row in each.iterrows():
-            ticker = row['ticker']
-            cor = row['cor']
-            vrate = row['vrate']
-            mapct = row['ma200pct']
-
-            if ticker in hold_list:
-                continue
-
-            if ticker not in dfs:
+    # 날짜 문자열은 여기서 한 번만 거래일 순번으로 바꾸고, 이후 날짜 비교/다음 거래일/보유 기간과
+    # 펀더멘털/지수/밴드 조회는 모두 순번으로 처리합니다.
+    if calendar is None:
+        calendar, rows = frame_calendar(dfs)
+    signal_days = calendar.locate(screener_data['Date'].values)
+    end_day = calendar.search(END_DATE)[0]
+
+    with profiler.span('asof_lookups'):
+        # 모든 신호의 펀더멘털을 한 번에 as-of 조회 (해당 날짜 데이터가 없으면 직전 거래일 값)
+        df_fund = fund_store.asof_days(screener_data['ticker'].values, signal_days, calendar)
+        df_fund.index = screener_data.index
+
+        # 코스피 지수도 로컬 지수 저장소에서 모든 신호를 한 번에 as-of 조회
+        index_store = load_index_store(os.path.join(root, "index.sqlite3"))
+        kospi_close = pd.Series(index_store.asof_days('KOSPI', signal_days, calendar), index=screener_data.index)
+        # 코스피 밴드(common.regime, 각 날짜까지의 데이터만으로 계산)도 날짜별 시계열에서 as-of 조회
+        regime = load_regime(os.path.join(root, "regime.sqlite3"))
+        kospi_band = pd.Series(regime_asof_days(regime, signal_days, calendar), index=screener_data.index)
+
+    # days_since_max_high를 종목별로 한 번에 계산해 두고 신호마다 O(1)로 조회
+    if days_high is None:
+        with profiler.span('days_since_max_high'):
+            days_high = pd.DataFrame({
+                ticker: pd.Series(indicators.days_since_max_high(dfs[ticker]['High'].values, dfs[ticker].index,
+                                                                 window_days), index=dfs[ticker].index)
+                for ticker in screener_data['ticker'].unique() if ticker in dfs
+            })
+
+    # 모델 로드와 피처 행렬 생성은 한 번만, 채점은 전체 신호를 한 번에
+    scores = None
+    if scorer is not None:
+        with profiler.span('score'):
+            scores = pd.Series(scorer.score(signal_features(screener_data, dfs, df_fund, days_high)),
+                               index=screener_data.index)
+
+    if vectorized:
+        signals = screener_data[signal_days < end_day]
+        with profiler.span('simulate_trades'):
+            trades = simulate_trades(
+                signals, dfs, n_split=n_split, step=step, target=target, max_hold_days=max_hold_days,
+                calendar=calendar, rows=rows
+            )
+
+    with profiler.span('trade_loop'):
+        results = []
+        hold_list = set()
+        for day, pos in sorted(screener_data.groupby(signal_days).indices.items()):
+            if day >= end_day:
                 continue
-
-            if len(hold_list) < 200:
-                prices = dfs[ticker]
-                next_prices = prices[prices.index > date]
-
-                # 매수 포인트 계산
-                buy_price = prices.loc[date, 'Close']
-                pv = prices.loc[date, '거래대금']
-                amount = prices.loc[date, '시가총액']
-                buy_points = calculate_buy_points(buy_price)
-
-                hold_list.append(ticker)
-                sell_price = calculate_sell_point(buy_price)
-                symbol = ticker.split('.')[0]
-
-                if symbol not in df_fund.index:
-                    fundamental = pd.Series(index=df_fund.columns)
-                else:
-                    fundamental = df_fund.loc[ticker.split('.')[0]]
-
-                days_max_high = days_since_max_high(prices, date.split()[0], window_days=600)
-                krx_date = convert_datetime_string(date)
-                # kospi_close = fetch_index_close(krx_date, market='KOSPI')
-
-                order = 1
-                results.append({
-                    'ticker': ticker,
-                    'buy_date': date,
-                    'buy_price': buy_price,
-                    'sell_date': None,
-                    'sell_price': None,
-                    'profit_pct': None,
-                    'cor': cor,
-                    'vrate': vrate,
-                    'mapct': mapct,
-                    'order': order,
-                    '거래대금': pv,
-                    '시가총액': amount,
-                    'duration': None,
-                    'days_since_max_high': days_max_high,
-                    # 'kospi_index': kospi_close,
-                    **fundamental.to_dict()
-                })
-
-                for sell_date, each in next_prices.iterrows():
-                    duration = (pd.to_datetime(sell_date) - pd.to_datetime(date)).days
-
-                    # ─── 1) 보유 30일 초과 & 당일 10% 이상 상승 시 즉시 매도 ───
-                    # 직전 종가(prev_close) 대비 당일 고가(High)로 계산하거나,
-                    # 당일 종가(Close) 상승폭을 봐도 됩니다. 예시는 prev_close 기준.
-                    # if duration > 30:
-                    #     # 첫 루프의 prev_close는 매수가(buy_price)로 초기화
-                    #     if 'prev_close' in locals():
-                    #         prev = prev_close
-                    #     else:
-                    #         prev = buy_price
+            each = screener_data.iloc[pos]
+            date = each['Date'].iloc[0]
+
+            if scores is not None:
+                day_scores = scores.loc[each.index]
+                if min_score is not None:
+                    day_scores = day_scores[day_scores >= min_score]
+                each = each.loc[day_scores.sort_values(ascending=False, kind='stable').index]
+
+            for label, row in each.iterrows():
+                ticker = row['ticker']
+                cor = row['cor']
+                vrate = row['vrate']
+                mapct = row['ma200pct']
+
+                if ticker in hold_list:
+                    continue
+
+                if ticker not in dfs:
+                    continue
+
+                if len(hold_list) < 200:
+                    prices = dfs[ticker]
+                    row = lookup(rows[ticker], [day])[0]
+                    if row < 0:
+                        raise KeyError(f"{ticker}: 가격 데이터에 없는 진입일입니다: {date}")
+                    next_prices = prices.iloc[row + 1:]
+                    # 진입일 이후 각 행까지의 달력 기준 보유 일수
+                    durations = calendar.days[rows[ticker][row + 1:]] - calendar.days[day]
+
+                    # 매수 포인트 계산
+                    buy_price = prices['Close'].iat[row]
+                    pv = prices['거래대금'].iat[row]
+                    amount = prices['시가총액'].iat[row]
+                    buy_points = calculate_buy_points(buy_price, n_split=n_split, step=step)
+
+                    hold_list.add(ticker)
+                    sell_price = calculate_sell_point(buy_price, target=target)
+                    fundamental = df_fund.loc[label]
+
+                    days_max_high = days_high.at[date, ticker]
+
+                    order = 1
+                    results.append({
+                        'ticker': ticker,
+                        'buy_date': date,
+                        'buy_price': buy_price,
+                        'sell_date': None,
+                        'sell_price': None,
+                        'profit_pct': None,
+                        'cor': cor,
+                        'vrate': vrate,
+                        'mapct': mapct,
+                        'order': order,
+                        '거래대금': pv,
+                        '시가총액': amount,
+                        'duration': None,
+                        'days_since_max_high': days_max_high,
+                        'kospi_index': kospi_close.at[label],
+                        'kospi_band': kospi_band.at[label],
+                        **fundamental.to_dict()
+                    })
+                    if scores is not None:
+                        results[-1]['score'] = scores.at[label]
+
+                    if vectorized:
+                        trade = trades[label]
+                        results[-1].update(trade)
+                        if trade['sell_date'] is not None:
+                            hold_list.discard(ticker)
+                        continue
+
+                    for duration, (sell_date, each) in zip(durations.tolist(), next_prices.iterrows()):
+
+                        # ─── 1) 보유 30일 초과 & 당일 10% 이상 상승 시 즉시 매도 ───
+                        # 직전 종가(prev_close) 대비 당일 고가(High)로 계산하거나,
+                        # 당일 종가(Close) 상승폭을 봐도 됩니다. 예시는 prev_close 기준.
+                        # if duration > 30:
+                        #     # 첫 루프의 prev_close는 매수가(buy_price)로 초기화
+                        #     if 'prev_close' in locals():
+                        #         prev = prev_close
+                        #     else:
+                        #         prev = buy_price
                     
-                    #     # 당일 고가 기준 일일 상승률
-                    #     intraday_pct = (each['High'] - prev) / prev
-                    #     if intraday_pct >= 0.1:
-                    #         sell_price = each['Close']    # 또는 each['High']로 지정
-                    #         profit_pct = (sell_price - buy_price) / buy_price
-                    #         results[-1].update({
-                    #             'sell_date':  sell_date,
-                    #             'sell_price': sell_price,
-                    #             'profit_pct': profit_pct,
-                    #             'duration':   duration
-                    #         })
-                    #         hold_list.remove(ticker)
-                    #         break
+                        #     # 당일 고가 기준 일일 상승률
+                        #     intraday_pct = (each['High'] - prev) / prev
+                        #     if intraday_pct >= 0.1:
+                        #         sell_price = each['Close']    # 또는 each['High']로 지정
+                        #         profit_pct = (sell_price - buy_price) / buy_price
+                        #         results[-1].update({
+                        #             'sell_date':  sell_date,
+                        #             'sell_price': sell_price,
+                        #             'profit_pct': profit_pct,
+                        #             'duration':   duration
+                        #         })
+                        #         hold_list.remove(ticker)
+                        #         break
                     
-                    # 매 루프 끝에 prev_close 갱신
-                    # prev_close = each['Close']
-
-                    if order < n_split and each['Low'] < buy_points[order]:
-                        order += 1
-                        buy_price = sum(buy_points[:order]) / order
-                        sell_price = calculate_sell_point(buy_price)
-                        results[-1]['buy_price'] = buy_price
-                        results[-1]['order'] = order
-
-                    elif each['High'] > sell_price:
-                        profit_pct = (sell_price - buy_price) / buy_price
-                        duration = (pd.to_datetime(sell_date) - pd.to_datetime(date)).days
-                        hold_list.remove(ticker)
-
-                        results[-1]['sell_date'] = sell_date
-                        results[-1]['sell_price'] = sell_price
-                        results[-1]['profit_pct'] = profit_pct
-                        results[-1]['duration'] = duration
-                        break
+                        # 매 루프 끝에 prev_close 갱신
+                        # prev_close = each['Close']
+
+                        if order < n_split and each['Low'] < buy_points[order]:
+                            order += 1
+                            buy_price = sum(buy_points[:order]) / order
+                            sell_price = calculate_sell_point(buy_price, target=target)
+                            results[-1]['buy_price'] = buy_price
+                            results[-1]['order'] = order
+
+                        elif each['High'] > sell_price:
+                            profit_pct = (sell_price - buy_price) / buy_price
+                            hold_list.discard(ticker)
+
+                            results[-1]['sell_date'] = sell_date
+                            results[-1]['sell_price'] = sell_price
+                            results[-1]['profit_pct'] = profit_pct
+                            results[-1]['duration'] = duration
+                            break
                     
-                    elif duration >= 90:
-                        sell_price = prices.loc[sell_date, 'Close']
-                        profit_pct = (sell_price - buy_price) / buy_price
-                        duration = (pd.to_datetime(sell_date) - pd.to_datetime(date)).days
-                        hold_list.remove(ticker)
-
-                        results[-1]['sell_date'] = sell_date
-                        results[-1]['sell_price'] = sell_price
-                        results[-1]['profit_pct'] = profit_pct
-                        results[-1]['duration'] = duration
-                        break
-
+                        elif duration >= max_hold_days:
+                            sell_price = each['Close']
+                            profit_pct = (sell_price - buy_price) / buy_price
+                            hold_list.discard(ticker)
+
+                            results[-1]['sell_date'] = sell_date
+                            results[-1]['sell_price'] = sell_price
+                            results[-1]['profit_pct'] = profit_pct
+                            results[-1]['duration'] = duration
+                            break
+
+    profiler.count('trades_simulated', len(results))
     return pd.DataFrame(results)
 
 # 결과를 엑셀로 저장
@@ -264,10 +427,8 @@ def save_results_to_excel(results, filename):
 
 
 def convert_datetime_string(date_str):
-    # 문자열을 datetime 객체로 변환
-    dt = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-    # datetime 객체를 원하는 형식의 문자열로 변환
-    return dt.strftime('%Y%m%d')
+    # 'YYYY-MM-DD HH:MM:SS' → 'YYYYMMDD' (여러 날짜는 to_date_int로 한 번에 변환)
+    return str(to_date_int([date_str])[0])
 
 def days_since_max_high(prices: pd.DataFrame, current_date: str, window_days: int = 600) -> int:
     """
@@ -284,72 +445,163 @@ def days_since_max_high(prices: pd.DataFrame, current_date: str, window_days: in
     # 날짜 차이(일수)
     return (pd.to_datetime(current_date) - pd.to_datetime(max_date)).days
 
-def fetch_index_close(date_str: str, market: str = 'KOSPI') -> float:
+def fetch_index_close(date_str: str, market: str = 'KOSPI', database_path: str = 'index.sqlite3') -> float:
     """
     date_str: 'YYYYMMDD' 형식
     market: 'KOSPI' 또는 'KOSDAQ'
-    
-    pykrx.stock.get_index_ohlcv_by_date를 사용합니다.  
+    database_path: 지수 저장소 (common.index_store.update_index로 갱신)
+
+    네트워크 대신 로컬 지수 저장소에서 조회합니다. 휴장일이면 직전 거래일 종가입니다.
     """
-    # 인덱스 코드 매핑 (1000: 코스피, 1001: 코스닥)
-    code_map = {'KOSPI': '1001', 'KOSDAQ': '2001'}
-    idx_code = code_map.get(market.upper(), '1000')
-    df_idx = stock.get_index_ohlcv_by_date(date_str, date_str, idx_code)  # :contentReference[oaicite:0]{index=0}
-    # 반환 컬럼: pykrx 버전에 따라 '종가' 혹은 'Close'
-    if '종가' in df_idx.columns:
-        return df_idx['종가'].iloc[-1]
-    return df_idx['Close'].iloc[-1]
+    return load_index_store(database_path).close(market.upper(), date_str)
 
 
-if __name__ == '__main__':
-    root = "./sqlite3"
-    
-    # SQLite 데이터베이스 연결
-    database_path = os.path.join(root, "screener.sqlite3")
+def screen_signals(cor_screener, vrate_screener, mapct_screener, cor_min=0.03, vrate_min=8, mapct_max=0):
+    """
+    세 스크리너 테이블(날짜 × 티커)을 boolean 행렬로 AND 해서 신호를 한 번에 뽑습니다.
+
+    Parameters:
+        cor_screener (pd.DataFrame): 장대양봉 비율 (COR)
+        vrate_screener (pd.DataFrame): 60일 평균 대비 거래량 비율
+        mapct_screener (pd.DataFrame): 200일 이동평균 대비 종가 비율
+        cor_min (float): cor > cor_min
+        vrate_min (float): vrate > vrate_min
+        mapct_max (float): ma200pct < mapct_max
+
+    Returns:
+        pd.DataFrame: 신호 데이터 (columns: Date, ticker, cor, vrate, ma200pct), 날짜순
+    """
+    # mapct 테이블을 기준으로 나머지 두 테이블을 정렬 (없는 값은 NaN → 조건 불충족)
+    index, columns = mapct_screener.index, mapct_screener.columns
+    mapct = mapct_screener.to_numpy(dtype=float)
+    vrate = vrate_screener.reindex(index=index, columns=columns).to_numpy(dtype=float)
+    cor = cor_screener.reindex(index=index, columns=columns).to_numpy(dtype=float)
+
+    with np.errstate(invalid='ignore'):
+        mask = (mapct < mapct_max) & (vrate > vrate_min) & (cor > cor_min)
+    rows, cols = np.nonzero(mask)
+
+    return pd.DataFrame({
+        'Date': index.values[rows],
+        'ticker': columns.values[cols],
+        'cor': cor[rows, cols],
+        'vrate': vrate[rows, cols],
+        'ma200pct': mapct[rows, cols],
+    })
+
+
+def load_screener(database_path, market='KS'):
+    """
+    스크리너 결과(cor, vrate, mapct)를 날짜 × 티커 DataFrame으로 불러옵니다.
+    screener.py가 만든 패널('screener.<시장>.panel')이 있으면 그것을, 없으면 예전 sqlite 테이블을 읽습니다.
+
+    Returns:
+        tuple: (cor_screener, vrate_screener, mapct_screener)
+    """
+    panel_path = default_panel_path(database_path, market)
+    if os.path.exists(os.path.join(panel_path, 'meta.json')):
+        panel = Panel.load(panel_path)
+        profiler.count('cache_hits.screener_panel')
+        return panel.field_frame('COR'), panel.field_frame('vrate'), panel.field_frame('ma200pct')
+
     conn_scr = sqlite3.connect(database_path)
+    cor_screener = pd.read_sql(f"SELECT * FROM 'cor.{market}'", conn_scr, index_col='Date')
+    vrate_screener = pd.read_sql(f"SELECT * FROM 'vrate.{market}'", conn_scr, index_col='Date')
+    mapct_screener = pd.read_sql(f"SELECT * FROM 'mapct.{market}'", conn_scr, index_col='Date')
+    conn_scr.close()
+    profiler.count('queries', 3)
+    profiler.count('tables_read', 3)
+    profiler.count('rows_read', len(cor_screener) + len(vrate_screener) + len(mapct_screener))
+    return cor_screener, vrate_screener, mapct_screener
 
-    cor_screener = pd.read_sql("SELECT * FROM 'cor.KS'", conn_scr, index_col='Date')
-    vrate_screener = pd.read_sql("SELECT * FROM 'vrate.KS'", conn_scr, index_col='Date')
-    mapct_screener = pd.read_sql("SELECT * FROM 'mapct.KS'", conn_scr, index_col='Date')
 
-    database_path = os.path.join(root, "kr_stocklist.sqlite3")
-    conn = sqlite3.connect(database_path)
+@profiler.profiled('load_backtest_inputs')
+def load_backtest_inputs(root, market='KS', **thresholds):
+    """
+    스크리너 테이블에서 신호를 뽑고, 신호가 난 종목의 가격 데이터를 읽어옵니다.
 
-    dfs = {}
-    contents = []
-    for date, mapct in mapct_screener.iterrows():
-        ticker1 = set(mapct[mapct < 0].index)
-        if len(ticker1) == 0:
-            continue
+    Parameters:
+        root (str): sqlite3 파일이 있는 디렉터리
+        market (str): 'KS' 또는 'KQ'
+        thresholds: screen_signals의 cor_min, vrate_min, mapct_max
 
-        vrate = vrate_screener.loc[date]
-        ticker2 = set(vrate[vrate > 8].index)
-        if len(ticker2) == 0:
-            continue
-        
-        cor = cor_screener.loc[date]
-        ticker3 = set(cor[cor > 0.03].index)
-        if len(ticker3) == 0:
-            continue
+    Returns:
+        tuple: (screener_data, dfs, panel) - 신호 DataFrame, 티커별 가격 데이터 dict, dfs를 만든 가격 패널
+            (panel.calendar와 panel.day_rows(dfs)를 run_backtest/simulate_portfolio에 넘기면 달력을 다시 만들지 않음)
+    """
+    cor_screener, vrate_screener, mapct_screener = load_screener(os.path.join(root, "screener.sqlite3"), market)
+    screener = screen_signals(cor_screener, vrate_screener, mapct_screener, **thresholds)
 
-        tickers = set.intersection(ticker1, ticker2, ticker3)
-        if len(tickers) == 0:
-            continue
-        
-        for ticker in tickers:
-            if ticker not in dfs:
-                dfs[ticker] = pd.read_sql(f"SELECT * FROM '{ticker}'", con=conn, index_col='Date')
+    # 티커별 테이블 대신 한 번에 불러오는 가격 패널
+    panel = load_price_panel(os.path.join(root, "kr_stocklist.sqlite3"))
+    dfs = {
+        ticker: panel.frame(ticker)
+        for ticker in screener['ticker'].unique() if ticker in panel.ticker_index
+    }
 
-        each = []
-        for ticker in tickers:
-            each.append([date, ticker, cor[ticker], vrate[ticker], mapct[ticker]])
+    return screener, dfs, panel
 
-        contents += each
-        
-    screener = pd.DataFrame(contents, columns=['Date', 'ticker', 'cor', 'vrate', 'ma200pct'])
 
-    conn.close()
-    conn_scr.close()
+def daily_candidates(root, date=None, market='KS', scorer=None, min_score=None, window_days=600, **thresholds):
+    """
+    하루치 신호 후보를 모델로 한 번에 채점해 점수 순으로 돌려줍니다. (매일 장 마감 후 실행용)
 
-    df_result = run_backtest(root, screener, dfs)
-    df_result.to_excel("results/results.xlsx", index=False)
+    Parameters:
+        root (str): sqlite3 파일이 있는 디렉터리
+        date (str): 기준일 ('YYYY-MM-DD HH:MM:SS'), None이면 스크리너의 마지막 날짜
+        market (str): 'KS' 또는 'KQ'
+        scorer (CandidateScorer): None이면 기본 모델을 불러옴
+        min_score (float): 이 점수 미만 후보는 제외
+        window_days (int): days_since_max_high 창 길이
+        thresholds: screen_signals의 cor_min, vrate_min, mapct_max
+
+    Returns:
+        pd.DataFrame: 후보별 피처와 score, 점수 내림차순
+    """
+    scorer = scorer or CandidateScorer()
+    cor_screener, vrate_screener, mapct_screener = load_screener(os.path.join(root, "screener.sqlite3"), market)
+    date = date or mapct_screener.index[-1]
+    day = [date]
+    signals = screen_signals(cor_screener.loc[day], vrate_screener.loc[day], mapct_screener.loc[day], **thresholds)
+
+    panel = load_price_panel(os.path.join(root, "kr_stocklist.sqlite3"))
+    signals = signals[signals['ticker'].isin(panel.ticker_index)].reset_index(drop=True)
+    dfs = {ticker: panel.frame(ticker) for ticker in signals['ticker']}
+    days_high = pd.DataFrame({
+        ticker: pd.Series(indicators.days_since_max_high(df['High'].values, df.index, window_days), index=df.index)
+        for ticker, df in dfs.items()
+    })
+
+    df_fund = load_fundamental_store(os.path.join(root, "fundamental.sqlite3")).asof_days(
+        signals['ticker'].values, panel.calendar.locate(signals['Date'].values), panel.calendar
+    )
+    df_fund.index = signals.index
+    features = signal_features(signals, dfs, df_fund, days_high)
+    ranked = scorer.rank(features, min_score=min_score)
+    return signals.loc[ranked.index, ['Date', 'ticker']].join(ranked)
+
+
+if __name__ == '__main__':
+    # KO_STOCKS_PROFILE=results/profile/kjs_trade.json 으로 실행하면 단계별 시간/카운터 보고서를 남깁니다.
+    profiler.enable_from_env()
+    root = "./sqlite3"
+    config = load_yaml('common/config.yaml')
+    screener, dfs, panel = load_backtest_inputs(root, market='KS', **config['screening'])
+    # 가격 패널의 달력 하나로 백테스트와 포트폴리오의 날짜를 모두 순번으로 다룹니다.
+    calendar, rows = panel.calendar, panel.day_rows(dfs)
+
+    df_result = run_backtest(root, screener, dfs, calendar=calendar, rows=rows)
+    run_id = write_results(df_result, market='KS')
+    print(f"백테스트 결과 저장: run_id={run_id}")
+    if config['results']['export_excel']:
+        export_excel(df_result, "results/results.xlsx")
+
+    # 보유 종목 수 상한과 현금을 반영한 포트폴리오 결과
+    with profiler.span('simulate_portfolio'):
+        portfolio = simulate_portfolio(screener, dfs, calendar=calendar, rows=rows, **config['portfolio'])
+    profiler.count('portfolio_entries', int((portfolio['trades']['status'] == 'entered').sum()))
+    print(portfolio['trades']['status'].value_counts())
+    print(f"최종 평가금액(원가 기준): {portfolio['equity'].iloc[-1]:,.0f}")
+    write_results(portfolio['trades'], market='KS', run_id=run_id, name='portfolio')
+    if config['results']['export_excel']:
+        export_excel(portfolio['trades'], "results/portfolio.xlsx")
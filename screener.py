@@ -1,5 +1,9 @@
+import os
 import sqlite3
+import numpy as np
 import pandas as pd
+from common import indicators, profiler
+from common.panel import Panel, default_panel_path, load_price_panel
 
 
 def get_all_tables(conn):
@@ -39,10 +43,8 @@ def set_signal(df):
     Returns:
         pd.DataFrame: 신호가 감지된 데이터
     """
-    # 장대양봉 조건: (high - low) > 특정 기준 & 종가 > 시가
-    df['COR'] = (df['Close'] - df['Open']) / df['Open']
-    df['vrate'] = df['Volume'] / df['Volume'].rolling(window=60).mean()
-    return df
+    # 장대양봉 크기(COR)와 60일 평균 대비 거래량(vrate), 계산은 common.indicators 엔진과 같은 함수로
+    return indicators.compute_frame(df, ['COR', 'vrate'])
 
 
 def identify_candle_signal(df_cor, df_vrate):
@@ -59,43 +61,201 @@ def identify_candle_signal(df_cor, df_vrate):
 
 
 def set_moving_average(df):
-    for interval in [20, 60, 200]:
-        ma = df['Close'].rolling(interval).mean()
-        df[f'ma{interval}pct'] = (df['Close'] - ma) / ma
-    return df
+    return indicators.compute_frame(df, ['ma20pct', 'ma60pct', 'ma200pct'])
 
 
-if __name__ == '__main__':
-    # SQLite 데이터베이스 연결
-    database_path = "kr_stocklist.sqlite3"
-    conn = sqlite3.connect(database_path)
-
-    table_list = get_all_tables(conn)
-    dfs = []
-    dates = []
-    for ticker in table_list:
-        df = pd.read_sql(f"SELECT * FROM '{ticker}' WHERE Date>'2019-07-01'", conn)
-        if df.shape[0] < 1000:
-            continue
-
-        df = df.assign(ticker=ticker).assign(market=ticker.split('.')[1])
-        df = set_signal(df)
-        df = set_moving_average(df)
-        dfs.append(df)
-        # dates.append(df.index)
-    
-    df = pd.concat(dfs)
-    conn_scr = sqlite3.connect('screener.sqlite3')
+# 스크리너 패널 필드 (kjs_trade에서는 각각 cor, vrate, mapct로 사용)
+SCREENER_FIELDS = ['COR', 'vrate', 'ma200pct']
+# 직전 몇 행을 상태로 보관할지 (ma200에 199행, vrate 60일 창에 59행이 필요)
+STATE_ROWS = indicators.lookback(['COR', 'vrate', 'ma20pct', 'ma60pct', 'ma200pct'])
+STATE_COLUMNS = ['ticker', 'Date', 'Close', 'Volume']
+
+
+def write_state(conn_scr, state):
+    """
+    종목별 마지막 STATE_ROWS개 행의 Close/Volume (이동평균 창)을 screener.sqlite3의 state 테이블에 저장합니다.
+    """
+    state = state.groupby('ticker').tail(STATE_ROWS)[STATE_COLUMNS]
+    state.to_sql('state', conn_scr, if_exists='replace', index=False)
 
-    for market, df_market in df.groupby('market'):
+
+def tail_state(panel, tickers):
+    """
+    종목별 마지막 STATE_ROWS개 거래일의 Date/Close/Volume (update_screener가 이어서 계산할 창)
+    """
+    close, volume = panel.field('Close'), panel.field('Volume')
+    frames = []
+    for ticker in tickers:
+        rows, j = panel.day_index(ticker)[-STATE_ROWS:], panel.ticker_index[ticker]
+        frames.append(pd.DataFrame({
+            'ticker': ticker, 'Date': panel.date_labels[rows], 'Close': close[rows, j], 'Volume': volume[rows, j],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def screener_tickers(panel, min_rows=1000):
+    """
+    스크리너 대상 종목 (기간 내 거래일이 min_rows 이상)
+    """
+    counts = panel.present.sum(axis=0)
+    return [ticker for ticker, count in zip(panel.tickers, counts) if count >= min_rows]
+
+
+def split_markets(tickers):
+    markets = {}
+    for ticker in tickers:
+        markets.setdefault(ticker.split('.')[1], []).append(ticker)
+    return markets
+
+
+@profiler.profiled('build_screener')
+def build_screener(panel, database_path='screener.sqlite3', min_rows=1000):
+    """
+    전체 기간의 스크리너 패널(시장별 날짜 × 티커 float32)을 만들고 이동평균 상태를 저장합니다.
+    COR/vrate/ma200pct는 종목별 루프 대신 common.indicators.compute_blocks로 티커 묶음씩 한 번에 계산해
+    가격 패널과 같은 거래일 축의 배열에 바로 써 넣습니다. (중간 배열은 묶음 하나 크기, 날짜 수 × 8 float64 몇 장)
+
+    Parameters:
+        panel (Panel): 스크리너 시작일부터 자른 가격 패널
+        database_path (str): 상태 테이블을 둘 sqlite 파일, 패널은 '<이름>.<시장>.panel'에 저장
+        min_rows (int): 이보다 거래일이 적은 종목은 제외
+    """
+    states = []
+    for market, tickers in split_markets(screener_tickers(panel, min_rows)).items():
         print(market)
-        cor_screener = df_market.pivot_table(index="Date", columns="ticker", values='COR')
-        vrate_screener = df_market.pivot_table(index="Date", columns="ticker", values='vrate')
-        mapct_screener = df_market.pivot_table(index="Date", columns="ticker", values='ma200pct')
+        path = default_panel_path(database_path, market)
+        out = Panel.create(path, panel.dates, tickers, SCREENER_FIELDS, dtype=np.float32)
 
-        cor_screener.to_sql(f'cor.{market}', conn_scr, if_exists='replace')
-        vrate_screener.to_sql(f'vrate.{market}', conn_scr, if_exists='replace')
-        mapct_screener.to_sql(f'mapct.{market}', conn_scr, if_exists='replace')
+        cols = np.array([panel.ticker_index[ticker] for ticker in tickers], dtype=np.int64)
+        with profiler.span('indicators'):
+            for sl, computed in indicators.compute_blocks(panel, SCREENER_FIELDS, tickers):
+                out.values[:, sl, :] = np.stack([computed[field] for field in SCREENER_FIELDS], axis=-1)
+                out.present[:, sl] = panel.present[:, cols[sl]]
+        states.append(tail_state(panel, tickers))
+        profiler.count('rows_read', int(out.present.sum()))
 
-    conn.close()
+        out.commit(path)
+        del out
+
+    conn_scr = sqlite3.connect(database_path)
+    write_state(conn_scr, pd.concat(states))
     conn_scr.close()
+
+
+@profiler.profiled('update_screener')
+def update_screener(panel, database_path='screener.sqlite3', min_rows=1000):
+    """
+    저장된 이동평균 상태에서 이어서 종목마다 아직 계산하지 않은 거래일의 지표만 계산해 스크리너 패널에 씁니다.
+    마지막 계산일은 종목별(상태 테이블의 마지막 Date)이므로, 다운로드에 실패했다가 다음 날 채워진 종목도
+    자기 마지막 계산일 다음 거래일부터 다시 계산합니다. 새로 대상이 된 종목은 그 종목의 이력만 계산해 열을 추가하고,
+    빠진 종목은 열과 상태를 지웁니다. 상태나 패널이 없거나 패널의 날짜 축이 가격 패널과 맞지 않으면
+    build_screener로 전체를 다시 만듭니다.
+
+    Parameters:
+        panel (Panel): 스크리너 시작일부터 자른 가격 패널
+        database_path (str): 상태 테이블이 있는 sqlite 파일
+        min_rows (int): 이보다 거래일이 적은 종목은 제외
+
+    Returns:
+        int: 새로 추가된 거래일 수 (전체 재계산이면 -1)
+    """
+    markets = split_markets(screener_tickers(panel, min_rows))
+    conn_scr = sqlite3.connect(database_path)
+    has_state = 'state' in get_all_tables(conn_scr)
+    state = pd.read_sql("SELECT * FROM state", conn_scr) if has_state else None
+    conn_scr.close()
+    profiler.count('queries', 2 if has_state else 1)
+
+    paths = {market: default_panel_path(database_path, market) for market in markets}
+    ready = has_state and bool(markets) and all(os.path.exists(os.path.join(path, 'meta.json')) for path in paths.values())
+    outs = {market: Panel.load(path) for market, path in paths.items()} if ready else {}
+    # 스크리너 패널의 날짜 축은 가격 패널 날짜 축의 앞부분이어야 이어 쓸 수 있습니다.
+    if not ready or any(
+        len(out.dates) > len(panel.dates) or not np.array_equal(out.dates, panel.dates[:len(out.dates)])
+        for out in outs.values()
+    ):
+        build_screener(panel, database_path, min_rows)
+        return -1
+
+    eligible = {ticker for tickers in markets.values() for ticker in tickers}
+    state = state[state['ticker'].isin(eligible)]
+    states = dict(list(state.groupby('ticker')))
+    last_dates = {ticker: np.datetime64(pd.Timestamp(df['Date'].max()), 's') for ticker, df in states.items()}
+
+    added = 0
+    new_states = []
+    for market, tickers in markets.items():
+        path, out = paths[market], outs.pop(market)
+        # 새로 대상이 된 종목은 빈 열로 추가하고 빠진 종목은 지웁니다. (기존 값은 복사만)
+        if out.tickers != tickers:
+            out = Panel.reindex(path, tickers)
+        n_old = len(out.dates)
+        if n_old < len(panel.dates):
+            shape = (len(panel.dates) - n_old, len(tickers))
+            Panel.append(path, panel.dates[n_old:], np.full(shape + (len(SCREENER_FIELDS),), np.nan, dtype=np.float32),
+                         np.zeros(shape, dtype=bool))
+            added = max(added, shape[0])
+        del out
+        out = Panel.open(path)
+
+        # 상태가 없는 종목: 그 종목의 이력 전체를 계산
+        fresh = [ticker for ticker in tickers if ticker not in last_dates]
+        if fresh:
+            cols = np.array([out.ticker_index[ticker] for ticker in fresh], dtype=np.int64)
+            src = np.array([panel.ticker_index[ticker] for ticker in fresh], dtype=np.int64)
+            with profiler.span('indicators'):
+                for sl, computed in indicators.compute_blocks(panel, SCREENER_FIELDS, fresh):
+                    out.values[:, cols[sl], :] = np.stack([computed[field] for field in SCREENER_FIELDS], axis=-1)
+                    out.present[:, cols[sl]] = panel.present[:, src[sl]]
+            new_states.append(tail_state(panel, fresh))
+            profiler.count('rows_read', int(out.present[:, cols].sum()))
+
+        for ticker in tickers:
+            if ticker not in last_dates:
+                continue
+            # 종목별 마지막 계산일 다음의 거래일만 (늦게 채워진 행 포함)
+            j = panel.ticker_index[ticker]
+            i0 = np.searchsorted(panel.dates, last_dates[ticker], side='right')
+            rows = i0 + np.nonzero(panel.present[i0:, j])[0]
+            if rows.size == 0:
+                continue
+
+            # 보관해 둔 창 + 새 행으로 지표를 계산하고 새 행만 남깁니다.
+            df_state = states[ticker].drop(columns='ticker')
+            with profiler.span('indicators'):
+                df = pd.DataFrame(panel.values[rows, j, :], index=panel.date_labels[rows], columns=panel.fields)
+                df = pd.concat([df_state, df.reset_index()], ignore_index=True)
+                df = set_signal(df)
+                df = set_moving_average(df)
+            profiler.count('rows_read', len(rows))
+
+            out.values[rows, out.ticker_index[ticker], :] = df[SCREENER_FIELDS].values[len(df_state):]
+            out.present[rows, out.ticker_index[ticker]] = True
+            new_states.append(df.iloc[len(df_state):][STATE_COLUMNS[1:]].assign(ticker=ticker))
+
+        out.commit(path)
+        del out
+
+    conn_scr = sqlite3.connect(database_path)
+    write_state(conn_scr, pd.concat([state, *(df[STATE_COLUMNS] for df in new_states)]).sort_values(['ticker', 'Date']))
+    conn_scr.close()
+    return added
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--full', action='store_true', help='저장된 상태를 무시하고 전체 기간을 다시 계산')
+    parser.add_argument('--profile', help='단계별 시간/카운터 JSON 보고서 경로 (환경 변수 KO_STOCKS_PROFILE과 같음)')
+    args = parser.parse_args()
+    profiler.enable_from_env(args.profile)
+
+    # 티커별 테이블 대신 가격 패널을 한 번에 불러오기
+    database_path = "kr_stocklist.sqlite3"
+    panel = load_price_panel(database_path).date_slice(start='2019-07-01')
+
+    if args.full:
+        build_screener(panel, 'screener.sqlite3')
+    else:
+        print(f"새 거래일: {update_screener(panel, 'screener.sqlite3')}")
@@ -0,0 +1,170 @@
+import os
+import itertools
+import tempfile
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from common.utils import load_yaml
+from common.feature_store import write_results, export_excel
+from common.backtest_engine import simulate_entries
+from common.trading_calendar import frame_calendar, lookup
+from kjs_trade import END_DATE, load_backtest_inputs
+
+# 워커 프로세스가 읽기 전용으로 공유하는 배열 (initializer에서 memmap으로 연결)
+_shared = {}
+
+
+def pack_inputs(screener_data, dfs, cutoff=END_DATE, calendar=None, rows=None):
+    """
+    신호와 가격 데이터를 종목별로 이어 붙인 평탄한 배열로 변환합니다.
+
+    Parameters:
+        screener_data (pd.DataFrame): 선정된 종목 데이터 (Date, ticker)
+        dfs (dict): 티커별 가격 데이터 (index: Date)
+        cutoff (int or str): 이 날짜 이후(포함)의 신호는 제외, 기본은 run_backtest와 같은 kjs_trade.END_DATE
+        calendar (TradingCalendar), rows (dict): 가격 패널의 calendar와 day_rows(dfs), None이면 frame_calendar(dfs)로 만듦
+
+    Returns:
+        dict: 이름 → np.ndarray
+            - high, low, close, days: 모든 종목의 가격을 이어 붙인 배열
+            - bounds: (종목 수, 2) 종목별 [시작, 끝) 행 번호
+            - entry_ticker, entry_row: 날짜순 신호의 종목 번호와 종목 내 행 번호
+    """
+    if calendar is None:
+        calendar, rows = frame_calendar(dfs)
+    signal_days = calendar.locate(screener_data['Date'].values)
+    keep = (signal_days < calendar.search(cutoff)[0]) & screener_data['ticker'].isin(list(dfs)).values
+    # run_backtest는 거래일 순번으로 groupby 하므로 같은 날짜 안에서는 원래 순서를 유지합니다.
+    order = np.argsort(signal_days[keep], kind='stable')
+    signals = screener_data[keep].iloc[order]
+    signal_days = signal_days[keep][order]
+
+    tickers = sorted(signals['ticker'].unique())
+    ticker_no = {ticker: i for i, ticker in enumerate(tickers)}
+
+    highs, lows, closes, days, bounds = [], [], [], [], []
+    offset = 0
+    for ticker in tickers:
+        prices = dfs[ticker]
+        highs.append(prices['High'].values)
+        lows.append(prices['Low'].values)
+        closes.append(prices['Close'].values)
+        days.append(calendar.days[rows[ticker]].astype(np.int64))
+        bounds.append((offset, offset + len(prices)))
+        offset += len(prices)
+
+    entry_row = np.empty(len(signals), dtype=np.int64)
+    for ticker, pos in signals.groupby('ticker').indices.items():
+        entry_row[pos] = lookup(rows[ticker], signal_days[pos])
+    if (entry_row < 0).any():
+        raise KeyError("가격 데이터에 없는 진입일이 있습니다.")
+
+    return {
+        'high': np.concatenate(highs).astype(float),
+        'low': np.concatenate(lows).astype(float),
+        'close': np.concatenate(closes).astype(float),
+        'days': np.concatenate(days),
+        'bounds': np.array(bounds, dtype=np.int64).reshape(-1, 2),
+        'entry_ticker': signals['ticker'].map(ticker_no).values.astype(np.int64),
+        'entry_row': entry_row,
+    }
+
+
+def _attach(shared_dir):
+    for name in os.listdir(shared_dir):
+        _shared[name[:-4]] = np.load(os.path.join(shared_dir, name), mmap_mode='r')
+
+
+def evaluate(params, max_positions=200):
+    """
+    파라미터 조합 하나로 전체 신호를 시뮬레이션하고 요약 통계를 계산합니다.
+
+    Parameters:
+        params (dict): n_split, step, target, max_hold_days
+        max_positions (int): 동시 보유 종목 수 제한 (run_backtest의 hold_list 제한)
+
+    Returns:
+        dict: 파라미터 + win_rate, mean_profit_pct, mean_duration, trade_count, open_count
+    """
+    entry_ticker = _shared['entry_ticker']
+    entry_row = _shared['entry_row']
+    closed = np.zeros(len(entry_ticker), dtype=bool)
+    profit_pct = np.full(len(entry_ticker), np.nan)
+    duration = np.full(len(entry_ticker), np.nan)
+
+    for t, (start, end) in enumerate(_shared['bounds']):
+        idx = np.nonzero(entry_ticker == t)[0]
+        sim = simulate_entries(
+            _shared['high'][start:end], _shared['low'][start:end], _shared['close'][start:end],
+            _shared['days'][start:end], entry_row[idx], **params
+        )
+        closed[idx] = sim['exit_idx'] >= 0
+        profit_pct[idx] = sim['profit_pct']
+        duration[idx] = sim['duration']
+
+    # run_backtest와 같은 규칙: 청산되지 않은 종목은 계속 보유 중으로 남아 이후 신호를 막습니다.
+    held = set()
+    accepted = np.zeros(len(entry_ticker), dtype=bool)
+    for i, t in enumerate(entry_ticker):
+        if t in held or len(held) >= max_positions:
+            continue
+        accepted[i] = True
+        if not closed[i]:
+            held.add(t)
+
+    done = accepted & closed
+    return {
+        **params,
+        'win_rate': (profit_pct[done] > 0).mean() if done.any() else np.nan,
+        'mean_profit_pct': profit_pct[done].mean() if done.any() else np.nan,
+        'mean_duration': duration[done].mean() if done.any() else np.nan,
+        'trade_count': int(done.sum()),
+        'open_count': int((accepted & ~closed).sum()),
+    }
+
+
+def build_grid(grid):
+    """
+    {'n_split': [...], 'step': [...], ...} 형태의 설정을 파라미터 조합 리스트로 펼칩니다.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def run_sweep(screener_data, dfs, grid, processes=None, calendar=None, rows=None):
+    """
+    가격 데이터를 한 번만 적재해 읽기 전용 memmap으로 공유하고, 프로세스 풀에서 그리드 전체를 평가합니다.
+
+    Parameters:
+        screener_data (pd.DataFrame): 선정된 종목 데이터 (Date, ticker)
+        dfs (dict): 티커별 가격 데이터
+        grid (dict): 파라미터별 후보 값 리스트
+        processes (int): 워커 수, None이면 CPU 수
+        calendar (TradingCalendar), rows (dict): pack_inputs 참고
+
+    Returns:
+        pd.DataFrame: 조합당 한 행의 요약 결과
+    """
+    arrays = pack_inputs(screener_data, dfs, calendar=calendar, rows=rows)
+    combos = build_grid(grid)
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        for name, array in arrays.items():
+            np.save(os.path.join(shared_dir, f"{name}.npy"), array)
+
+        with Pool(processes=processes, initializer=_attach, initargs=(shared_dir,)) as pool:
+            rows = pool.map(evaluate, combos, chunksize=max(1, len(combos) // (4 * (processes or os.cpu_count()))))
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    root = "./sqlite3"
+    config = load_yaml('common/config.yaml')
+
+    screener, dfs, panel = load_backtest_inputs(root, market='KS', **config['screening'])
+    df_sweep = run_sweep(screener, dfs, config['sweep'], calendar=panel.calendar, rows=panel.day_rows(dfs))
+    write_results(df_sweep, market='KS', name='sweep')
+    if config['results']['export_excel']:
+        export_excel(df_sweep, "results/sweep.xlsx")
+    print(df_sweep.sort_values('mean_profit_pct', ascending=False).head(20))
@@ -1,16 +1,18 @@
-import pandas as pd
+from common import profiler
 from common.utils import load_yaml
+from common.feature_store import load_results
 from catboost import CatBoostClassifier, Pool
-from sklearn.model_selection import train_test_split
+from analysis.walk_forward import walk_forward_splits
 from sklearn.metrics import accuracy_score, classification_report
 
 
 config = load_yaml('common/config.yaml')
+# KO_STOCKS_PROFILE=results/profile/tree_analyzer.json 으로 실행하면 단계별 시간/카운터 보고서를 남깁니다.
+profiler.enable_from_env()
 
 ## Step 1: load results
-df = pd.concat(
-    [pd.read_excel('results/KS.results.xlsx')]
-)
+with profiler.span('load_results'):
+    df = load_results(market='KS')
 
 # Step 2: Ensure all required features are present in the DataFrame
 missing_features = [feat for feat in config['features'] if feat not in df.columns]
@@ -24,7 +26,9 @@ y = (df['duration'] > 60).astype(int)
 class_counts = y.value_counts()
 class_weights = {0: 1.0, 1: class_counts[0] / class_counts[1]}
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# 무작위 분할은 미래 거래가 학습에 섞이므로, 매수일 기준 마지막 20%를 검증용으로 둡니다. (청산일이 겹치는 학습 행은 제외)
+train_idx, test_idx = walk_forward_splits(df['buy_date'], df['sell_date'], n_splits=1, min_train=0.8)[0]
+X_train, X_test, y_train, y_test = X.iloc[train_idx], X.iloc[test_idx], y.iloc[train_idx], y.iloc[test_idx]
 
 # Step 4: Train the CatBoost Model
 # Initialize CatBoostRegressor; for classification, use CatBoostClassifier
@@ -36,10 +40,13 @@ model = CatBoostClassifier(
     class_weights=[class_weights[0], class_weights[1]],
     verbose=100
 )
-model.fit(X_train, y_train, eval_set=(X_test, y_test), early_stopping_rounds=50)
+with profiler.span('fit'):
+    model.fit(X_train, y_train, eval_set=(X_test, y_test), early_stopping_rounds=50)
+profiler.count('train_rows', len(X_train))
 
 # Step 5: Evaluate the Model
-y_pred = model.predict(X_test)
+with profiler.span('predict'):
+    y_pred = model.predict(X_test)
 accuracy = accuracy_score(y_test, y_pred)
 report = classification_report(y_test, y_pred)
 